@@ -0,0 +1,67 @@
+"""
+Compare the threaded and asyncio fetch engines against a local mock index.
+
+    python -m benchmarks.bench_engines -n 500 -w 16 --connect-latency 0.02
+"""
+import argparse
+import json
+import time
+
+import dep_license
+from benchmarks.mock_pypi import MockPyPIServer
+from dep_license.aio import start_async
+
+
+def _key(r):
+    return r["Name"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("-n", "--packages", type=int, default=300)
+    parser.add_argument("-w", "--workers", type=int, default=16)
+    parser.add_argument("--payload-size", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument(
+        "--connect-latency",
+        type=float,
+        default=0.02,
+        help="simulated handshake cost per new connection",
+    )
+    args = parser.parse_args(argv)
+
+    deps = [f"package-{i}" for i in range(args.packages)]
+    engines = [
+        ("thread", dep_license.start_concurrent),
+        ("async", start_async),
+    ]
+    report = {}
+    records = {}
+    with MockPyPIServer(
+        payload_size=args.payload_size,
+        latency=args.latency,
+        connect_latency=args.connect_latency,
+    ) as server:
+        dep_license.PYPYI_URL = server.url
+        for engine, func in engines:
+            server.reset_counters()
+            start = time.perf_counter()
+            results = func(deps, max_workers=args.workers)
+            elapsed = time.perf_counter() - start
+            records[engine] = sorted(results, key=_key)
+            report[engine] = {
+                "seconds": round(elapsed, 4),
+                "packages_per_second": round(len(deps) / elapsed, 1),
+                "requests": len(server.requests),
+                "connections": server.connections,
+            }
+
+    report["identical"] = records["thread"] == records["async"]
+    print(json.dumps(report, indent=4))
+    return 0 if report["identical"] else 1
+
+
+if __name__ == "__main__":
+    exit(main())
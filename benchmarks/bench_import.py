@@ -0,0 +1,90 @@
+"""
+Import-time guard for `import dep_license`.
+
+Runs `python -X importtime` in fresh interpreters and reports the median
+cumulative import time plus the most expensive modules. Exits non-zero when
+a heavy dependency is imported eagerly or the time budget is exceeded.
+
+    python -m benchmarks.bench_import --budget-ms 100
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# only needed on specific code paths, never on `import dep_license`
+HEAVY_MODULES = [
+    "git",
+    "tabulate",
+    "yaml",
+    "toml",
+    "tomllib",
+    "pkg_resources",
+    "distutils",
+    "setuptools",
+    "sqlite3",
+    "urllib.request",
+    "http.client",
+    "ssl",
+    "asyncio",
+    "concurrent.futures",
+    "email.parser",
+]
+
+
+def importtime(module):
+    """Return {module: cumulative microseconds} for one fresh import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    timings = {}
+    for line in proc.stderr.decode().splitlines():
+        prefix, _, rest = line.partition("import time:")
+        if prefix or "|" not in rest:
+            continue
+        parts = rest.split("|")
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue
+        timings[parts[2].strip()] = cumulative
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("-m", "--module", default="dep_license")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    runs = [importtime(args.module) for _ in range(args.repeat)]
+    total_ms = statistics.median(r.get(args.module, 0) for r in runs) / 1000
+    last = runs[-1]
+    heavy = sorted(m for m in HEAVY_MODULES if m in last)
+    top = sorted(
+        ((m, us) for m, us in last.items() if m != args.module),
+        key=lambda x: x[1],
+        reverse=True,
+    )[: args.top]
+
+    report = {
+        "module": args.module,
+        "median_ms": round(total_ms, 2),
+        "budget_ms": args.budget_ms,
+        "heavy_modules_imported": heavy,
+        "slowest_imports_ms": {m: round(us / 1000, 2) for m, us in top},
+    }
+    print(json.dumps(report, indent=4))
+    return 1 if heavy or total_ms > args.budget_ms else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,97 @@
+"""
+Compare the manifest parsers against the previous toml / yaml.safe_load /
+pkg_resources based implementation on large generated lockfiles.
+
+    python -m benchmarks.bench_parsers -n 5000
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.manifests import write_manifests
+from dep_license.utils import parse_file
+
+
+def legacy_parse(path, base_name):
+    import pkg_resources
+    import toml
+    import yaml
+
+    if base_name == "requirements.txt":
+        output = []
+        with open(path) as f:
+            for line in f:
+                if line.startswith("-"):
+                    continue
+                try:
+                    output += [r.name for r in pkg_resources.parse_requirements(line)]
+                except pkg_resources.RequirementParseError:
+                    pass
+        return output
+    if base_name == "pyproject.toml":
+        cf = toml.load(path)
+        reqs = cf["build-system"]["requires"]
+        output = [r.project_name for r in pkg_resources.parse_requirements(reqs)]
+        cf = toml.load(path)
+        deps = cf["tool"]["poetry"]["dependencies"]
+        return output + [k for k in deps if k != "python"]
+    if base_name in ("Pipfile", "poetry.lock"):
+        cf = toml.load(path)
+        if base_name == "Pipfile":
+            return list(cf["packages"])
+        return [p["name"] for p in cf["package"]]
+    if base_name == "conda.yml":
+        with open(path) as f:
+            cf = yaml.safe_load(f)
+        reqs = [i for r in cf["dependencies"] if isinstance(r, dict) for i in r["pip"]]
+        return [r.project_name for r in pkg_resources.parse_requirements(reqs)]
+    return None
+
+
+def import_cost(module):
+    """Seconds a fresh interpreter spends importing `module`."""
+
+    def python(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-W", "ignore", "-c", code], check=True)
+        return time.perf_counter() - start
+
+    return max(python(f"import {module}") - python("pass"), 0.0)
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("-n", "--dependencies", type=int, default=5000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    report = {"pkg_resources_import_seconds": round(import_cost("pkg_resources"), 4)}
+    with tempfile.TemporaryDirectory() as tmp:
+        for base_name, path in write_manifests(tmp, args.dependencies).items():
+            new, names = best_of(lambda: parse_file(path, base_name), args.repeat)
+            row = {"seconds": round(new, 4), "dependencies": len(names)}
+            if legacy_parse(path, base_name) is not None:
+                old, _ = best_of(lambda: legacy_parse(path, base_name), args.repeat)
+                row["legacy_seconds"] = round(old, 4)
+                row["speedup"] = round(old / new, 1) if new else None
+            report[base_name] = row
+    print(json.dumps(report, indent=4))
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
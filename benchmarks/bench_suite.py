@@ -0,0 +1,322 @@
+"""
+End-to-end benchmark of the `deplic` pipeline against local fixtures only.
+
+Stages:
+
+    discover  `--recursive` manifest discovery in a generated monorepo
+    parse   `parse_file()` on a generated manifest of every supported type
+    fetch   `start_concurrent()` / `start_async()` against the mock index
+    report  every output format, written to an in-memory stream
+    check   `LicensePolicy.check()` on every record
+
+Each stage reports its throughput, latency percentiles and the peak RSS of
+the process once it has run. The JSON report can be saved with `-o` and
+given to a later run with `--compare` to print the change per stage:
+
+    python -m benchmarks.bench_suite -o before.json
+    git checkout my-branch
+    python -m benchmarks.bench_suite --compare before.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import dep_license
+from benchmarks.manifests import write_manifests
+from benchmarks.mock_pypi import MockPyPIServer
+from dep_license import make_record
+from dep_license.policy import LicensePolicy
+from dep_license.report import report_writer
+from dep_license.utils import parse_file
+
+FORMATS = ["csv", "jsonl", "json", "github"]
+LICENSES = [
+    ("MIT", "License :: OSI Approved :: MIT License"),
+    ("Apache 2.0", "License :: OSI Approved :: Apache Software License"),
+    ("BSD", "License :: OSI Approved :: BSD License"),
+    ("GPLv3", "License :: OSI Approved :: GNU General Public License v3 (GPLv3)"),
+    ("", "License :: OSI Approved :: Mozilla Public License 2.0 (MPL 2.0)"),
+    ("AGPL 3.0", ""),
+]
+
+
+def percentiles(samples):
+    """Nearest-rank p50 / p90 / p99 / max of `samples` (seconds) in ms."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+    return {
+        "p50": round(rank(50) * 1000, 3),
+        "p90": round(rank(90) * 1000, 3),
+        "p99": round(rank(99) * 1000, 3),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+def peak_rss_mb():
+    """High-water resident set size of this process, or None if unknown."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024.0 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def stage(items, seconds, latencies, **extra):
+    row = {
+        "items": items,
+        "seconds": round(seconds, 4),
+        "items_per_second": round(items / seconds, 1) if seconds else None,
+        "latency_ms": percentiles(latencies),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    row.update(extra)
+    return row
+
+
+def make_tree(root, files, per_dir=30, services=300):
+    """A monorepo of `services` projects holding about `files` files."""
+    dirs = max(files // per_dir, 1)
+    services = min(services, dirs)
+    for i in range(dirs):
+        service = os.path.join(root, f"group-{i % 10}", f"service-{i % services}")
+        path = os.path.join(service, "src", f"pkg-{i}")
+        if i % 10 == 9:
+            path = os.path.join(service, "node_modules", f"pkg-{i}")
+        os.makedirs(path, exist_ok=True)
+        for j in range(per_dir):
+            open(os.path.join(path, f"module_{j}.py"), "w").close()
+        if i < services:
+            with open(os.path.join(service, "requirements.txt"), "w") as f:
+                f.write("requests\n")
+
+
+def bench_discover(files, repeat):
+    from dep_license.walk import find_manifests
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_tree(tmp, files)
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            found = find_manifests(tmp, dep_license.SUPPORTED_FILES)
+            latencies.append(time.perf_counter() - start)
+    return stage(
+        files * repeat, sum(latencies), latencies, unit="files", manifests=len(found)
+    )
+
+
+def bench_parse(n, repeat):
+    latencies = []
+    files = {}
+    count = 0
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        for base_name, path in write_manifests(tmp, n).items():
+            timings = []
+            for _ in range(repeat):
+                t = time.perf_counter()
+                count += len(parse_file(path, base_name))
+                timings.append(time.perf_counter() - t)
+            latencies += timings
+            files[base_name] = round(min(timings) * 1000, 3)
+    elapsed = time.perf_counter() - start
+    return stage(count, elapsed, latencies, unit="dependencies", best_ms=files)
+
+
+def bench_fetch(engine, deps, workers, server):
+    if engine == "async":
+        from dep_license.aio import iter_async as iterate
+    else:
+        iterate = dep_license.iter_concurrent
+
+    server.reset_counters()
+    arrivals = []
+    start = time.perf_counter()
+    records = []
+    for record in iterate(deps, max_workers=workers):
+        arrivals.append(time.perf_counter() - start)
+        records.append(record)
+    elapsed = time.perf_counter() - start
+    row = stage(
+        len(records),
+        elapsed,
+        arrivals,
+        unit="packages",
+        requests=len(server.requests),
+        connections=server.connections,
+    )
+    # latency here is the time until each record was yielded
+    row["time_to_result_ms"] = row.pop("latency_ms")
+    return row, records
+
+
+def synthetic_records(n):
+    records = []
+    for i in range(n):
+        license, classifier = LICENSES[i % len(LICENSES)]
+        info = {"license": license, "classifiers": [classifier] if classifier else []}
+        records.append(make_record(f"package-{i}", info))
+    return records
+
+
+def bench_report(records):
+    rows = {}
+    for fmt in FORMATS:
+        stream = io.StringIO()
+        writer = report_writer(fmt, [stream], list(dep_license.COLUMNS))
+        latencies = []
+        start = time.perf_counter()
+        for r in records:
+            t = time.perf_counter()
+            writer.write(r)
+            latencies.append(time.perf_counter() - t)
+        writer.close()
+        elapsed = time.perf_counter() - start
+        rows[fmt] = stage(
+            len(records), elapsed, latencies, unit="rows", bytes=stream.tell()
+        )
+    return rows
+
+
+def bench_check(records):
+    policy = LicensePolicy(banned=["AGPL-3.0", "GPL-3.0", "SSPL"], allowed=["LGPL"])
+    latencies = []
+    banned = 0
+    start = time.perf_counter()
+    for r in records:
+        t = time.perf_counter()
+        banned += policy.check(r) is not None
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    return stage(len(records), elapsed, latencies, unit="records", banned=banned)
+
+
+def environment():
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        )
+        commit = commit.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "version": dep_license.__version__,
+    }
+
+
+def throughputs(report, prefix=""):
+    """Flatten `items_per_second` of every (nested) stage of a report."""
+    out = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            if "items_per_second" in value:
+                out[prefix + key] = value["items_per_second"]
+            else:
+                out.update(throughputs(value, prefix + key + "."))
+    return out
+
+
+def compare(baseline, report):
+    """Return {stage: current / baseline throughput} for stages in both."""
+    old = throughputs(baseline.get("stages", {}))
+    new = throughputs(report["stages"])
+    return {
+        key: round(new[key] / old[key], 2)
+        for key in new
+        if old.get(key) and new[key] is not None
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "-n", "--dependencies", type=int, default=2000, help="per manifest"
+    )
+    parser.add_argument(
+        "--files", type=int, default=20000, help="in the discovered tree"
+    )
+    parser.add_argument("-p", "--packages", type=int, default=300, help="to fetch")
+    parser.add_argument("--records", type=int, default=20000, help="to report")
+    parser.add_argument("-w", "--workers", type=int, default=16)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("--engine", choices=["thread", "async", "both"], default="both")
+    parser.add_argument("--payload-size", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--connect-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--stages",
+        default="discover,parse,fetch,report,check",
+        help="comma separated stages to run",
+    )
+    parser.add_argument("-o", "--output", default=None, help="write the JSON here")
+    parser.add_argument("--compare", default=None, help="JSON report of a previous run")
+    args = parser.parse_args(argv)
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+
+    report = {
+        "environment": environment(),
+        "parameters": {k: v for k, v in vars(args).items() if k != "compare"},
+        "stages": {},
+    }
+    results = report["stages"]
+    if "discover" in stages:
+        results["discover"] = bench_discover(args.files, args.repeat)
+    if "parse" in stages:
+        results["parse"] = bench_parse(args.dependencies, args.repeat)
+    if "fetch" in stages:
+        deps = [f"package-{i}" for i in range(args.packages)]
+        engines = ["thread", "async"] if args.engine == "both" else [args.engine]
+        results["fetch"] = {}
+        url = dep_license.PYPYI_URL
+        with MockPyPIServer(
+            payload_size=args.payload_size,
+            latency=args.latency,
+            connect_latency=args.connect_latency,
+        ) as server:
+            dep_license.PYPYI_URL = server.url
+            try:
+                for engine in engines:
+                    results["fetch"][engine], _ = bench_fetch(
+                        engine, deps, args.workers, server
+                    )
+            finally:
+                dep_license.PYPYI_URL = url
+    if "report" in stages or "check" in stages:
+        records = synthetic_records(args.records)
+        if "report" in stages:
+            results["report"] = bench_report(records)
+        if "check" in stages:
+            results["check"] = bench_check(records)
+
+    if args.compare:
+        with open(args.compare) as f:
+            report["speedup"] = compare(json.load(f), report)
+
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
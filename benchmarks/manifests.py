@@ -0,0 +1,95 @@
+"""Generators for large synthetic dependency files of every supported type."""
+import json
+
+
+def names(n):
+    return [f"package-{i}" for i in range(n)]
+
+
+def requirements_txt(n):
+    return "".join(
+        f"{name}=={i % 10}.{i % 7}.0  # pinned\n" for i, name in enumerate(names(n))
+    )
+
+
+def pipfile(n):
+    lines = ["[packages]"]
+    lines += [f'"{name}" = "*"' for name in names(n)]
+    lines += ["", "[dev-packages]", 'pytest = "*"', ""]
+    return "\n".join(lines)
+
+
+def pipfile_lock(n):
+    entry = {"hashes": ["sha256:" + "0" * 64] * 2, "version": "==1.0.0"}
+    return json.dumps(
+        {
+            "_meta": {"pipfile-spec": 6, "requires": {}, "sources": []},
+            "default": {name: entry for name in names(n)},
+            "develop": {"pytest": entry},
+        },
+        indent=4,
+    )
+
+
+def pyproject_toml(n):
+    lines = ["[build-system]", 'requires = ["setuptools", "wheel"]', ""]
+    lines += ["[tool.poetry.dependencies]", 'python = "^3.8"']
+    lines += [f'{name} = "^1.0"' for name in names(n)]
+    return "\n".join(lines) + "\n"
+
+
+def setup_py(n):
+    reqs = ",\n".join(f'    "{name}>=1.0"' for name in names(n))
+    return (
+        "from setuptools import setup\n\n"
+        f"REQUIRED = [\n{reqs},\n]\n\n"
+        'setup(name="bench", version="1.0", install_requires=REQUIRED)\n'
+    )
+
+
+def conda_yml(n):
+    lines = ["name: bench", "dependencies:", "  - python=3.9", "  - pip:"]
+    lines += [f"    - {name}==1.0" for name in names(n)]
+    return "\n".join(lines) + "\n"
+
+
+def poetry_lock(n):
+    blocks = []
+    for name in names(n):
+        blocks.append(
+            "[[package]]\n"
+            f'name = "{name}"\n'
+            'version = "1.0.0"\n'
+            'description = "A synthetic package used for benchmarking"\n'
+            'category = "main"\n'
+            "optional = false\n"
+            'python-versions = ">=3.7"\n\n'
+            "[package.dependencies]\n"
+            'six = ">=1.0"\n'
+        )
+    blocks.append('[metadata]\nlock-version = "1.1"\npython-versions = "^3.8"\n')
+    return "\n".join(blocks)
+
+
+GENERATORS = {
+    "requirements.txt": requirements_txt,
+    "Pipfile": pipfile,
+    "Pipfile.lock": pipfile_lock,
+    "pyproject.toml": pyproject_toml,
+    "setup.py": setup_py,
+    "conda.yml": conda_yml,
+    "poetry.lock": poetry_lock,
+}
+
+
+def write_manifests(directory, n):
+    """Write one manifest of each supported type with `n` dependencies."""
+    import os
+
+    paths = {}
+    for base_name, generate in GENERATORS.items():
+        path = os.path.join(directory, base_name)
+        with open(path, "w") as f:
+            f.write(generate(n))
+        paths[base_name] = path
+    return paths
@@ -0,0 +1,214 @@
+"""
+Local mock of the PyPI JSON API, for the benchmarks and the test suite.
+
+`/pypi/<name>/json` and `/pypi/<name>/<version>/json` are answered with the
+payloads registered with `add`. With `synthetic`, any other name gets a
+generated payload padded with `payload_size` bytes of release data. Answers
+carry an `ETag` and revalidations get a `304`. `fail` queues error statuses
+for a name. `latency` delays each response and `connect_latency` delays
+every newly accepted connection, which stands in for the TCP/TLS handshake
+of a real index host.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+
+def make_info(name, license="MIT", classifiers=None, requires_dist=None):
+    """Minimal JSON API document, with an MIT classifier by default."""
+    if classifiers is None:
+        classifiers = ["License :: OSI Approved :: MIT License"]
+    return {
+        "info": {
+            "name": name,
+            "license": license,
+            "classifiers": classifiers,
+            "requires_dist": requires_dist,
+        },
+        "releases": {},
+        "urls": [],
+    }
+
+
+def synthetic_payload(name, size=0):
+    """PyPI-like JSON document padded with `size` bytes of release data."""
+    releases = {}
+    n = 0
+    while size > 0:
+        entry = {
+            "filename": f"{name}-{n}.0.0-py3-none-any.whl",
+            "digests": {"sha256": "0" * 64},
+            "url": f"https://files.example/{name}-{n}.0.0-py3-none-any.whl",
+        }
+        releases[f"{n}.0.0"] = [entry]
+        size -= len(json.dumps(entry))
+        n += 1
+    return {
+        "info": {
+            "name": name,
+            "version": "1.0.0",
+            "license": "MIT",
+            "classifiers": [
+                "Programming Language :: Python :: 3",
+                "License :: OSI Approved :: MIT License",
+            ],
+            "requires_dist": None,
+        },
+        "last_serial": 1,
+        "releases": releases,
+        "urls": [],
+    }
+
+
+def _etag(body):
+    return '"{}"'.format(abs(hash(body)))
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class MockPyPIServer(object):
+    def __init__(
+        self,
+        payload_size=0,
+        latency=0.0,
+        connect_latency=0.0,
+        port=0,
+        synthetic=True,
+    ):
+        self.payload_size = payload_size
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.synthetic = synthetic
+        self.packages = {}
+        self.failures = {}
+        self.requests = []
+        self.connections = 0
+        self._bodies = {}
+        self._lock = threading.Lock()
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with mock._lock:
+                    mock.connections += 1
+                if mock.connect_latency:
+                    time.sleep(mock.connect_latency)
+
+            def _empty(self, status, headers=()):
+                self.send_response(status)
+                for header in headers:
+                    self.send_header(*header)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                with mock._lock:
+                    mock.requests.append(self.path)
+                if mock.latency:
+                    time.sleep(mock.latency)
+                key = mock.key_for(self.path)
+                failure = mock.next_failure(key)
+                if failure is not None:
+                    status, retry_after = failure
+                    headers = (
+                        [] if retry_after is None else [("Retry-After", retry_after)]
+                    )
+                    self._empty(status, headers)
+                    return
+                found = mock.body_for(key)
+                if found is None:
+                    self._empty(404)
+                    return
+                body, etag = found
+                if self.headers.get("If-None-Match") == etag:
+                    self._empty(304, [("ETag", etag)])
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = _Server(("127.0.0.1", port), Handler)
+        self.url = "http://127.0.0.1:{}/pypi".format(self.server.server_address[1])
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    def add(
+        self, name, license="MIT", classifiers=None, version=None, requires_dist=None
+    ):
+        """Register the payload of `name`, or of one of its releases."""
+        key = name if version is None else f"{name}/{version}"
+        self.packages[key] = make_info(name, license, classifiers, requires_dist)
+
+    def fail(self, name, *statuses, retry_after=None):
+        """Answer the next requests for `name` with `statuses`."""
+        with self._lock:
+            self.failures.setdefault(name, []).extend(
+                (status, retry_after) for status in statuses
+            )
+
+    @staticmethod
+    def key_for(path):
+        """`name` or `name/version` of a JSON API path, or None."""
+        parts = [x for x in path.split("/") if x]
+        if len(parts) < 3 or parts[0] != "pypi" or parts[-1] != "json":
+            return None
+        return "/".join(parts[1:-1])
+
+    def next_failure(self, key):
+        with self._lock:
+            failures = self.failures.get(key)
+            return failures.pop(0) if failures else None
+
+    def body_for(self, key):
+        """(body, ETag) of the payload for `key`, or None."""
+        if key is None:
+            return None
+        payload = self.packages.get(key)
+        if payload is not None:
+            # registered payloads may be edited between requests
+            body = json.dumps(payload).encode()
+            return body, _etag(body)
+        if not self.synthetic:
+            return None
+        name = key.partition("/")[0]
+        with self._lock:
+            found = self._bodies.get(name)
+            if found is None:
+                body = json.dumps(synthetic_payload(name, self.payload_size)).encode()
+                found = self._bodies[name] = (body, _etag(body))
+        return found
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = []
+            self.connections = 0
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
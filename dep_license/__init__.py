@@ -1,20 +1,36 @@
 #!/usr/bin/env python
 import argparse
-import concurrent.futures
-import json
+import functools
 import logging
 import os
 import stat
 import subprocess
 import sys
 import tempfile
+import time
 import warnings
+from collections import OrderedDict
 from shutil import rmtree
-from urllib.request import urlopen
-
-import git
-from tabulate import tabulate
 
+from dep_license.backends import backend_from_spec
+from dep_license.backends import fetch_from
+from dep_license.backends import JsonApiBackend
+from dep_license.cache import DEFAULT_TTL
+from dep_license.cache import manifest_cache
+from dep_license.cache import MetadataCache
+from dep_license.cache import normalize_name
+from dep_license.fetch import MAX_RETRIES
+from dep_license.fetch import Session
+from dep_license.profile import NULL_PROFILER
+from dep_license.report import report_writer
+from dep_license.scheduler import attribute
+from dep_license.scheduler import scan_projects
+from dep_license.spdx import to_spdx
+from dep_license.state import dependencies_at
+from dep_license.state import dependency_key
+from dep_license.state import file_digest
+from dep_license.state import resolve_ref
+from dep_license.state import ScanState
 from dep_license.utils import parse_file
 
 logger = logging.getLogger("dep_license")
@@ -34,8 +50,8 @@ SUPPORTED_FILES = [
     "conda.yml",
     "poetry.lock",
 ]
-PYPYI_URL = "https://pypi.python.org/pypi"
-COLUMNS = ["Name", "Meta", "Classifier"]
+PYPYI_URL = "https://pypi.org/pypi"
+COLUMNS = ["Name", "Meta", "Classifier", "SPDX"]
 
 
 def is_valid_git_remote(project):
@@ -65,12 +81,98 @@ def get_params(argv=None):
     )
     parser.add_argument("PROJECT", nargs="+", help="path to project or its GIT repo")
     parser.add_argument(
-        "-w", "--workers", default=5, help="number of workers to run in parallel"
+        "-w",
+        "--workers",
+        type=int,
+        default=5,
+        help="number of workers to run in parallel",
+    )
+    parser.add_argument(
+        "--clone-workers",
+        type=int,
+        default=2,
+        help="number of remote GIT repos to clone in parallel",
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        action="store_true",
+        default=False,
+        help="also look for dependency files in the subdirectories of local "
+        "projects; each directory holding one is reported as a project",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="with --recursive, skip paths matching this gitignore-style "
+        "pattern (.gitignore and .deplicignore files are always honored)",
+    )
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        default=False,
+        help="fetch remote GIT repos with a shallow, blobless clone that checks "
+        "out only the dependency files (requires git >= 2.35)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["thread", "async"],
+        default="thread",
+        help="fetch PyPI metadata with a thread pool or with asyncio "
+        "over pooled keep-alive connections",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=None,
+        help="maximum PyPI requests per second (slowed down further on HTTP 429)",
+    )
+    parser.add_argument(
+        "--source",
+        action="append",
+        default=[],
+        metavar="SPEC",
+        help="package index to look metadata up in, in priority order: a JSON "
+        "API URL (PyPI, devpi), simple+URL for a PEP 691/658 simple index, or "
+        "a mirror directory (default: PyPI)",
+    )
+    parser.add_argument(
+        "--no-wheel-metadata",
+        action="store_true",
+        default=False,
+        help="do not read the license from a release's wheel (with HTTP range "
+        "requests) when the JSON API has none",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=MAX_RETRIES,
+        help="retries with exponential backoff for HTTP 429/5xx and "
+        "connection errors",
     )
     parser.add_argument(
-        "-f", "--format", default="github", help="define how result is formatted"
+        "-f",
+        "--format",
+        default="github",
+        help="define how result is formatted; csv, json and jsonl are "
+        "written row by row as results arrive",
     )
     parser.add_argument("-o", "--output", default=None, help="path for output file")
+    parser.add_argument(
+        "--transitive",
+        action="store_true",
+        default=False,
+        help="also report the dependencies of dependencies, with the path "
+        "that introduced each one",
+    )
+    parser.add_argument(
+        "--show-projects",
+        action="store_true",
+        default=False,
+        help="add a column listing the projects that use each dependency",
+    )
     parser.add_argument(
         "-d",
         "--dev",
@@ -79,6 +181,12 @@ def get_params(argv=None):
         help="include dev packages from Pipfile",
     )
     parser.add_argument("-n", "--name", default=None, help="name for dependency file")
+    parser.add_argument(
+        "--exec-setup",
+        action="store_true",
+        default=False,
+        help="execute setup.py files whose requirements cannot be read statically",
+    )
     parser.add_argument(
         "-c",
         "--check",
@@ -94,33 +202,87 @@ def get_params(argv=None):
         default=False,
         help="check against selected python executable",
     )
+    parser.add_argument(
+        "--installed",
+        action="store_true",
+        default=False,
+        help="with --env, read licenses from the metadata of installed "
+        "distributions instead of querying PyPI",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="directory for the PyPI metadata cache",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="do not read or write the PyPI metadata cache",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=int,
+        default=DEFAULT_TTL,
+        help="seconds before cached PyPI metadata is revalidated",
+    )
+    parser.add_argument(
+        "--index",
+        default=None,
+        help="offline license index built with `deplic index build`; "
+        "PyPI is only queried for packages missing from it",
+    )
+    parser.add_argument(
+        "--daemon",
+        default=os.environ.get("DEPLIC_DAEMON"),
+        metavar="ADDRESS",
+        help="look licenses up through a `deplic serve` daemon at "
+        "unix:/path/to/socket or host:port (default: $DEPLIC_DAEMON)",
+    )
+    parser.add_argument(
+        "--state",
+        default=None,
+        help="state file of the previous scan; unchanged manifests are not "
+        "checked again and only new or re-pinned dependencies are looked up",
+    )
+    parser.add_argument(
+        "--since",
+        default=None,
+        metavar="REF",
+        help="only report dependencies added or re-pinned since this git ref "
+        "of the local projects",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="print the time spent in each phase, request and cache counters "
+        "and the slowest packages to stderr",
+    )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        metavar="FILE",
+        help="write a Chrome trace-event JSON file (chrome://tracing, Perfetto)",
+    )
     parser.add_argument("-v", "--version", action="version", version=__version__)
 
     args = parser.parse_args(argv)
-    project = args.PROJECT
-    w = args.workers
-    fmt = args.format
-    output = args.output
-    dev = args.dev
-    name = args.name
-    check = args.check
-    env = args.env
-
-    return project, w, fmt, output, dev, name, check, env
+    if args.installed and not args.env:
+        parser.error("--installed requires --env")
+    if args.recursive and args.env:
+        parser.error("--recursive cannot be used with --env")
+    return args
 
 
-def worker(d):
+def clean_name(d):
     d = d.replace('"', "")
     d = d.replace("'", "")
-    record = [d]
-    try:
-        with urlopen("{}/{}/json".format(PYPYI_URL, d)) as conn:
-            output = json.loads(conn.read().decode()).get("info")
+    return d
 
-    except Exception:
-        logger.warning(f"{d}: error in fetching pypi metadata")
-        return None
 
+def make_record(d, output):
+    record = [d]
     meta = output.get("license", "")
     record.append(meta.strip() if meta is not None else "")
 
@@ -134,14 +296,65 @@ def worker(d):
         license_class.pop() if len(license_class) == 1 else ", ".join(license_class)
     )
     record.append(license_class_str)
+    record.append(to_spdx(meta, classifier))
 
     return dict(zip(COLUMNS, record))
 
 
-def start_concurrent(dependencies, max_workers=5):
-    results = []
+def fetch_metadata(session, d, cache=None, version=None):
+    """
+    PyPI `info` of release `version` of `d`, else of its latest release,
+    from the first of the session's backends that has it.
+    """
+    error = None
+    for backend in session.backends:
+        try:
+            return fetch_from(backend, session, d, cache, version)
+        except Exception as e:
+            logger.debug(f"{backend}: {d}: {e}")
+            error = e
+    raise error
+
+
+def worker(d, cache=None, version=None, index=None, session=None):
+    if version is None:
+        version = getattr(d, "version", None)
+    d = clean_name(d)
+    if index is not None:
+        output = index.get(d)
+        if output is not None:
+            return make_record(d, output)
+    if session is None:
+        session = Session()
+    try:
+        output = fetch_metadata(session, d, cache=cache, version=version)
+
+    except Exception:
+        logger.warning(f"{d}: error in fetching pypi metadata")
+        return None
+
+    return make_record(d, output)
+
+
+def iter_concurrent(dependencies, max_workers=5, cache=None, index=None, session=None):
+    """Yield records as soon as each worker completes."""
+    import concurrent.futures
+
+    if session is None:
+        session = Session()
+    profiler = session.profiler
+
+    def timed_worker(x, submitted):
+        queue_wait = time.perf_counter() - submitted
+        profiler.observe("queue wait", queue_wait)
+        with profiler.span(clean_name(x), "fetch", queue_wait=round(queue_wait, 3)):
+            return worker(x, cache=cache, index=index, session=session)
+
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_worker = {executor.submit(worker, x): x for x in dependencies}
+        future_to_worker = {
+            executor.submit(timed_worker, x, time.perf_counter()): x
+            for x in dependencies
+        }
         for future in concurrent.futures.as_completed(future_to_worker):
             dependency = future_to_worker[future]
             try:
@@ -151,150 +364,537 @@ def start_concurrent(dependencies, max_workers=5):
                 continue
             else:
                 if data:
-                    results.append(data)
+                    yield data
+
+
+def start_concurrent(dependencies, max_workers=5, cache=None, index=None, session=None):
+    return list(
+        iter_concurrent(
+            dependencies,
+            max_workers=max_workers,
+            cache=cache,
+            index=index,
+            session=session,
+        )
+    )
 
-    return results
 
+def clone_project(project, req_files, parse=parse_file):
+    import git
 
-def run(argv=None):
-    warnings.simplefilter("ignore", UserWarning)
+    dependencies = []
+    temp_dir = tempfile.TemporaryDirectory()
+    git.Git(temp_dir.name).clone(project)
+    dir_name = os.path.join(temp_dir.name, project.rsplit("/", 1)[-1].split(".")[0])
+    for f in req_files:
+        f_name = os.path.join(dir_name, f)
+        if os.path.isfile(f_name):
+            dependencies += parse(f_name, f)
+    if sys.platform.startswith("win"):
+        rmtree(temp_dir.name, onerror=readonly_handler)
+    else:
+        temp_dir.cleanup()
+    return dependencies
 
-    projects, max_workers, fmt, output_file, dev, name, check, env = get_params(argv)
-    return_val = 0
 
-    if name:
-        req_files = [name]
+def sparse_checkout(project, dest, req_files):
+    """
+    Clone `project` into `dest` with history depth 1, without blobs, and
+    check out only the dependency files at the root of the repo.
+    """
+    import git
+
+    git.Git().clone(
+        "--depth", "1", "--filter=blob:none", "--no-checkout", "--quiet", project, dest
+    )
+    g = git.Git(dest)
+    g.sparse_checkout("set", "--no-cone", *["/" + f for f in req_files])
+    g.checkout("--quiet")
+    return dest
+
+
+def sparse_clone_project(project, req_files, parse=parse_file):
+    """
+    Return the dependencies of a remote repo using a sparse clone, or None if
+    it cannot be cloned.
+    """
+    import git
+
+    dependencies = []
+    temp_dir = tempfile.TemporaryDirectory()
+    try:
+        dir_name = sparse_checkout(
+            project, os.path.join(temp_dir.name, "repo"), req_files
+        )
+    except git.GitCommandError as e:
+        logger.debug(f"{project}: {e}")
+        dependencies = None
     else:
-        req_files = SUPPORTED_FILES
+        for f in req_files:
+            f_name = os.path.join(dir_name, f)
+            if os.path.isfile(f_name):
+                dependencies += parse(f_name, f)
+    finally:
+        if sys.platform.startswith("win"):
+            rmtree(temp_dir.name, onerror=readonly_handler)
+        else:
+            temp_dir.cleanup()
+    return dependencies
+
+
+def collect_project(
+    project,
+    req_files,
+    parse=parse_file,
+    env=False,
+    installed=False,
+    sparse=False,
+    profiler=NULL_PROFILER,
+):
+    """
+    Return the dependencies of a single PROJECT argument, together with the
+    records already resolved from installed metadata (for --installed).
 
+    `parse` is called as `parse(path, base_name)` for every manifest found.
+    """
     dependencies = []
+    records = {}
 
-    for project in projects:
-        if env:
-            if not os.path.isfile(project):
-                logger.error(f"{project} is invalid python executable.")
-                continue
-            try:
-                out = subprocess.check_output([project, "-m", "pip", "freeze"])
-                if out:
-                    try:
-                        f = tempfile.NamedTemporaryFile(delete=False)
-                        f.write(out)
-                        f.close()
-                        dependencies += parse_file(f.name, "requirements.txt", dev=dev)
-                    finally:
-                        os.remove(f.name)
-            except Exception:
-                logger.error(f"{project}: error in freezing dependencies.")
-
-        elif os.path.isdir(os.path.abspath(project)):
-            project = os.path.abspath(project)
-            for f in req_files:
-                filename = os.path.join(project, f)
-                if os.path.isfile(filename):
-                    dependencies += parse_file(filename, f, dev=dev)
-
-        elif os.path.isfile(os.path.abspath(project)):
-            project = os.path.abspath(project)
-            filename = os.path.basename(project)
-            if filename in req_files:
-                dependencies += parse_file(project, filename, dev=dev)
-
-        elif is_valid_git_remote(project):
-            temp_dir = tempfile.TemporaryDirectory()
-            git.Git(temp_dir.name).clone(project)
-            dir_name = os.path.join(
-                temp_dir.name, project.rsplit("/", 1)[-1].split(".")[0]
-            )
-            for f in req_files:
-                f_name = os.path.join(dir_name, f)
-                if os.path.isfile(f_name):
-                    dependencies += parse_file(f_name, f, dev=dev)
-            if sys.platform.startswith("win"):
-                rmtree(temp_dir.name, onerror=readonly_handler)
-            else:
-                temp_dir.cleanup()
+    if env and installed:
+        if not os.path.isfile(project):
+            logger.error(f"{project} is invalid python executable.")
+            return dependencies, records
+        from dep_license.installed import installed_distributions
 
+        try:
+            for d, info in installed_distributions(project):
+                records.setdefault(d, make_record(d, info))
+                dependencies.append(d)
+        except Exception:
+            logger.error(f"{project}: error in reading installed metadata.")
+
+    elif env:
+        if not os.path.isfile(project):
+            logger.error(f"{project} is invalid python executable.")
+            return dependencies, records
+        try:
+            out = subprocess.check_output([project, "-m", "pip", "freeze"])
+            if out:
+                try:
+                    f = tempfile.NamedTemporaryFile(delete=False)
+                    f.write(out)
+                    f.close()
+                    dependencies += parse(f.name, "requirements.txt")
+                finally:
+                    os.remove(f.name)
+        except Exception:
+            logger.error(f"{project}: error in freezing dependencies.")
+
+    elif os.path.isdir(os.path.abspath(project)):
+        project = os.path.abspath(project)
+        for f in req_files:
+            filename = os.path.join(project, f)
+            if os.path.isfile(filename):
+                dependencies += parse(filename, f)
+
+    elif os.path.isfile(os.path.abspath(project)):
+        project = os.path.abspath(project)
+        filename = os.path.basename(project)
+        if filename in req_files:
+            dependencies += parse(project, filename)
+
+    elif sparse:
+        with profiler.span("sparse clone", "git", project=project):
+            deps = sparse_clone_project(project, req_files, parse=parse)
+        if deps is None:
+            logger.error(f"{project} is invalid project.")
+        else:
+            dependencies += deps
+
+    else:
+        with profiler.span("is_valid_git_remote", "git", project=project):
+            valid = is_valid_git_remote(project)
+        if valid:
+            with profiler.span("clone", "git", project=project):
+                dependencies += clone_project(project, req_files, parse=parse)
         else:
             logger.error(f"{project} is invalid project.")
 
-    dependencies = list(set(dependencies))
-    if len(dependencies) == 0:
-        print("no dependencies found")
-        return 1
+    return dependencies, records
 
-    print("Found dependencies: {}\n".format(len(dependencies)))
-    logger.debug("Running with {} workers ...".format(max_workers))
 
-    results = start_concurrent(dependencies, max_workers=max_workers)
-    if len(results) == 0:
-        logger.error("no license information found")
-        return 1
+def discover_projects(projects, req_files, exclude=()):
+    """
+    Replace every local directory in `projects` by its subdirectories (itself
+    included) that hold a dependency file.
+    """
+    from dep_license.walk import find_projects
 
-    output = ""
-    fmt = fmt.lower()
-    if fmt == "json":
-        import json
+    expanded = []
+    for project in projects:
+        root = os.path.abspath(project)
+        if not os.path.isdir(root):
+            expanded.append(project)
+            continue
+        found = find_projects(root, req_files, exclude)
+        expanded += [
+            os.path.normpath(os.path.join(project, os.path.relpath(d, root)))
+            for d in found
+        ] or [project]
+    return list(OrderedDict.fromkeys(expanded))
 
-        output = json.dumps(results, indent=4)
 
+def run(argv=None):
+    warnings.simplefilter("ignore", UserWarning)
+
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["index"]:
+        from dep_license.index import index_main
+
+        return index_main(argv[1:])
+    if argv[:1] == ["serve"]:
+        from dep_license.server import serve_main
+
+        return serve_main(argv[1:])
+
+    args = get_params(argv)
+    profiler = NULL_PROFILER
+    if args.profile or args.trace:
+        from dep_license.profile import Profiler
+
+        profiler = Profiler()
+    if args.name:
+        req_files = [args.name]
     else:
-        rows = []
-        for r in results:
-            rows.append(list(r.values()))
-        if fmt == "csv":
-            output += ",".join(COLUMNS) + "\n"
-            for row in rows:
-                output += ",".join(row) + "\n"
-        else:
-            output = tabulate(rows, COLUMNS, tablefmt=fmt)
+        req_files = SUPPORTED_FILES
 
-    if not check:
-        print(output, end="\n")
+    cache = None
+    manifests = None
+    if not args.no_cache:
+        try:
+            cache = MetadataCache(args.cache_dir, ttl=args.cache_ttl)
+            manifests = manifest_cache(args.cache_dir)
+        except Exception as e:
+            logger.warning(f"metadata cache disabled: {e}")
 
-    if output_file:
-        with open(output_file, "w") as f:
-            f.write(output)
-            f.close()
-            print("output file is stored in {}".format(os.path.abspath(output_file)))
+    try:
+        with profiler.span("run"):
+            return _run(args, req_files, cache, manifests, profiler)
+    finally:
+        for c in (cache, manifests):
+            if c is not None:
+                c.close()
+        if args.profile:
+            print("\n" + profiler.summary(), file=sys.stderr)
+        if args.trace:
+            profiler.write_trace(args.trace)
+            print(f"trace is stored in {os.path.abspath(args.trace)}", file=sys.stderr)
+
+
+def _run(args, req_files, cache, manifests, profiler=NULL_PROFILER):
+    try:
+        backends = [
+            backend_from_spec(spec, not args.no_wheel_metadata) for spec in args.source
+        ] or [JsonApiBackend(wheel_metadata=not args.no_wheel_metadata)]
+    except ValueError as e:
+        logger.error(f"{e}")
+        return 1
+    projects = args.PROJECT
+    if args.recursive:
+        with profiler.span("discover projects"):
+            projects = discover_projects(projects, req_files, args.exclude)
+    max_workers = args.workers
+    fmt = args.format
+    output_file = args.output
+    check = args.check
+    env = args.env
+    return_val = 0
 
-    if check:
-        import configparser
-        from difflib import get_close_matches
+    parse = functools.partial(
+        parse_file, dev=args.dev, exec_setup=args.exec_setup, cache=manifests
+    )
+    digests = {}
+
+    def collect(project):
+        def parse_manifest(filename, base_name):
+            if args.state:
+                digests[f"{project}:{base_name}"] = file_digest(filename)
+            with profiler.span(base_name, "parse", project=project):
+                return parse(filename, base_name)
+
+        with profiler.span(project, "collect"):
+            return collect_project(
+                project,
+                req_files,
+                parse=parse_manifest,
+                env=env,
+                installed=args.installed,
+                sparse=args.sparse,
+                profiler=profiler,
+            )
+
+    def is_remote(project):
+        return not env and not os.path.exists(os.path.abspath(project))
+
+    with profiler.span("scan projects"):
+        scanned = scan_projects(
+            projects,
+            collect,
+            is_remote,
+            max_workers=max_workers,
+            clone_workers=args.clone_workers,
+        )
+    resolved = {}
+    for deps, records in scanned.values():
+        for d, record in records.items():
+            resolved.setdefault(normalize_name(d), record)
+    dependencies, usage = attribute(
+        OrderedDict((p, deps) for p, (deps, _) in scanned.items())
+    )
+    if len(dependencies) == 0:
+        print("no dependencies found")
+        return 1
 
+    since = None
+    if args.since:
+        since = []
+        before = set()
+        for p in projects:
+            if is_remote(p) or env:
+                logger.error(f"{p}: --since only works with local projects")
+                return 1
+            commit = resolve_ref(p, args.since)
+            if commit is None:
+                logger.error(f"{p}: {args.since} is not a git revision")
+                return 1
+            since.append(commit)
+            with profiler.span("since", ref=args.since):
+                for d in dependencies_at(p, args.since, req_files, parse):
+                    before.add(dependency_key(d))
+        dependencies = [d for d in dependencies if dependency_key(d) not in before]
+        if not dependencies:
+            print(f"no dependency changes since {args.since}")
+            return 0
+
+    state = previous = None
+    if args.state:
+        state = ScanState(
+            settings={
+                "name": args.name,
+                "dev": args.dev,
+                "exec_setup": args.exec_setup,
+                "env": env,
+                "installed": args.installed,
+                "transitive": args.transitive,
+                "show_projects": args.show_projects,
+                "index": os.path.abspath(args.index) if args.index else None,
+                "sources": args.source,
+                "wheel_metadata": not args.no_wheel_metadata,
+                "since": since,
+            },
+            manifests=digests,
+            dependencies=[dependency_key(d) for d in dependencies],
+        )
+        previous = ScanState.load(args.state)
+    replay = previous is not None and previous.unchanged(state)
+
+    session = Session(
+        rate=args.rate_limit,
+        retries=args.retries,
+        profiler=profiler,
+        backends=backends,
+    )
+    paths = None
+    if replay:
+        print("Found dependencies: {}\n".format(len(dependencies)))
+        print(f"Manifests unchanged since the last scan, reusing {args.state}\n")
+    elif args.transitive:
+        installed = {}
+        if env and args.installed:
+            from dep_license.installed import installed_distributions
+
+            for p in projects:
+                if os.path.isfile(p):
+                    for d, info in installed_distributions(p):
+                        installed.setdefault(normalize_name(d), info)
+
+        def fetch(name):
+            info = installed.get(normalize_name(name))
+            if info is None:
+                version = getattr(name, "version", None)
+                info = fetch_metadata(session, clean_name(name), cache, version)
+            return info
+
+        top_level = len(dependencies)
+        with profiler.span("transitive"):
+            dependencies, paths, records = transitive_closure(
+                dependencies, fetch, max_workers=max_workers
+            )
+        for key, record in records.items():
+            resolved.setdefault(key, record)
+        print(
+            "Found dependencies: {} ({} including transitive)\n".format(
+                top_level, len(dependencies)
+            )
+        )
+    else:
+        print("Found dependencies: {}\n".format(len(dependencies)))
+    if previous is not None and not replay and previous.settings == state.settings:
+        # records made with other sources, an index or --installed may differ
+        reused = 0
+        for d in dependencies:
+            record = previous.record(d)
+            if record is not None and normalize_name(d) not in resolved:
+                resolved[normalize_name(d)] = {c: record.get(c, "") for c in COLUMNS}
+                reused += 1
+        print(
+            "Reusing {} results from {}, looking up {}\n".format(
+                reused, args.state, len(dependencies) - reused
+            )
+        )
+    logger.debug("Running with {} workers ...".format(max_workers))
+
+    policy = None
+    if check:
         if not os.path.isfile(check):
             logger.error("configuration file not found")
             return 1
-        config = configparser.ConfigParser()
-        config.read(check)
+        from dep_license.policy import LicensePolicy
+
+        policy = LicensePolicy.from_config(check)
+
+    index = None
+    if args.index:
+        from dep_license.index import LicenseIndex
+
         try:
-            banned_licenses = config.get("deplic", "banned")
-        except Exception:
-            banned_licenses = None
-
-        if banned_licenses:
-            banned_licenses = banned_licenses.split(",")
-            banned_licenses = [x.lower().strip() for x in banned_licenses if x]
-            banned_licenses = list(set(banned_licenses))
-            for r in results:
-                name = r.get("Name")
-                meta = r.get("Meta")
-                classifier = r.get("Classifier")
-                if get_close_matches(
-                    meta.lower().replace("license", "").strip(), banned_licenses
-                ) or get_close_matches(
-                    classifier.lower()
-                    .replace("license", "")
-                    .replace("osi approved::", "")
-                    .strip(),
-                    banned_licenses,
-                ):
+            index = LicenseIndex(args.index)
+        except (OSError, ValueError) as e:
+            logger.error(f"{args.index}: {e}")
+            return 1
+
+    columns = list(COLUMNS)
+    if args.show_projects:
+        columns.append("Projects")
+    if args.transitive:
+        columns.append("Path")
+    streams = [] if check else [sys.stdout]
+    out = open(output_file, "w") if output_file else None
+    if out is not None:
+        streams.append(out)
+    writer = report_writer(fmt, streams, columns)
+    keys = {normalize_name(d): dependency_key(d) for d in dependencies}
+    reported = OrderedDict()
+    try:
+        if replay:
+            records = (dict(r) for r in previous.records.values())
+        else:
+            records = iter_records(dependencies, resolved, args, session, cache, index)
+        with profiler.span("fetch and report"):
+            for r in records:
+                key = normalize_name(r["Name"])
+                path = paths.get(key, [r["Name"]]) if paths is not None else None
+                if path is not None:
+                    r["Path"] = " > ".join(path)
+                if args.show_projects and not replay:
+                    root = normalize_name(path[0]) if path is not None else key
+                    r["Projects"] = ", ".join(usage.get(root, []))
+                t = time.perf_counter()
+                writer.write(r)
+                profiler.observe("write row", time.perf_counter() - t)
+                if state is not None:
+                    reported[keys.get(key, key)] = r
+                t = time.perf_counter()
+                verdict = policy.check(r) if policy is not None else None
+                profiler.observe("policy check", time.perf_counter() - t)
+                if verdict is not None:
                     print(
                         f"\x1b[1;31mBANNED\x1b[0m: "
-                        f"\x1b[1;33m{name}\x1b[0m "
-                        f":: \x1b[1;33m{meta} - {classifier}\x1b[0m",
+                        f"\x1b[1;33m{r['Name']}\x1b[0m "
+                        f":: \x1b[1;33m{r['Meta']} - {r['Classifier']}\x1b[0m "
+                        f"({verdict.rule} match of {verdict.license!r} "
+                        f"against {verdict.entry!r})",
                         end="\n",
+                        flush=True,
                     )
                     return_val = 1
+        if writer.count:
+            with profiler.span("close report", fmt=fmt):
+                writer.close()
+    finally:
+        if out is not None:
+            out.close()
+        if index is not None:
+            index.close()
+
+    if writer.count == 0:
+        logger.error("no license information found")
+        return 1
+
+    if state is not None:
+        state.records = reported
+        try:
+            state.save(args.state)
+        except OSError as e:
+            logger.warning(f"{args.state}: state not saved: {e}")
+
+    if output_file:
+        print("output file is stored in {}".format(os.path.abspath(output_file)))
 
     return return_val
+
+
+def transitive_closure(dependencies, fetch, max_workers=5):
+    """
+    Expand `dependencies` through their requirements.
+
+    Return the names of every package in the closure, the path that
+    introduced each one (keyed by normalized name) and the records built
+    from the metadata fetched along the way.
+    """
+    from dep_license.graph import DependencyGraph
+
+    graph = DependencyGraph(fetch, max_workers=max_workers)
+    paths = graph.expand(dependencies)
+    records = {
+        key: make_record(clean_name(graph.names[key]), info)
+        for key, info in graph.info.items()
+        if info is not None
+    }
+    return [graph.names[key] for key in paths], paths, records
+
+
+def iter_records(dependencies, resolved, args, session, cache=None, index=None):
+    """
+    Yield a record per dependency as soon as it is resolved: first those
+    already known (installed metadata, transitive expansion), then the ones
+    fetched from PyPI.
+    """
+    remote = []
+    for d in dependencies:
+        record = resolved.get(normalize_name(d))
+        if record is not None:
+            yield record
+        else:
+            remote.append(d)
+    if not remote:
+        return
+    if args.daemon:
+        from dep_license.server import DaemonClient
+        from dep_license.server import iter_daemon
+
+        try:
+            records = list(iter_daemon(remote, DaemonClient(args.daemon)))
+        except (OSError, ValueError) as e:
+            logger.warning(f"daemon {args.daemon}: {e}, fetching directly")
+        else:
+            yield from records
+            return
+    if args.engine == "async":
+        from dep_license.aio import iter_async as engine
+    else:
+        engine = iter_concurrent
+    yield from engine(
+        remote, max_workers=args.workers, cache=cache, index=index, session=session
+    )
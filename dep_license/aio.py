@@ -0,0 +1,383 @@
+"""
+asyncio fetch engine.
+
+Requests are multiplexed over a small pool of persistent HTTP/1.1
+keep-alive connections per index host, so a run over hundreds of
+dependencies pays for a handful of TCP/TLS handshakes instead of one per
+package. Records are built with the same code as `worker()`.
+"""
+import asyncio
+import io
+import logging
+import queue
+import ssl
+import threading
+import time
+from urllib.parse import urljoin
+from urllib.parse import urlsplit
+
+import dep_license
+from dep_license.backends import fetch_from
+from dep_license.backends import JsonApiBackend
+from dep_license.fetch import conditional_headers
+from dep_license.fetch import extract_info
+from dep_license.fetch import info_url
+from dep_license.fetch import is_transient
+from dep_license.fetch import lookup_cache
+from dep_license.fetch import MAX_REDIRECTS
+from dep_license.fetch import REDIRECT_CODES
+from dep_license.fetch import RETRY_STATUSES
+from dep_license.fetch import Session
+from dep_license.fetch import store_info
+
+logger = logging.getLogger("dep_license")
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, url, status, headers=None):
+        super().__init__(f"{url}: HTTP {status}")
+        self.url = url
+        self.status = status
+        self.headers = headers or {}
+
+
+class Response(object):
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class ConnectionPool(object):
+    """
+    Keep-alive HTTP/1.1 connections grouped by (scheme, host, port).
+
+    At most `size` requests are in flight at a time; idle connections are
+    reused before new ones are opened. Rate limiting and retries follow the
+    `dep_license.fetch.Session` given as `session`.
+    """
+
+    def __init__(self, size=5, ssl_context=None, session=None):
+        self.size = size
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.session = session or Session()
+        self._idle = {}
+        self._inflight = {}
+        self._semaphore = asyncio.Semaphore(size)
+        self.opened = 0
+
+    async def _open(self, origin):
+        scheme, host, port = origin
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self.ssl_context if scheme == "https" else None
+        )
+        self.opened += 1
+        self.session.profiler.count("connections")
+        return reader, writer
+
+    def _release(self, origin, conn, reusable):
+        if reusable:
+            self._idle.setdefault(origin, []).append(conn)
+        else:
+            conn[1].close()
+
+    async def request(self, url, headers=None):
+        location = url
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await self._request(location, headers or {})
+            if response.status in REDIRECT_CODES and "location" in response.headers:
+                location = urljoin(location, response.headers["location"])
+                continue
+            return response
+        raise HTTPStatusError(url, response.status)
+
+    async def _request(self, url, headers):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        origin = (parts.scheme, parts.hostname, port)
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{port}"
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {host}",
+            "User-Agent: deplic",
+            "Accept: application/json",
+            "Accept-Encoding: identity",
+            "Connection: keep-alive",
+        ]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        payload = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        queued = time.perf_counter()
+        async with self._semaphore:
+            self.session.profiler.observe("queue wait", time.perf_counter() - queued)
+            idle = self._idle.get(origin)
+            reused = bool(idle)
+            conn = idle.pop() if reused else await self._open(origin)
+            try:
+                response, reusable = await self._exchange(conn, payload)
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                conn[1].close()
+                if not reused:
+                    raise
+                # the server dropped an idle connection, retry on a fresh one
+                conn = await self._open(origin)
+                try:
+                    response, reusable = await self._exchange(conn, payload)
+                except Exception:
+                    conn[1].close()
+                    raise
+            except BaseException:
+                conn[1].close()
+                raise
+            self._release(origin, conn, reusable)
+        return response
+
+    async def _exchange(self, conn, payload):
+        reader, writer = conn
+        writer.write(payload)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        version, status = status_line.decode("latin-1").split(None, 2)[:2]
+        status = int(status)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+
+        reusable = (
+            version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        )
+        if status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self._read_chunked(reader)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            reusable = False
+        return Response(status, headers, body), reusable
+
+    async def _read_chunked(self, reader):
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip(), 16)
+            if size == 0:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        return b"".join(chunks)
+
+    def close(self):
+        for conns in self._idle.values():
+            for _, writer in conns:
+                writer.close()
+        self._idle = {}
+
+
+async def fetch_info_async(pool, name, base_url, cache=None, version=None):
+    """
+    asyncio counterpart of `dep_license.fetch.Session.fetch_info`.
+
+    Concurrent calls for the same package share one request. The body is
+    read in full so the connection can go back to the pool, but only the
+    `info` object is decoded.
+    """
+    profiler = pool.session.profiler
+    key, entry = lookup_cache(name, cache, version, base_url)
+    if entry is not None and entry.fresh:
+        profiler.count("cache hits")
+        return entry.data
+
+    task = pool._inflight.get(key)
+    if task is not None:
+        profiler.count("coalesced")
+    else:
+        task = asyncio.ensure_future(
+            _fetch_with_retry(pool, name, base_url, cache, version)
+        )
+        pool._inflight[key] = task
+        task.add_done_callback(lambda _: pool._inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def _fetch_with_retry(pool, name, base_url, cache, version):
+    session = pool.session
+    for attempt in range(session.retries + 1):
+        wait = session.limiter.reserve()
+        if wait:
+            session.profiler.observe("rate limit wait", wait)
+        await asyncio.sleep(wait)
+        try:
+            info = await _fetch(pool, name, base_url, cache, version)
+        except HTTPStatusError as e:
+            if e.status not in RETRY_STATUSES or attempt == session.retries:
+                raise
+            delay = session.retry(name, attempt, e.status, e.headers.get("retry-after"))
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            transient = is_transient(e) or not isinstance(e, OSError)
+            if not transient or attempt == session.retries:
+                raise
+            delay = session.retry(name, attempt, e)
+        else:
+            session.limiter.recover()
+            return info
+        await asyncio.sleep(delay)
+
+
+async def _fetch(pool, name, base_url, cache, version):
+    key, entry = lookup_cache(name, cache, version, base_url)
+    url = info_url(base_url, name, version)
+    response = await pool.request(url, conditional_headers(entry))
+    profiler = pool.session.profiler
+    profiler.count("requests")
+    profiler.count("bytes", len(response.body))
+    if response.status == 304 and entry is not None:
+        profiler.count("cache revalidated")
+        cache.touch(key)
+        return entry.data
+    if response.status != 200:
+        raise HTTPStatusError(url, response.status, response.headers)
+
+    info = extract_info(io.BytesIO(response.body))
+    if cache is not None:
+        profiler.count("cache misses")
+    store_info(
+        cache,
+        key,
+        info,
+        {
+            "ETag": response.headers.get("etag"),
+            "Last-Modified": response.headers.get("last-modified"),
+        },
+        version,
+    )
+    return info
+
+
+async def fetch_from_async(pool, backend, d, cache=None, version=None):
+    """
+    `fetch_from()` on the event loop. Only JSON API backends speak through
+    the connection pool; the others run in the default executor.
+    """
+    if not isinstance(backend, JsonApiBackend):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, fetch_from, backend, pool.session, d, cache, version
+        )
+    info = None
+    if version:
+        try:
+            info = await fetch_info_async(
+                pool, d, backend.base_url, cache=cache, version=version
+            )
+        except Exception as e:
+            logger.debug(f"{backend}: {d}=={version}: {e}, using the latest release")
+    if info is None:
+        info = await fetch_info_async(pool, d, backend.base_url, cache=cache)
+    if backend.needs_completion(info):
+        loop = asyncio.get_running_loop()
+        info = await loop.run_in_executor(
+            None, backend.complete, pool.session, d, info, cache
+        )
+    return info
+
+
+async def fetch_metadata_async(pool, d, cache=None, version=None):
+    """`dep_license.fetch_metadata()` on the event loop."""
+    error = None
+    for backend in pool.session.backends:
+        try:
+            return await fetch_from_async(pool, backend, d, cache, version)
+        except Exception as e:
+            logger.debug(f"{backend}: {d}: {e}")
+            error = e
+    raise error
+
+
+async def async_worker(pool, d, cache=None, version=None, index=None):
+    if version is None:
+        version = getattr(d, "version", None)
+    d = dep_license.clean_name(d)
+    if index is not None:
+        output = index.get(d)
+        if output is not None:
+            return dep_license.make_record(d, output)
+    try:
+        with pool.session.profiler.span(d, "fetch", concurrent=True):
+            output = await fetch_metadata_async(pool, d, cache=cache, version=version)
+    except Exception:
+        logger.warning(f"{d}: error in fetching pypi metadata")
+        return None
+
+    return dep_license.make_record(d, output)
+
+
+async def _gather(dependencies, max_workers, cache, index, emit, session=None):
+    pool = ConnectionPool(size=max_workers, session=session)
+    try:
+        tasks = [async_worker(pool, x, cache=cache, index=index) for x in dependencies]
+        for future in asyncio.as_completed(tasks):
+            try:
+                data = await future
+            except Exception as e:  # pragma: no cover
+                logger.error(f"{e}")
+                continue
+            if data:
+                emit(data)
+    finally:
+        pool.close()
+
+
+def iter_async(dependencies, max_workers=5, cache=None, index=None, session=None):
+    """
+    Yield records as soon as they are fetched.
+
+    The event loop runs in a background thread so the caller can consume
+    records from a plain generator, like `iter_concurrent()`.
+    """
+    results = queue.Queue()
+    done = object()
+    errors = []
+
+    def target():
+        try:
+            asyncio.run(
+                _gather(dependencies, max_workers, cache, index, results.put, session)
+            )
+        except BaseException as e:  # pragma: no cover
+            errors.append(e)
+        finally:
+            results.put(done)
+
+    thread = threading.Thread(target=target, name="deplic-aio", daemon=True)
+    thread.start()
+    while True:
+        item = results.get()
+        if item is done:
+            break
+        yield item
+    thread.join()
+    if errors:  # pragma: no cover
+        raise errors[0]
+
+
+def start_async(dependencies, max_workers=5, cache=None, index=None, session=None):
+    results = []
+    asyncio.run(
+        _gather(dependencies, max_workers, cache, index, results.append, session)
+    )
+    return results
@@ -0,0 +1,252 @@
+"""
+Package index backends.
+
+Metadata is looked up in every backend of the fetch `Session`, in priority
+order, until one answers (`--source`, by default the PyPI JSON API):
+
+    JsonApiBackend      the JSON API (`<url>/<name>/json`) of PyPI, devpi,
+                        a caching proxy, ...
+    SimpleIndexBackend  a PEP 691 JSON simple index, reading the METADATA
+                        file served next to each wheel (PEP 658 / 714)
+    MirrorBackend       a directory of JSON API documents, like the `web/`
+                        tree of a bandersnatch mirror
+
+A backend raises an error (`LookupError`, an HTTP error, ...) when it
+cannot answer, and the next one is asked.
+"""
+import json
+import logging
+import os
+import re
+from urllib.parse import urljoin
+
+import dep_license
+from dep_license.cache import normalize_name
+from dep_license.fetch import extract_info
+from dep_license.fetch import lookup_cache
+from dep_license.fetch import store_info
+from dep_license.wheel import complete_from_wheel
+from dep_license.wheel import lacks_license
+
+logger = logging.getLogger("dep_license")
+
+SIMPLE_JSON = "application/vnd.pypi.simple.v1+json"
+
+_RELEASE = re.compile(r"(\d+(?:\.\d+)*)(.*)")
+_PRE = re.compile(r"(a|b|c|rc|alpha|beta|pre|preview|dev)\d*")
+
+
+def version_key(version):
+    """
+    Sort key putting the latest final release of a project last. This is
+    not full PEP 440 ordering, which would need `packaging`, but is enough
+    to pick the newest wheel.
+    """
+    m = _RELEASE.match(version)
+    if m is None:
+        return (False, (), version)
+    release = tuple(int(x) for x in m.group(1).split("."))
+    while release and release[-1] == 0:
+        release = release[:-1]
+    suffix = m.group(2).lower()
+    return (not _PRE.search(suffix), release, suffix)
+
+
+def wheel_version(filename):
+    """Version part of a wheel file name, or None."""
+    if not filename.endswith(".whl"):
+        return None
+    parts = filename[: -len(".whl")].split("-")
+    return parts[1] if len(parts) >= 5 else None
+
+
+class IndexBackend(object):
+    def fetch_info(self, session, name, cache=None, version=None):
+        """Return the `info` object of release `version` (or the latest)."""
+        raise NotImplementedError
+
+    def complete(self, session, name, info, cache=None):
+        """Fill in what `info` lacks; a no-op unless overridden."""
+        return info
+
+
+class JsonApiBackend(IndexBackend):
+    """
+    The JSON API at `url`, or at `dep_license.PYPYI_URL` by default. With
+    `wheel_metadata`, a license missing from the API is read from the
+    release's wheel (see `dep_license.wheel`).
+    """
+
+    def __init__(self, url=None, wheel_metadata=True):
+        self.url = url
+        self.wheel_metadata = wheel_metadata
+
+    @property
+    def base_url(self):
+        return (self.url or dep_license.PYPYI_URL).rstrip("/")
+
+    def fetch_info(self, session, name, cache=None, version=None):
+        return session.fetch_info(name, self.base_url, cache=cache, version=version)
+
+    def needs_completion(self, info):
+        return self.wheel_metadata and info is not None and lacks_license(info)
+
+    def complete(self, session, name, info, cache=None):
+        if not self.needs_completion(info):
+            return info
+        return complete_from_wheel(session, self.base_url, name, info, cache)
+
+    def __repr__(self):
+        return f"JsonApiBackend({self.base_url!r})"
+
+
+class SimpleIndexBackend(IndexBackend):
+    """
+    A PEP 691 simple index at `url`. Only wheels whose METADATA is served
+    on its own are used, so no distribution file is ever downloaded.
+    """
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+
+    def __repr__(self):
+        return f"SimpleIndexBackend({self.url!r})"
+
+    def _get(self, session, url, accept):
+        from urllib.request import Request
+        from urllib.request import urlopen
+
+        session.profiler.count("requests")
+        with urlopen(Request(url, headers={"Accept": accept})) as conn:
+            body = conn.read()
+            final_url = conn.geturl()
+        session.profiler.count("bytes", len(body))
+        return body, final_url
+
+    def _metadata_url(self, session, name, version):
+        page_url = f"{self.url}/{normalize_name(name)}/"
+        body, page_url = self._get(session, page_url, SIMPLE_JSON)
+        try:
+            files = json.loads(body)["files"]
+        except (ValueError, KeyError, TypeError):
+            raise LookupError(f"{self.url} does not serve PEP 691 JSON")
+
+        wheels = {}
+        for f in files:
+            v = wheel_version(f.get("filename", ""))
+            has_metadata = f.get("core-metadata") or f.get("dist-info-metadata")
+            if v is None or not has_metadata:
+                continue
+            if version is None and f.get("yanked"):
+                continue
+            wheels.setdefault(v, f)
+        if version is None and wheels:
+            version = max(wheels, key=version_key)
+        if version not in wheels:
+            raise LookupError(
+                f"{name}: no wheel metadata for {version or 'any version'}"
+            )
+        url = urljoin(page_url, wheels[version]["url"]).split("#", 1)[0]
+        return url + ".metadata"
+
+    def _fetch(self, session, name, version):
+        from email.parser import HeaderParser
+
+        from dep_license.installed import metadata_info
+
+        url = self._metadata_url(session, name, version)
+        body, _ = self._get(session, url, "*/*")
+        msg = HeaderParser().parsestr(body.decode("utf-8", "replace"))
+        info = metadata_info(msg)
+        info.update(name=msg.get("Name"), version=msg.get("Version"))
+        return info
+
+    def fetch_info(self, session, name, cache=None, version=None):
+        key, entry = lookup_cache(name, cache, version, "simple+" + self.url)
+        if entry is not None and entry.fresh:
+            session.profiler.count("cache hits")
+            return entry.data
+        info = session.call(
+            (self.url, key), name, lambda: self._fetch(session, name, version)
+        )
+        if cache is not None:
+            session.profiler.count("cache misses")
+        store_info(cache, key, info, {}, version)
+        return info
+
+
+class MirrorBackend(IndexBackend):
+    """JSON API documents in a directory; nothing is cached or fetched."""
+
+    LAYOUTS = (
+        "pypi/{name}/json",
+        "web/pypi/{name}/json",
+        "json/{name}",
+        "web/json/{name}",
+        "{name}/json",
+        "{name}.json",
+    )
+    VERSIONED_LAYOUTS = (
+        "pypi/{name}/{version}/json",
+        "web/pypi/{name}/{version}/json",
+        "{name}/{version}/json",
+    )
+
+    def __init__(self, path):
+        self.path = path
+
+    def __repr__(self):
+        return f"MirrorBackend({self.path!r})"
+
+    def fetch_info(self, session, name, cache=None, version=None):
+        layouts = self.VERSIONED_LAYOUTS if version else self.LAYOUTS
+        for layout in layouts:
+            for n in dict.fromkeys([name, normalize_name(name)]):
+                rel = layout.format(name=n, version=version)
+                path = os.path.join(self.path, *rel.split("/"))
+                if not os.path.isfile(path):
+                    continue
+                with open(path, "rb") as f:
+                    info = extract_info(f)
+                if info is not None:
+                    session.profiler.count("mirror hits")
+                    return info
+        raise LookupError(f"{name}: not found in {self.path}")
+
+
+def backend_from_spec(spec, wheel_metadata=True):
+    """
+    Build a backend from a `--source` value: a JSON API URL, `simple+URL`
+    for a PEP 691 simple index, or a mirror directory (optionally `file:`).
+    """
+    scheme, sep, rest = spec.partition("+")
+    if sep and scheme == "simple":
+        return SimpleIndexBackend(rest)
+    if sep and scheme == "json":
+        return JsonApiBackend(rest, wheel_metadata)
+    if spec.startswith(("http://", "https://")):
+        return JsonApiBackend(spec, wheel_metadata)
+    path = spec
+    if spec.startswith("file:"):
+        path = spec.partition(":")[2]
+        if path.startswith("//"):
+            path = path[2:]
+    if os.path.isdir(path):
+        return MirrorBackend(path)
+    raise ValueError(f"{spec}: not an index URL or a mirror directory")
+
+
+def fetch_from(backend, session, name, cache=None, version=None):
+    """
+    `info` of release `version` of `name` in `backend`, falling back to its
+    latest release (e.g. for a local version or a deleted release).
+    """
+    info = None
+    if version:
+        try:
+            info = backend.fetch_info(session, name, cache, version)
+        except Exception as e:
+            logger.debug(f"{backend}: {name}=={version}: {e}, using the latest release")
+    if info is None:
+        info = backend.fetch_info(session, name, cache)
+    return backend.complete(session, name, info, cache)
@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger("dep_license")
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_SIZE = 128 * 1024 * 1024
+
+CacheEntry = namedtuple("CacheEntry", ["data", "etag", "last_modified", "fresh"])
+
+
+def normalize_name(name):
+    """PEP 503 normalized form of a package name."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "deplic")
+
+
+class MetadataCache(object):
+    """
+    SQLite backed cache of PyPI `info` objects (or any other JSON values).
+
+    Entries expire after `ttl` seconds but are kept around with their
+    ETag / Last-Modified validators so stale entries can be revalidated
+    with a conditional GET. Once the stored payloads grow beyond
+    `max_size` bytes the least recently accessed entries are evicted.
+    """
+
+    def __init__(
+        self,
+        cache_dir=None,
+        ttl=DEFAULT_TTL,
+        max_size=DEFAULT_MAX_SIZE,
+        name="metadata",
+    ):
+        import sqlite3
+
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.ttl = ttl
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.path = os.path.join(self.cache_dir, f"{name}.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            "key TEXT PRIMARY KEY, "
+            "data TEXT NOT NULL, "
+            "etag TEXT, "
+            "last_modified TEXT, "
+            "expires_at REAL, "
+            "accessed_at REAL NOT NULL, "
+            "size INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed_at)"
+        )
+
+    def _expires_at(self, ttl):
+        if ttl is None:
+            return None
+        return time.time() + ttl
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, etag, last_modified, expires_at FROM metadata "
+                "WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE metadata SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        data, etag, last_modified, expires_at = row
+        fresh = expires_at is None or expires_at > now
+        return CacheEntry(json.loads(data), etag, last_modified, fresh)
+
+    def set(self, key, data, etag=None, last_modified=None, ttl=-1):
+        """Store `data`; `ttl=None` keeps the entry fresh forever."""
+        if ttl == -1:
+            ttl = self.ttl
+        payload = json.dumps(data)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata "
+                "(key, data, etag, last_modified, expires_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    payload,
+                    etag,
+                    last_modified,
+                    self._expires_at(ttl),
+                    now,
+                    len(payload),
+                ),
+            )
+            self._evict()
+
+    def touch(self, key, ttl=-1):
+        """Mark an entry fresh again, e.g. after a 304 Not Modified."""
+        if ttl == -1:
+            ttl = self.ttl
+        with self._lock:
+            self._conn.execute(
+                "UPDATE metadata SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                (self._expires_at(ttl), time.time(), key),
+            )
+
+    def _evict(self):
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM metadata"
+        ).fetchone()[0]
+        if total <= self.max_size:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM metadata ORDER BY accessed_at ASC"
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_size:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM metadata WHERE key = ?", evicted)
+        logger.debug(f"cache: evicted {len(evicted)} entries")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM metadata")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+
+def manifest_cache(cache_dir=None):
+    """Cache of parsed manifests; keys are content hashes so never expire."""
+    return MetadataCache(cache_dir, ttl=None, name="manifests")
@@ -0,0 +1,529 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+from dep_license.cache import normalize_name
+from dep_license.profile import NULL_PROFILER
+
+logger = logging.getLogger("dep_license")
+
+CHUNK_SIZE = 16 * 1024
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_REDIRECTS = 5
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+# unread response bodies up to this size are drained to keep the connection
+DRAIN_LIMIT = 256 * 1024
+MAX_RETRIES = 4
+BACKOFF = 0.5
+MAX_BACKOFF = 60.0
+
+_TOKEN = re.compile(rb'["{}\[\]]')
+_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"', re.S)
+_COLON = re.compile(rb"\s*:")
+_BLANK = re.compile(rb"\s*\Z")
+
+
+def extract_info(fp, chunk_size=CHUNK_SIZE):
+    """
+    Decode only the top-level `info` object of a PyPI JSON document.
+
+    `fp` is read in chunks and reading stops as soon as the `info` object is
+    closed, so the (often multi-megabyte) `releases` and `urls` sections that
+    PyPI serves after it are never transferred or decoded.
+    """
+    buf = b""
+    pos = 0
+    depth = 0
+    start = None
+    pending = False
+    while True:
+        m = _TOKEN.search(buf, pos)
+        need_more = m is None
+        if m is not None and m.group() == b'"':
+            s = _STRING.match(buf, m.start())
+            if s is None:
+                need_more = True
+            elif depth == 1 and start is None and s.group() == b'"info"':
+                colon = _COLON.match(buf, s.end())
+                if colon is None and _BLANK.match(buf, s.end()):
+                    need_more = True
+                else:
+                    pending = colon is not None
+                    pos = s.end()
+                    continue
+            else:
+                if pending:
+                    return None
+                pos = s.end()
+                continue
+
+        if need_more:
+            chunk = fp.read(chunk_size)
+            if not chunk:
+                return None
+            keep = start if start is not None else (m.start() if m else len(buf))
+            buf = buf[keep:] + chunk
+            pos = max(pos - keep, 0)
+            if start is not None:
+                start = 0
+            continue
+
+        c = m.group()
+        pos = m.end()
+        if c in (b"{", b"["):
+            depth += 1
+            if pending:
+                if c != b"{" or depth != 2:
+                    return None
+                start = m.start()
+                pending = False
+        else:
+            depth -= 1
+            if pending:
+                return None
+            if start is not None and depth == 1:
+                return json.loads(buf[start:pos])
+
+
+def info_url(base_url, name, version=None):
+    if version:
+        return "{}/{}/{}/json".format(base_url, name, version)
+    return "{}/{}/json".format(base_url, name)
+
+
+def cache_key(name, version=None, source=None):
+    """
+    Key of a package, e.g. `foo==1.0`. Metadata cache keys name the index
+    it came from (`source`), since two indexes may disagree about a package.
+    """
+    key = normalize_name(name)
+    if version:
+        key += "==" + version
+    if source:
+        key = f"{source}#{key}"
+    return key
+
+
+def lookup_cache(name, cache, version=None, source=None):
+    """Return the cache key and entry (if any) for `name` in `source`."""
+    key = cache_key(name, version, source)
+    entry = cache.get(key) if cache is not None else None
+    return key, entry
+
+
+def conditional_headers(entry):
+    headers = {}
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+    return headers
+
+
+def store_info(cache, key, info, headers, version=None):
+    """Cache `info`; a release's metadata never changes, so keep it forever."""
+    if cache is not None and info is not None:
+        cache.set(
+            key,
+            info,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            ttl=None if version else -1,
+        )
+
+
+class CountingReader(object):
+    """Count the bytes read from a response for `Profiler` counters."""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.count = 0
+
+    def read(self, size=-1):
+        chunk = self.fp.read(size)
+        self.count += len(chunk)
+        return chunk
+
+
+def fetch_info(
+    name, base_url, cache=None, version=None, profiler=NULL_PROFILER, pool=None
+):
+    """
+    Return the `info` object of a package's PyPI JSON metadata.
+
+    When `version` is given the much smaller per-version document is used
+    and, being immutable, cached forever. With a `cache`, fresh entries are
+    served without any network access and stale ones are revalidated with a
+    conditional GET. With a `KeepAlivePool`, the request goes out on one of
+    its connections instead of a new one.
+    """
+    key, entry = lookup_cache(name, cache, version, base_url)
+    if entry is not None and entry.fresh:
+        profiler.count("cache hits")
+        return entry.data
+
+    from urllib.error import HTTPError
+    from urllib.request import Request
+    from urllib.request import urlopen
+
+    opener = urlopen if pool is None else pool.urlopen
+    request = Request(
+        info_url(base_url, name, version), headers=conditional_headers(entry)
+    )
+    profiler.count("requests")
+    reader = None
+    try:
+        with opener(request) as conn:
+            reader = CountingReader(conn)
+            info = extract_info(reader)
+            headers = conn.headers
+    except HTTPError as e:
+        if e.code == 304 and entry is not None:
+            profiler.count("cache revalidated")
+            cache.touch(key)
+            return entry.data
+        raise
+    finally:
+        if reader is not None:
+            profiler.count("bytes", reader.count)
+
+    if cache is not None:
+        profiler.count("cache misses")
+    store_info(cache, key, info, headers, version)
+    return info
+
+
+class _PooledResponse(object):
+    """
+    `http.client` response whose connection goes back to its `KeepAlivePool`
+    when closed, after reading what is left of a small body.
+    """
+
+    def __init__(self, pool, origin, conn, response):
+        self.pool = pool
+        self.origin = origin
+        self.conn = conn
+        self.response = response
+        self.status = response.status
+        self.headers = response.headers
+
+    def read(self, size=-1):
+        return self.response.read(None if size is None or size < 0 else size)
+
+    def close(self, reusable=True):
+        conn, self.conn = self.conn, None
+        if conn is None:
+            return
+        response = self.response
+        length = response.length
+        if reusable and not response.will_close and length is not None:
+            if length <= DRAIN_LIMIT:
+                response.read()
+                self.pool._release(self.origin, conn)
+                return
+        response.close()
+        conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(reusable=exc_type is None)
+
+
+class KeepAlivePool(object):
+    """
+    Keep-alive HTTP/1.1 connections for threads, grouped by (scheme, host,
+    port): the threaded counterpart of `dep_license.aio.ConnectionPool`.
+
+    Each request takes an idle connection (or opens one) and hands it back
+    once its response is closed; at most `size` idle connections are kept
+    per origin. `urlopen()` stands in for `urllib.request.urlopen` and, like
+    it, follows redirects and raises `HTTPError` for any other status >= 300.
+    Proxies are not supported.
+    """
+
+    def __init__(self, size=5, ssl_context=None):
+        self.size = size
+        self.ssl_context = ssl_context
+        self.opened = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _open(self, origin):
+        import http.client
+
+        scheme, host, port = origin
+        if scheme == "https":
+            if self.ssl_context is None:
+                import ssl
+
+                self.ssl_context = ssl.create_default_context()
+            conn = http.client.HTTPSConnection(host, port, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port)
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def _acquire(self, origin):
+        with self._lock:
+            idle = self._idle.get(origin)
+            if idle:
+                return idle.pop(), True
+        return self._open(origin), False
+
+    def _release(self, origin, conn):
+        with self._lock:
+            idle = self._idle.setdefault(origin, [])
+            if len(idle) < self.size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _request(self, url, headers):
+        import http.client
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        origin = (parts.scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        conn, reused = self._acquire(origin)
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+        except (ConnectionError, http.client.BadStatusLine):
+            conn.close()
+            if not reused:
+                raise
+            # the server dropped an idle connection, retry on a fresh one
+            conn = self._open(origin)
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+            except BaseException:
+                conn.close()
+                raise
+        except BaseException:
+            conn.close()
+            raise
+        return _PooledResponse(self, origin, conn, response)
+
+    def urlopen(self, request):
+        from urllib.error import HTTPError
+        from urllib.parse import urljoin
+
+        url = request.full_url
+        headers = {"User-Agent": "deplic", "Accept-Encoding": "identity"}
+        headers.update(request.header_items())
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._request(url, headers)
+            location = response.headers.get("Location")
+            if response.status < 300:
+                return response
+            response.close()
+            if response.status in REDIRECT_CODES and location:
+                url = urljoin(url, location)
+                continue
+            break
+        raise HTTPError(url, response.status, "", response.headers, None)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket shared by all workers of a run.
+
+    `rate` is the sustained number of requests per second (None for no
+    limit) and `burst` how many may go out back to back. A 429 response
+    halves the rate and holds every request back until its Retry-After has
+    passed; each success afterwards restores a tenth of the configured rate.
+    """
+
+    def __init__(self, rate=None, burst=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst or max(1.0, rate or 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self._blocked_until - now, 0.0)
+            if self.rate is None:
+                return wait
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def throttle(self, delay):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            if self.rate is not None:
+                self.rate = max(self.rate / 2, self.max_rate / 16)
+
+    def recover(self):
+        if self.rate is None or self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+def parse_retry_after(value):
+    """Seconds to wait according to a Retry-After header, or None."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_BACKOFF)
+
+
+def is_transient(error):
+    """Connection resets and timeouts are worth retrying, DNS errors are not."""
+    import socket
+
+    reason = getattr(error, "reason", error)
+    return isinstance(reason, (ConnectionError, TimeoutError, socket.timeout))
+
+
+def retry_delay(attempt, retry_after=None, backoff=BACKOFF):
+    """Retry-After if the server sent one, else full-jitter exponential backoff."""
+    delay = parse_retry_after(retry_after)
+    if delay is not None:
+        return delay
+    return random.uniform(0, min(MAX_BACKOFF, backoff * 2**attempt))
+
+
+class Session(object):
+    """
+    Fetch PyPI metadata with rate limiting, retries and request coalescing.
+
+    Retryable statuses and connection errors are retried up to `retries`
+    times; concurrent calls for the same package share one request.
+    Requests, cache lookups and retries are counted by `profiler`.
+    `backends` are the package indexes asked in turn (see
+    `dep_license.backends`), by default the PyPI JSON API. JSON API requests
+    go out on the connections of `pool` (a `KeepAlivePool`) when it is set,
+    and on a new connection each otherwise.
+    """
+
+    def __init__(
+        self,
+        rate=None,
+        burst=None,
+        retries=MAX_RETRIES,
+        backoff=BACKOFF,
+        profiler=NULL_PROFILER,
+        backends=None,
+        pool=None,
+    ):
+        if not backends:
+            from dep_license.backends import JsonApiBackend
+
+            backends = [JsonApiBackend()]
+        self.backends = list(backends)
+        self.limiter = TokenBucket(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.profiler = profiler
+        self.pool = pool
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def fetch_info(self, name, base_url, cache=None, version=None):
+        def fetch():
+            return fetch_info(name, base_url, cache, version, self.profiler, self.pool)
+
+        return self.call((base_url, cache_key(name, version)), name, fetch)
+
+    def call(self, key, name, func):
+        """
+        Return `func()`, rate limited and retried. Concurrent calls with the
+        same `key` share a single call.
+        """
+        from concurrent.futures import Future
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            self.profiler.count("coalesced")
+            return future.result()
+
+        try:
+            info = self._retry_loop(name, func)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(info)
+            return info
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _retry_loop(self, name, func):
+        from urllib.error import HTTPError
+        from urllib.error import URLError
+
+        for attempt in range(self.retries + 1):
+            wait = self.limiter.reserve()
+            if wait:
+                self.profiler.observe("rate limit wait", wait)
+            time.sleep(wait)
+            try:
+                info = func()
+            except HTTPError as e:
+                if e.code not in RETRY_STATUSES or attempt == self.retries:
+                    raise
+                delay = self.retry(name, attempt, e.code, e.headers.get("Retry-After"))
+            except (URLError, OSError) as e:
+                if not is_transient(e) or attempt == self.retries:
+                    raise
+                delay = self.retry(name, attempt, e)
+            else:
+                self.limiter.recover()
+                return info
+            time.sleep(delay)
+
+    def retry(self, name, attempt, reason, retry_after=None):
+        """Return the delay before the next attempt, throttling on a 429."""
+        delay = retry_delay(attempt, retry_after, self.backoff)
+        self.profiler.count("retries")
+        if reason == 429:
+            self.limiter.throttle(delay)
+        logger.debug(f"{name}: {reason}, retrying in {delay:.2f}s")
+        return delay
@@ -0,0 +1,91 @@
+"""
+Transitive dependency graph for `--transitive`.
+
+Every package is expanded through the `requires_dist` of its metadata
+(installed METADATA or the PyPI JSON API). Nodes are memoized for the
+whole run, so a subtree shared by several dependencies or projects, like
+`requests` -> `urllib3`, is fetched and expanded once. Each level of the
+graph is fetched concurrently.
+"""
+import logging
+from collections import OrderedDict
+
+from dep_license.cache import normalize_name
+from dep_license.utils import requirement_names
+
+logger = logging.getLogger("dep_license")
+
+
+def requires_dist(info):
+    """
+    Names of the unconditional requirements listed in an `info` object.
+
+    Requirements with an environment marker (an extra, or a platform or
+    Python version, like `pywin32; sys_platform == "win32"`) are all
+    treated as conditional and skipped: markers are not evaluated, since
+    the environment the report is for is not known.
+    """
+    reqs = [r for r in info.get("requires_dist") or [] if ";" not in r]
+    return requirement_names(reqs)
+
+
+class DependencyGraph(object):
+    """
+    Memoized `package -> requirements` graph.
+
+    `fetch(name)` returns the metadata `info` object of a package (or None
+    when it cannot be found); it is called at most once per package and
+    from up to `max_workers` threads at a time.
+    """
+
+    def __init__(self, fetch, max_workers=5):
+        self.fetch = fetch
+        self.max_workers = max_workers
+        self.info = {}
+        self.edges = {}
+        self.names = {}
+
+    def _visit(self, names):
+        import concurrent.futures
+
+        def load(name):
+            try:
+                return self.fetch(name)
+            except Exception as e:
+                logger.debug(f"{name}: {e}")
+                return None
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            for name, info in zip(names, executor.map(load, names)):
+                key = normalize_name(name)
+                reqs = requires_dist(info or {})
+                self.info[key] = info
+                self.edges[key] = [normalize_name(r) for r in reqs]
+                for r in reqs:
+                    self.names.setdefault(normalize_name(r), r)
+
+    def expand(self, roots):
+        """
+        Return an OrderedDict of every package reachable from `roots`,
+        mapping its normalized name to the shortest path that introduced it
+        (a list of names starting at a root and ending with the package).
+        """
+        paths = OrderedDict()
+        level = []
+        for name in roots:
+            key = normalize_name(name)
+            self.names.setdefault(key, name)
+            if key not in paths:
+                paths[key] = [name]
+                level.append(key)
+
+        while level:
+            self._visit([self.names[k] for k in level if k not in self.edges])
+            next_level = []
+            for key in level:
+                for child in self.edges[key]:
+                    if child not in paths:
+                        paths[child] = paths[key] + [self.names[child]]
+                        next_level.append(child)
+            level = next_level
+        return paths
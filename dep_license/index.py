@@ -0,0 +1,201 @@
+"""
+Offline license index.
+
+`deplic index build` turns a local metadata dump (a directory of PyPI JSON
+documents or a JSON Lines export) into a single file that `--index` can
+resolve packages from without any network access.
+
+File layout (all integers little-endian)::
+
+    header   magic, record count, slot count, slot table offset
+    records  JSON payloads (deduplicated) and name entries pointing at them
+    slots    open addressing hash table of (64-bit name hash, record offset)
+
+The file is memory mapped and only the pages touched by a lookup are read,
+so opening a 500k package index is instant and each lookup costs a hash and
+a couple of probes.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+
+from dep_license.cache import normalize_name
+
+logger = logging.getLogger("dep_license")
+
+MAGIC = b"DEPLIC1\0"
+HEADER = struct.Struct("<8sQQQ")
+SLOT = struct.Struct("<QQ")
+RECORD = struct.Struct("<HQ")
+BLOB = struct.Struct("<I")
+LOAD_FACTOR = 0.5
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def license_subset(info):
+    """Keep only the `info` fields that `make_record()` needs."""
+    return {
+        "license": info.get("license"),
+        "classifiers": [
+            c for c in info.get("classifiers") or [] if c.startswith("License")
+        ],
+    }
+
+
+def iter_dump(path):
+    """Yield `info` objects from a dump file or directory."""
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for f in sorted(files):
+                if f.endswith((".json", ".jsonl", ".ndjson")):
+                    yield from iter_dump(os.path.join(root, f))
+        return
+
+    with open(path, "rb") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            docs = (json.loads(line) for line in f if line.strip())
+        else:
+            docs = [json.load(f)]
+        for doc in docs:
+            info = doc.get("info", doc) if isinstance(doc, dict) else None
+            if isinstance(info, dict) and info.get("name"):
+                yield info
+
+
+def build_index(sources, output):
+    records = {}
+    for source in sources:
+        for info in iter_dump(source):
+            records[normalize_name(info["name"])] = license_subset(info)
+
+    n_slots = max(8, int(len(records) / LOAD_FACTOR) + 1)
+    slots = bytearray(n_slots * SLOT.size)
+    data = bytearray()
+    blobs = {}
+    data_offset = HEADER.size
+    for name, payload in records.items():
+        blob = json.dumps(payload, separators=(",", ":")).encode()
+        blob_offset = blobs.get(blob)
+        if blob_offset is None:
+            # most packages share one of a few hundred payloads, store each once
+            blob_offset = blobs[blob] = data_offset + len(data)
+            data += BLOB.pack(len(blob)) + blob
+
+        key = name.encode()
+        offset = data_offset + len(data)
+        data += RECORD.pack(len(key), blob_offset) + key
+
+        h = _hash(key)
+        i = h % n_slots
+        while SLOT.unpack_from(slots, i * SLOT.size)[1]:
+            i = (i + 1) % n_slots
+        SLOT.pack_into(slots, i * SLOT.size, h, offset)
+
+    slots_offset = data_offset + len(data)
+    tmp = output + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records), n_slots, slots_offset))
+        f.write(data)
+        f.write(slots)
+    os.replace(tmp, output)
+    return len(records)
+
+
+class LicenseIndex(object):
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path}: empty index file")
+        if len(self._mm) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path}: truncated index file")
+        magic, self.count, self.n_slots, self.slots_offset = HEADER.unpack_from(
+            self._mm, 0
+        )
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not a deplic index")
+        if not self.n_slots or (
+            self.slots_offset + self.n_slots * SLOT.size > len(self._mm)
+        ):
+            self.close()
+            raise ValueError(f"{path}: truncated index file")
+
+    def get(self, name):
+        """Return the stored `info` subset for `name`, or None."""
+        key = normalize_name(name).encode()
+        h = _hash(key)
+        i = h % self.n_slots
+        mm = self._mm
+        for _ in range(self.n_slots):
+            slot_hash, offset = SLOT.unpack_from(mm, self.slots_offset + i * SLOT.size)
+            if not offset:
+                return None
+            if slot_hash == h:
+                key_len, blob_offset = RECORD.unpack_from(mm, offset)
+                start = offset + RECORD.size
+                end = start + key_len
+                if mm[start:end] == key:
+                    start = blob_offset + BLOB.size
+                    end = start + BLOB.unpack_from(mm, blob_offset)[0]
+                    return json.loads(mm[start:end])
+            i = (i + 1) % self.n_slots
+        return None
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def index_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="deplic index", formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    sub = parser.add_subparsers(dest="command")
+    build = sub.add_parser(
+        "build", help="build an offline license index from a metadata dump"
+    )
+    build.add_argument(
+        "SOURCE",
+        nargs="+",
+        help="directory of PyPI JSON files, or a .json / .jsonl dump file",
+    )
+    build.add_argument(
+        "-o", "--output", default="deplic.idx", help="path for the index file"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command != "build":
+        parser.print_help()
+        return 1
+
+    for source in args.SOURCE:
+        if not os.path.exists(source):
+            logger.error(f"{source}: no such file or directory")
+            return 1
+    count = build_index(args.SOURCE, args.output)
+    print(f"indexed {count} packages into {os.path.abspath(args.output)}")
+    return 0
@@ -0,0 +1,87 @@
+import functools
+import json
+import os
+import subprocess
+import sys
+from email.parser import HeaderParser
+
+from dep_license.cache import normalize_name
+
+# `pip freeze` leaves these out, so do we
+FREEZE_EXCLUDES = {"pip", "setuptools", "wheel", "distribute"}
+
+_SYS_PATH_SCRIPT = "import json, sys; print(json.dumps(sys.path))"
+
+
+def interpreter_paths(executable):
+    """Return the `sys.path` of the given python executable."""
+    if os.path.realpath(executable) == os.path.realpath(sys.executable):
+        return list(sys.path)
+    out = subprocess.check_output([executable, "-c", _SYS_PATH_SCRIPT])
+    return json.loads(out.decode())
+
+
+def _metadata_file(path, entry):
+    if entry.endswith(".dist-info"):
+        return os.path.join(path, entry, "METADATA")
+    if entry.endswith(".egg-info"):
+        full = os.path.join(path, entry)
+        return full if os.path.isfile(full) else os.path.join(full, "PKG-INFO")
+    return None
+
+
+def read_metadata(filename):
+    """Parse the headers of a METADATA / PKG-INFO file."""
+    with open(filename, encoding="utf-8", errors="replace") as f:
+        return HeaderParser().parse(f, headersonly=True)
+
+
+def metadata_info(msg):
+    """
+    The `license`, `classifiers` and `requires_dist` keys of the PyPI JSON
+    API, read from parsed METADATA headers, so they can be fed to
+    `make_record()`.
+    """
+    return {
+        "license": msg.get("License") or msg.get("License-Expression"),
+        "classifiers": msg.get_all("Classifier") or [],
+        "requires_dist": msg.get_all("Requires-Dist") or [],
+    }
+
+
+def iter_installed(paths):
+    """
+    Yield `(name, info)` for every distribution installed under `paths`.
+
+    `info` is built by `metadata_info()`. Earlier paths shadow later ones,
+    like on `sys.path`.
+    """
+    seen = set()
+    for path in paths:
+        if not path or not os.path.isdir(path):
+            continue
+        try:
+            entries = sorted(os.listdir(path))
+        except OSError:
+            continue
+        for entry in entries:
+            filename = _metadata_file(path, entry)
+            if filename is None or not os.path.isfile(filename):
+                continue
+            try:
+                msg = read_metadata(filename)
+            except OSError:
+                continue
+            name = msg.get("Name")
+            if not name:
+                continue
+            key = normalize_name(name)
+            if key in seen or key in FREEZE_EXCLUDES:
+                continue
+            seen.add(key)
+            yield name, metadata_info(msg)
+
+
+@functools.lru_cache(maxsize=None)
+def installed_distributions(executable):
+    return list(iter_installed(interpreter_paths(executable)))
@@ -0,0 +1,236 @@
+"""
+License policy for `--check`.
+
+The `[deplic]` section of the configuration file is compiled once into
+lookup tables:
+
+    banned      licenses to report (comma or newline separated)
+    allowed     licenses that are never reported, even when they look like
+                a banned one (e.g. `banned = GPL`, `allowed = LGPL`)
+    exceptions  package names that are never reported
+
+A license string is matched by its normalized text, its SPDX-style id, its
+SPDX identifier as resolved by `dep_license.spdx` (so `banned = GPLv3` also
+catches `GPL-3.0-only` and a pasted GPLv3 text), its SPDX family, the last
+segment of a trove classifier and finally by fuzzy matching limited to
+banned entries whose length can reach the similarity cutoff.
+
+A versioned entry covers the `-only` and `-or-later` ids of its version
+(`GPL-3.0` covers `GPL-3.0-or-later`), and a bare family name covers every
+id of the family (`GPL` covers `GPL-2.0-only`). Families are compared by
+whole `-`-separated parts, so `GPL` never covers `AGPL-3.0-only` or
+`LGPL-2.1-only`, and `MIT` does not cover `MIT-0`. A recognized license is
+only fuzzy matched against entries that name no SPDX license or family:
+`MPL-2.0` and `AGPL-3.0` look alike, but are other licenses.
+
+Verdicts are memoized per distinct license string, so a scan evaluates each
+of the few dozen licenses it sees once no matter how many packages use them.
+"""
+import re
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+from dep_license.cache import normalize_name
+from dep_license.spdx import ALIASES
+from dep_license.spdx import from_classifier
+from dep_license.spdx import from_text
+
+FUZZY_CUTOFF = 0.6
+
+Verdict = namedtuple("Verdict", ["banned", "license", "rule", "entry"])
+
+_SPLIT = re.compile(r"[,\n]")
+_NOT_ID = re.compile(r"[^a-z0-9.+]+")
+_OPERATOR = re.compile(r"\s+(?:AND|OR|WITH)\s+|[()]")
+_SUFFIX = re.compile(r"-(?:only|or-later)$")
+
+
+def normalize_license(text):
+    """Lowercase `text` and drop the words every license string shares."""
+    return (
+        text.lower()
+        .replace("license", "")
+        .replace("osi approved::", "")
+        .replace("osi approved ::", "")
+        .strip()
+    )
+
+
+def license_id(text):
+    """SPDX-style id of a normalized license string, e.g. `apache-2.0`."""
+    return _NOT_ID.sub("-", text).strip("-")
+
+
+def classifier_name(text):
+    """Last segment of a trove classifier, or `text` itself."""
+    return text.rsplit("::", 1)[-1].strip()
+
+
+def spdx_id(text):
+    """SPDX identifier of a license string or `make_record()` classifier."""
+    return from_text(text) or from_classifier(text)
+
+
+def license_family(spdx):
+    """Lowercase SPDX id without its `-only` / `-or-later` suffix."""
+    return _SUFFIX.sub("", spdx.strip()).lower()
+
+
+def family_prefixes(family):
+    """`family` and its shorter `-`-separated prefixes, longest first."""
+    parts = family.split("-")
+    return ["-".join(parts[:n]) for n in range(len(parts), 0, -1)]
+
+
+_FAMILY_PREFIXES = frozenset(
+    prefix
+    for spdx in set(ALIASES.values())
+    for prefix in family_prefixes(license_family(spdx))
+)
+
+
+def split_list(value):
+    return [x.strip() for x in _SPLIT.split(value or "") if x.strip()]
+
+
+class _Table(object):
+    """Exact lookup of license entries by text, SPDX-style id and classifier."""
+
+    def __init__(self, entries):
+        self.text = {}
+        self.ids = {}
+        self.spdx = {}
+        self.families = {}
+        self.prefixes = {}
+        self.free_text = {}
+        for entry in entries:
+            key = normalize_license(entry)
+            self.text.setdefault(key, entry)
+            self.ids.setdefault(license_id(key), entry)
+            canonical = spdx_id(entry)
+            if canonical:
+                self.spdx.setdefault(canonical, entry)
+                if " " not in canonical:
+                    self.families.setdefault(license_family(canonical), entry)
+            elif license_id(key) in _FAMILY_PREFIXES:
+                # `GPL`, `BSD`: a family name that is not a license itself
+                self.prefixes.setdefault(license_id(key), entry)
+            else:
+                self.free_text.setdefault(key, entry)
+
+    def match(self, key, canonical=None):
+        if key in self.text:
+            return "exact", self.text[key]
+        ident = license_id(key)
+        if ident in self.ids:
+            return "spdx", self.ids[ident]
+        if canonical in self.spdx:
+            return "spdx", self.spdx[canonical]
+        for part in _OPERATOR.split(canonical or ""):
+            family = license_family(part)
+            if family in self.families:
+                return "spdx", self.families[family]
+            for prefix in family_prefixes(family):
+                if prefix in self.prefixes:
+                    return "spdx", self.prefixes[prefix]
+        name = classifier_name(key)
+        if name != key:
+            if name in self.text:
+                return "classifier", self.text[name]
+            if license_id(name) in self.ids:
+                return "classifier", self.ids[license_id(name)]
+        return None
+
+
+class LicensePolicy(object):
+    def __init__(self, banned=(), allowed=(), exceptions=(), cutoff=FUZZY_CUTOFF):
+        if not 0 < cutoff <= 1:
+            raise ValueError(f"cutoff must be in (0, 1], got {cutoff}")
+        self.banned = list(dict.fromkeys(x.strip() for x in banned if x.strip()))
+        self.allowed = list(allowed)
+        self.exceptions = {normalize_name(x) for x in exceptions}
+        self.cutoff = cutoff
+        self._banned = _Table(self.banned)
+        self._allowed = _Table(self.allowed)
+        self._by_length = {}
+        for key, entry in self._banned.text.items():
+            self._by_length.setdefault(len(key), []).append((key, entry))
+        self._by_length_free = {}
+        for key, entry in self._banned.free_text.items():
+            self._by_length_free.setdefault(len(key), []).append((key, entry))
+        self._verdicts = {}
+
+    @classmethod
+    def from_config(cls, path):
+        import configparser
+
+        config = configparser.ConfigParser()
+        config.read(path)
+        section = config["deplic"] if config.has_section("deplic") else {}
+        return cls(
+            banned=split_list(section.get("banned")),
+            allowed=split_list(section.get("allowed")),
+            exceptions=split_list(section.get("exceptions")),
+        )
+
+    def _fuzzy(self, key, by_length=None):
+        # SequenceMatcher.ratio() is at most 2 * min(a, b) / (a + b), so only
+        # entries within these lengths can reach the cutoff
+        n = len(key)
+        c = self.cutoff
+        low = int(n * c / (2 - c))
+        high = int(n * (2 - c) / c) + 1
+        s = SequenceMatcher()
+        s.set_seq2(key)
+        best = None
+        for length in range(low, high + 1):
+            for candidate, entry in (by_length or self._by_length).get(length, ()):
+                s.set_seq1(candidate)
+                if (
+                    s.real_quick_ratio() >= c
+                    and s.quick_ratio() >= c
+                    and s.ratio() >= c
+                    and (best is None or s.ratio() > best[0])
+                ):
+                    best = (s.ratio(), entry)
+        return best[1] if best else None
+
+    def verdict(self, text):
+        """Return the memoized `Verdict` for a single license string."""
+        try:
+            return self._verdicts[text]
+        except KeyError:
+            pass
+        key = normalize_license(text)
+        canonical = spdx_id(text)
+        result = None
+        allowed = self._allowed.match(key, canonical)
+        if allowed is not None:
+            result = Verdict(False, text, "allowed", allowed[1])
+        elif key:
+            hit = self._banned.match(key, canonical)
+            if hit is None and canonical is None:
+                entry = self._fuzzy(key)
+                hit = ("fuzzy", entry) if entry is not None else None
+            elif hit is None and self._by_length_free:
+                # a recognized license outside every banned family is another
+                # license, however alike the ids look (MPL-2.0, AGPL-3.0)
+                entry = self._fuzzy(key, self._by_length_free)
+                hit = ("fuzzy", entry) if entry is not None else None
+            if hit is not None:
+                result = Verdict(True, text, hit[0], hit[1])
+        self._verdicts[text] = result
+        return result
+
+    def check(self, record):
+        """Return the first banned `Verdict` for a record, or None."""
+        if not self.banned or normalize_name(record["Name"]) in self.exceptions:
+            return None
+        texts = [record.get("Meta") or ""]
+        texts += (record.get("Classifier") or "").split(", ")
+        texts += _OPERATOR.split(record.get("SPDX") or "")
+        for text in texts:
+            v = self.verdict(text) if text else None
+            if v is not None and v.banned:
+                return v
+        return None
@@ -0,0 +1,202 @@
+"""
+Timing and metrics for `--profile` and `--trace`.
+
+A `Profiler` records:
+
+    spans     wall time of each stage of a run (collecting and parsing
+              manifests, git remotes and clones, transitive expansion,
+              formatting) and of each package fetch
+    counters  requests, bytes transferred, cache hits / misses, retries,
+              coalesced requests
+    timers    totals of short, frequent operations (queue wait before a
+              fetch starts, writing a report row) that would flood a trace
+
+`summary()` renders the `--profile` tables and `write_trace()` a Chrome
+trace-event file that can be opened in chrome://tracing or Perfetto.
+Everything that is not profiled uses `NULL_PROFILER`, whose hooks do
+nothing.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class Profiler(object):
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+        self.counters = Counter()
+        self.timers = {}
+        self._threads = {}
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._async_ids = 0
+        self._lock = threading.Lock()
+
+    def now(self):
+        return time.perf_counter()
+
+    def _us(self, t):
+        return round((t - self._origin) * 1e6, 1)
+
+    def add(self, name, cat, start, end, args=None, concurrent=False):
+        """
+        Record a span that ran from `start` to `end` (`now()` values).
+
+        Spans of the same thread must nest; `concurrent` ones, like the
+        fetches multiplexed on the asyncio loop, are written as async events.
+        """
+        event = {
+            "name": name,
+            "cat": cat,
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": args or {},
+        }
+        with self._lock:
+            self._threads.setdefault(event["tid"], threading.current_thread().name)
+            if concurrent:
+                self._async_ids += 1
+                begin = dict(event, ph="b", ts=self._us(start), id=self._async_ids)
+                self.events.append(begin)
+                self.events.append(dict(begin, ph="e", ts=self._us(end), args={}))
+            else:
+                event.update(
+                    ph="X", ts=self._us(start), dur=self._us(end) - self._us(start)
+                )
+                self.events.append(event)
+
+    @contextmanager
+    def span(self, name, cat="stage", concurrent=False, **args):
+        start = self.now()
+        try:
+            yield args
+        finally:
+            self.add(name, cat, start, self.now(), args, concurrent)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            total, calls = self.timers.get(name, (0.0, 0))
+            self.timers[name] = (total + seconds, calls + 1)
+
+    def spans(self, cat):
+        """[(name, seconds, args)] of the spans of category `cat`."""
+        out = []
+        opened = {}
+        for e in self.events:
+            if e["cat"] != cat:
+                continue
+            if e["ph"] == "X":
+                out.append((e["name"], e["dur"] / 1e6, e["args"]))
+            elif e["ph"] == "b":
+                opened[e["id"]] = e
+            elif e["ph"] == "e":
+                b = opened.pop(e["id"])
+                out.append((b["name"], (e["ts"] - b["ts"]) / 1e6, b["args"]))
+        return out
+
+    def summary(self, top=10):
+        """Text of the `--profile` report."""
+        from tabulate import tabulate
+
+        stages = {}
+        for cat in ("stage", "collect", "git", "parse"):
+            for name, seconds, _ in self.spans(cat):
+                key = (cat, cat if cat in ("collect", "parse") else name)
+                total, calls = stages.get(key, (0.0, 0))
+                stages[key] = (total + seconds, calls + 1)
+        fetches = self.spans("fetch")
+        if fetches:
+            stages[("fetch", "fetch")] = (
+                sum(s for _, s, _ in fetches),
+                len(fetches),
+            )
+        rows = [
+            [name, calls, f"{total:.3f}"]
+            for (_, name), (total, calls) in stages.items()
+        ]
+        rows += [
+            [name, calls, f"{total:.3f}"]
+            for name, (total, calls) in sorted(self.timers.items())
+        ]
+        parts = [tabulate(rows, ["Phase", "Calls", "Seconds"], tablefmt="github")]
+
+        if self.counters:
+            parts.append(
+                tabulate(
+                    sorted(self.counters.items()),
+                    ["Counter", "Value"],
+                    tablefmt="github",
+                )
+            )
+
+        slowest = sorted(fetches, key=lambda x: x[1], reverse=True)[:top]
+        if slowest:
+            parts.append(
+                tabulate(
+                    [
+                        [name, f"{seconds:.3f}", args.get("queue_wait", "")]
+                        for name, seconds, args in slowest
+                    ],
+                    ["Slowest packages", "Seconds", "Queue wait"],
+                    tablefmt="github",
+                )
+            )
+        return "\n\n".join(parts) + "\n"
+
+    def write_trace(self, path):
+        """Write the spans and counters as Chrome trace-event JSON."""
+        with self._lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+            names = dict(self._threads)
+        end = self._us(self.now())
+        meta = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self._pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in names.items()
+        ]
+        if counters:
+            meta.append(
+                {
+                    "name": "counters",
+                    "ph": "C",
+                    "pid": self._pid,
+                    "tid": 0,
+                    "ts": end,
+                    "args": counters,
+                }
+            )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
+
+
+class NullProfiler(Profiler):
+    """A `Profiler` that records nothing."""
+
+    enabled = False
+
+    def add(self, name, cat, start, end, args=None, concurrent=False):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def observe(self, name, seconds):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
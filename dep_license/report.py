@@ -0,0 +1,100 @@
+"""
+Incremental report writers.
+
+Records are written as they arrive from the fetch engines. CSV, JSON Lines
+and JSON are streamed row by row so the first results show up immediately
+and memory stays flat; table formats need every row to compute column
+widths, so they are buffered until `close()`.
+"""
+import json
+
+STREAMING_FORMATS = ("csv", "json", "jsonl")
+
+
+class ReportWriter(object):
+    """Write records to every stream in `streams`."""
+
+    def __init__(self, streams, columns):
+        self.streams = streams
+        self.columns = columns
+        self.count = 0
+
+    def _write(self, text):
+        for stream in self.streams:
+            stream.write(text)
+            stream.flush()
+
+    def _row(self, record):
+        return [record.get(c, "") for c in self.columns]
+
+    def write(self, record):
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+class CsvWriter(ReportWriter):
+    """Quote fields with commas, like a `Projects` list or a license text."""
+
+    def _line(self, row):
+        import csv
+        import io
+
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow(row)
+        return buf.getvalue()
+
+    def write(self, record):
+        if not self.count:
+            self._write(self._line(self.columns))
+        self._write(self._line(self._row(record)))
+        super().write(record)
+
+
+class JsonLinesWriter(ReportWriter):
+    def write(self, record):
+        self._write(json.dumps(dict(zip(self.columns, self._row(record)))) + "\n")
+        super().write(record)
+
+
+class JsonWriter(ReportWriter):
+    """Stream a JSON array laid out like `json.dumps(records, indent=4)`."""
+
+    def write(self, record):
+        item = json.dumps(dict(zip(self.columns, self._row(record))), indent=4)
+        item = "\n".join("    " + line for line in item.splitlines())
+        self._write(("[\n" if not self.count else ",\n") + item)
+        super().write(record)
+
+    def close(self):
+        self._write("\n]\n" if self.count else "[]\n")
+
+
+class TableWriter(ReportWriter):
+    def __init__(self, streams, columns, fmt):
+        super().__init__(streams, columns)
+        self.fmt = fmt
+        self.rows = []
+
+    def write(self, record):
+        self.rows.append(self._row(record))
+        super().write(record)
+
+    def close(self):
+        if not self.rows:
+            return
+        from tabulate import tabulate
+
+        self._write(tabulate(self.rows, self.columns, tablefmt=self.fmt) + "\n")
+
+
+def report_writer(fmt, streams, columns):
+    fmt = fmt.lower()
+    if fmt == "csv":
+        return CsvWriter(streams, columns)
+    if fmt == "jsonl":
+        return JsonLinesWriter(streams, columns)
+    if fmt == "json":
+        return JsonWriter(streams, columns)
+    return TableWriter(streams, columns, fmt)
@@ -0,0 +1,225 @@
+"""
+Library API for processes that scan many times.
+
+`run()` sets up a session, caches and a thread pool for every call and
+prints its report. A `Scanner` keeps them alive instead, along with a pool
+of keep-alive connections to the JSON API, so a long-lived process (a web
+service, a CI daemon) pays for them once and every scan after the first is
+served from warm connections and caches::
+
+    from dep_license.cache import MetadataCache
+    from dep_license.policy import LicensePolicy
+    from dep_license.scanner import Scanner
+
+    policy = LicensePolicy(banned=["GPL"])
+    with Scanner(cache=MetadataCache(), policy=policy) as s:
+        result = s.scan_path("/path/to/project")
+        result = s.scan_manifest_bytes(data, "poetry.lock")
+        records = s.lookup(["requests", "flask==2.0.0"])
+
+Scanners are thread-safe; concurrent scans share the worker pool, the
+session's rate limit and request coalescing.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from collections import OrderedDict
+
+import dep_license
+from dep_license.cache import normalize_name
+from dep_license.fetch import cache_key
+from dep_license.fetch import KeepAlivePool
+from dep_license.fetch import Session
+from dep_license.utils import Dependency
+from dep_license.utils import manifest_key
+from dep_license.utils import parse_file
+from dep_license.utils import parse_manifest
+from dep_license.utils import requirement_names
+
+logger = logging.getLogger("dep_license")
+
+MEMO_SIZE = 20000
+MEMO_TTL = 10 * 60
+
+ScanResult = namedtuple(
+    "ScanResult", ["dependencies", "records", "violations", "missing"]
+)
+ScanResult.__doc__ = """
+Outcome of a scan.
+
+`dependencies` are the distinct dependencies found, `records` the report
+rows (dicts with the `dep_license.COLUMNS` keys) in the same order,
+`violations` (record, `Verdict`) pairs for banned licenses and `missing`
+the dependencies whose metadata could not be found.
+"""
+
+
+class Scanner(object):
+    """
+    Reusable scanner holding a fetch `Session`, a worker pool, an optional
+    metadata `cache` / `manifests` cache / offline `index` and an optional
+    `LicensePolicy`. Unless the session already has one, the scanner gives
+    it a `KeepAlivePool` of `max_workers` connections per index host, which
+    `close()` closes.
+
+    Records are also memoized in memory for `memo_ttl` seconds, which turns
+    repeated lookups of popular packages into a dict lookup.
+    """
+
+    def __init__(
+        self,
+        max_workers=5,
+        session=None,
+        cache=None,
+        manifests=None,
+        index=None,
+        policy=None,
+        req_files=None,
+        dev=False,
+        exec_setup=False,
+        memo_ttl=MEMO_TTL,
+    ):
+        import concurrent.futures
+
+        self.max_workers = max_workers
+        self.session = session or Session()
+        self._pool = None
+        if self.session.pool is None:
+            self._pool = self.session.pool = KeepAlivePool(max_workers)
+        self.cache = cache
+        self.manifests = manifests
+        self.index = index
+        self.policy = policy
+        self.req_files = list(req_files or dep_license.SUPPORTED_FILES)
+        self.dev = dev
+        self.exec_setup = exec_setup
+        self.memo_ttl = memo_ttl
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="deplic-scanner"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Shut the worker pool and connections down; caches and index are
+        owned by the caller.
+        """
+        self._executor.shutdown(wait=True)
+        if self._pool is not None:
+            self._pool.close()
+
+    def _memo_get(self, key):
+        with self._lock:
+            hit = self._memo.get(key)
+            if hit is None:
+                return None
+            record, expires_at = hit
+            if expires_at < time.monotonic():
+                del self._memo[key]
+                return None
+            self._memo.move_to_end(key)
+            return dict(record)
+
+    def _memo_set(self, key, record):
+        if not self.memo_ttl:
+            return
+        with self._lock:
+            self._memo[key] = (dict(record), time.monotonic() + self.memo_ttl)
+            self._memo.move_to_end(key)
+            while len(self._memo) > MEMO_SIZE:
+                self._memo.popitem(last=False)
+
+    def _record(self, d):
+        key = cache_key(d, getattr(d, "version", None))
+        record = self._memo_get(key)
+        if record is None:
+            record = dep_license.worker(
+                d, cache=self.cache, index=self.index, session=self.session
+            )
+            if record is not None:
+                self._memo_set(key, record)
+        return record
+
+    def lookup(self, names):
+        """
+        Return a record per requirement in `names` (`"requests"`,
+        `"flask==2.0.0"`, ...), or None where no metadata was found.
+        Entries that are not requirements, like comments, are skipped.
+        """
+        dependencies = requirement_names(names)
+        return list(self._executor.map(self._record, dependencies))
+
+    def scan_dependencies(self, dependencies):
+        """Build a `ScanResult` for a list of (`Dependency`) names."""
+        seen = OrderedDict()
+        for d in dependencies:
+            seen.setdefault(normalize_name(d), d)
+        distinct = list(seen.values())
+        records = []
+        violations = []
+        missing = []
+        for d, record in zip(distinct, self._executor.map(self._record, distinct)):
+            if record is None:
+                missing.append(d)
+                continue
+            records.append(record)
+            verdict = self.policy.check(record) if self.policy is not None else None
+            if verdict is not None:
+                violations.append((record, verdict))
+        return ScanResult(distinct, records, violations, missing)
+
+    def _parse(self, path, base_name):
+        return parse_file(
+            path,
+            base_name,
+            dev=self.dev,
+            exec_setup=self.exec_setup,
+            cache=self.manifests,
+        )
+
+    def scan_path(self, path, recursive=False, exclude=()):
+        """
+        Scan a project directory, a single manifest or a remote git repo, and
+        with `recursive` every project below a directory.
+        """
+        projects = [path]
+        if recursive:
+            projects = dep_license.discover_projects(projects, self.req_files, exclude)
+        dependencies = []
+        for project in projects:
+            deps, _ = dep_license.collect_project(
+                project, self.req_files, parse=self._parse
+            )
+            dependencies += deps
+        return self.scan_dependencies(dependencies)
+
+    def scan_manifest_bytes(self, data, base_name):
+        """
+        Scan the content of a manifest, e.g. an uploaded `poetry.lock`.
+        `base_name` is its file name; a `setup.py` is never executed. Unlike
+        the CLI, a manifest that cannot be parsed raises its error.
+        """
+        key = None
+        dependencies = None
+        if self.manifests is not None:
+            key = manifest_key(data, base_name, self.dev)
+            entry = self.manifests.get(key)
+            if entry is not None:
+                dependencies = [Dependency(n, v) for n, v in entry.data]
+        if dependencies is None:
+            dependencies, cacheable = parse_manifest(
+                data, base_name, base_name, dev=self.dev
+            )
+            if key is not None and cacheable:
+                self.manifests.set(
+                    key, [[d, getattr(d, "version", None)] for d in dependencies]
+                )
+        return self.scan_dependencies(dependencies)
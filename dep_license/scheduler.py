@@ -0,0 +1,65 @@
+import logging
+from collections import OrderedDict
+
+from dep_license.cache import normalize_name
+
+logger = logging.getLogger("dep_license")
+
+
+def scan_projects(projects, collect, is_remote, max_workers=5, clone_workers=2):
+    """
+    Run `collect(project)` for every project concurrently.
+
+    Remote projects are cloned in their own pool of `clone_workers` threads so
+    slow clones never hold up parsing of local projects. Returns an ordered
+    mapping of project -> `collect()` result, in input order.
+    """
+    import concurrent.futures
+
+    scanned = OrderedDict()
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers
+    ) as parse_pool, concurrent.futures.ThreadPoolExecutor(
+        max_workers=clone_workers
+    ) as clone_pool:
+        futures = OrderedDict()
+        for project in projects:
+            if project in futures:
+                continue
+            pool = clone_pool if is_remote(project) else parse_pool
+            futures[project] = pool.submit(collect, project)
+        for project, future in futures.items():
+            try:
+                scanned[project] = future.result()
+            except Exception as e:
+                logger.error(f"{project}: {e}")
+    return scanned
+
+
+def attribute(scanned):
+    """
+    Merge per-project dependency lists.
+
+    Returns the unique dependencies (first spelling seen for each normalized
+    name) and a mapping of normalized name -> projects using it. A package
+    is reported once, at the first version pinned for it; projects pinning
+    other versions are warned about.
+    """
+    dependencies = OrderedDict()
+    usage = {}
+    for project, deps in scanned.items():
+        for d in deps:
+            key = normalize_name(d)
+            first = dependencies.setdefault(key, d)
+            pinned = getattr(first, "version", None)
+            version = getattr(d, "version", None)
+            if version != pinned:
+                logger.warning(
+                    f"{d}: {project} pins {version or 'no version'} but "
+                    f"{usage[key][0]} pins {pinned or 'no version'}; "
+                    f"reporting the license of {pinned or 'the latest release'}"
+                )
+            projects = usage.setdefault(key, [])
+            if project not in projects:
+                projects.append(project)
+    return list(dependencies.values()), usage
@@ -0,0 +1,333 @@
+"""
+`deplic serve`: a long-running lookup daemon, and its client.
+
+The daemon keeps a `Scanner` alive (fetch session, worker pool, metadata
+cache, in-memory record memo) and answers JSON requests over a Unix socket
+or a localhost HTTP port:
+
+    GET  /health                  {"status": "ok", "version": ...}
+    POST /lookup                  {"names": ["requests", "flask==2.0.0"]}
+                                  -> {"records": [record or null, ...]}
+    POST /scan?name=poetry.lock   raw manifest content
+                                  -> {"dependencies", "records",
+                                      "violations", "missing"}
+
+`deplic --daemon ADDRESS` (or `$DEPLIC_DAEMON`) parses manifests locally
+and forwards the lookups, so a pre-commit check costs one local round trip
+instead of a cold start and a PyPI request per package. ADDRESS is
+`unix:/path/to/socket` or `http://127.0.0.1:PORT`.
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+
+from dep_license.cache import DEFAULT_TTL
+from dep_license.fetch import MAX_RETRIES
+
+logger = logging.getLogger("dep_license")
+
+DEFAULT_PORT = 8765
+MAX_BODY = 16 * 1024 * 1024
+TIMEOUT = 300
+
+
+def parse_address(address):
+    """Return ("unix", path) or ("tcp", (host, port)) for a daemon address."""
+    if address.startswith("unix:"):
+        return "unix", address.partition(":")[2]
+    if address.startswith("/"):
+        return "unix", address
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(address if "://" in address else "http://" + address)
+    port = DEFAULT_PORT if parts.port is None else parts.port
+    return "tcp", (parts.hostname or "127.0.0.1", port)
+
+
+def result_json(result):
+    """JSON-serializable form of a `ScanResult`."""
+    return {
+        "dependencies": [
+            {"name": str(d), "version": getattr(d, "version", None)}
+            for d in result.dependencies
+        ],
+        "records": result.records,
+        "violations": [
+            {
+                "name": record["Name"],
+                "license": verdict.license,
+                "rule": verdict.rule,
+                "entry": verdict.entry,
+            }
+            for record, verdict in result.violations
+        ],
+        "missing": [str(d) for d in result.missing],
+    }
+
+
+def make_server(address, scanner):
+    """Return an HTTP server bound to `address` that answers with `scanner`."""
+    import socketserver
+    from http.server import BaseHTTPRequestHandler
+    from http.server import HTTPServer
+    from urllib.parse import parse_qs
+    from urllib.parse import urlsplit
+
+    import dep_license
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        server_version = "deplic/" + dep_license.__version__
+
+        def address_string(self):
+            # a Unix socket peer has no (host, port)
+            return self.client_address[0] if self.client_address else "unix"
+
+        def log_message(self, fmt, *args):
+            logger.debug(fmt % args)
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY:
+                raise ValueError(f"request body larger than {MAX_BODY} bytes")
+            return self.rfile.read(length)
+
+        def do_GET(self):
+            if urlsplit(self.path).path == "/health":
+                self._send(200, {"status": "ok", "version": dep_license.__version__})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            try:
+                body = self._body()
+                if url.path == "/lookup":
+                    names = json.loads(body or b"{}").get("names")
+                    if not isinstance(names, list):
+                        raise ValueError('expected {"names": [...]}')
+                    payload = {"records": scanner.lookup(names)}
+                elif url.path == "/scan":
+                    name = parse_qs(url.query).get("name", ["requirements.txt"])[0]
+                    result = scanner.scan_manifest_bytes(body, os.path.basename(name))
+                    payload = result_json(result)
+                else:
+                    self._send(404, {"error": "not found"})
+                    return
+            except Exception as e:
+                self._send(400, {"error": str(e)})
+                return
+            self._send(200, payload)
+
+    kind, where = parse_address(address)
+    if kind == "unix":
+        if os.path.exists(where):
+            # a stale socket left behind; refuse to steal a live one
+            if DaemonClient(address).ping():
+                raise OSError(f"{where}: a daemon is already listening")
+            os.remove(where)
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+            def server_bind(self):
+                socketserver.UnixStreamServer.server_bind(self)
+                self.server_name, self.server_port = "localhost", 0
+
+        return Server(where, Handler)
+
+    class TCPServer(socketserver.ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    return TCPServer(where, Handler)
+
+
+class DaemonClient(object):
+    """Client of a running `deplic serve` daemon."""
+
+    def __init__(self, address, timeout=TIMEOUT):
+        self.address = address
+        self.kind, self.where = parse_address(address)
+        self.timeout = timeout
+
+    def _connection(self):
+        import http.client
+
+        if self.kind == "tcp":
+            host, port = self.where
+            return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+        path = self.where
+        timeout = self.timeout
+
+        class UnixConnection(http.client.HTTPConnection):
+            def connect(self):
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.settimeout(timeout)
+                self.sock.connect(path)
+
+        return UnixConnection("localhost", timeout=timeout)
+
+    def request(self, method, path, body=None):
+        conn = self._connection()
+        try:
+            conn.request(method, path, body=body)
+            response = conn.getresponse()
+            payload = json.loads(response.read() or b"{}")
+        finally:
+            conn.close()
+        if response.status != 200:
+            raise ValueError(f"{self.address}: {payload.get('error', response.status)}")
+        return payload
+
+    def ping(self):
+        """Whether a daemon answers at the address."""
+        try:
+            return self.request("GET", "/health").get("status") == "ok"
+        except (OSError, ValueError):
+            return False
+
+    def lookup(self, names):
+        body = json.dumps({"names": list(names)}).encode()
+        return self.request("POST", "/lookup", body)["records"]
+
+    def scan_manifest_bytes(self, data, base_name):
+        from urllib.parse import quote
+
+        return self.request("POST", "/scan?name=" + quote(base_name), data)
+
+
+def iter_daemon(dependencies, client):
+    """
+    Yield the records of `dependencies` looked up by a daemon, like the fetch
+    engines do.
+    """
+    names = [
+        f"{d}=={d.version}" if getattr(d, "version", None) else str(d)
+        for d in dependencies
+    ]
+    for record in client.lookup(names):
+        if record:
+            yield record
+
+
+def serve_main(argv=None):
+    import dep_license
+    from dep_license.cache import manifest_cache
+    from dep_license.cache import MetadataCache
+    from dep_license.fetch import Session
+    from dep_license.scanner import Scanner
+
+    parser = argparse.ArgumentParser(
+        prog="deplic serve",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="answer license lookups from a warm process",
+    )
+    parser.add_argument(
+        "address",
+        nargs="?",
+        default=f"127.0.0.1:{DEFAULT_PORT}",
+        help="unix:/path/to/socket, or host:port (localhost only)",
+    )
+    parser.add_argument("-w", "--workers", type=int, default=16)
+    parser.add_argument(
+        "-c",
+        "--check",
+        default=None,
+        help="configuration file whose banned licenses /scan reports",
+    )
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--no-cache", action="store_true", default=False)
+    parser.add_argument("--cache-ttl", type=int, default=DEFAULT_TTL)
+    parser.add_argument("--index", default=None)
+    parser.add_argument("--source", action="append", default=[], metavar="SPEC")
+    parser.add_argument("--no-wheel-metadata", action="store_true", default=False)
+    args = parser.parse_args(argv)
+
+    kind, where = parse_address(args.address)
+    if kind == "tcp" and where[0] not in ("127.0.0.1", "localhost", "::1"):
+        logger.error(f"{args.address}: the daemon only listens on localhost")
+        return 1
+
+    from dep_license.backends import backend_from_spec
+    from dep_license.backends import JsonApiBackend
+
+    try:
+        backends = [
+            backend_from_spec(spec, not args.no_wheel_metadata) for spec in args.source
+        ] or [JsonApiBackend(wheel_metadata=not args.no_wheel_metadata)]
+    except ValueError as e:
+        logger.error(f"{e}")
+        return 1
+
+    policy = None
+    if args.check:
+        if not os.path.isfile(args.check):
+            logger.error("configuration file not found")
+            return 1
+        from dep_license.policy import LicensePolicy
+
+        policy = LicensePolicy.from_config(args.check)
+
+    cache = manifests = index = None
+    if not args.no_cache:
+        cache = MetadataCache(args.cache_dir, ttl=args.cache_ttl)
+        manifests = manifest_cache(args.cache_dir)
+    if args.index:
+        from dep_license.index import LicenseIndex
+
+        try:
+            index = LicenseIndex(args.index)
+        except (OSError, ValueError) as e:
+            logger.error(f"{args.index}: {e}")
+            for c in (cache, manifests):
+                if c is not None:
+                    c.close()
+            return 1
+
+    scanner = Scanner(
+        max_workers=args.workers,
+        session=Session(rate=args.rate_limit, retries=args.retries, backends=backends),
+        cache=cache,
+        manifests=manifests,
+        index=index,
+        policy=policy,
+    )
+    try:
+        server = make_server(args.address, scanner)
+    except OSError as e:
+        logger.error(f"{args.address}: {e}")
+        scanner.close()
+        return 1
+    if threading.current_thread() is threading.main_thread():
+        # stop cleanly (and remove the socket) on `kill` as well as Ctrl-C
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"deplic {dep_license.__version__} listening on {args.address}", flush=True)
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        if kind == "unix" and os.path.exists(where):
+            os.remove(where)
+        scanner.close()
+        for c in (cache, manifests, index):
+            if c is not None:
+                c.close()
+    return 0
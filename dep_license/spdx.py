@@ -0,0 +1,454 @@
+"""
+Normalization of license metadata to SPDX identifiers.
+
+`to_spdx()` turns the free-form `license` field and the trove classifiers
+of a package into an SPDX license expression:
+
+* the `license` field is looked up in a table of SPDX ids and common
+  free-text spellings (`Apache License, Version 2.0`, `GPLv3+`, ...),
+  then parsed as an expression (`MIT OR Apache-2.0`);
+* full license texts pasted into the `license` field are recognized by a
+  few fingerprint phrases instead of fuzzy matching;
+* otherwise the `License ::` classifiers are mapped through a frozen table.
+
+Classifiers and spellings that do not name a single license (`BSD
+License`, `GNU General Public License (GPL)`, ...) are deliberately left
+unmapped. Results are memoized per distinct string.
+"""
+import functools
+import re
+from types import MappingProxyType
+
+# trove classifier -> SPDX id, for every classifier that names one license
+_CLASSIFIERS = {
+    "Aladdin Free Public License (AFPL)": "Aladdin",
+    "CC0 1.0 Universal (CC0 1.0) Public Domain Dedication": "CC0-1.0",
+    "CeCILL-B Free Software License Agreement (CECILL-B)": "CECILL-B",
+    "CeCILL-C Free Software License Agreement (CECILL-C)": "CECILL-C",
+    "Netscape Public License (NPL)": "NPL-1.1",
+    "Nokia Open Source License (NOKOS)": "Nokia",
+    "OSI Approved :: Apache Software License": "Apache-2.0",
+    "OSI Approved :: Attribution Assurance License": "AAL",
+    "OSI Approved :: Blue Oak Model License (BlueOak-1.0.0)": "BlueOak-1.0.0",
+    "OSI Approved :: Boost Software License 1.0 (BSL-1.0)": "BSL-1.0",
+    "OSI Approved :: CEA CNRS Inria Logiciel Libre License, version 2.1 "
+    "(CeCILL-2.1)": "CECILL-2.1",
+    "OSI Approved :: Common Development and Distribution License 1.0 "
+    "(CDDL-1.0)": "CDDL-1.0",
+    "OSI Approved :: Common Public License": "CPL-1.0",
+    "OSI Approved :: Eclipse Public License 1.0 (EPL-1.0)": "EPL-1.0",
+    "OSI Approved :: Eclipse Public License 2.0 (EPL-2.0)": "EPL-2.0",
+    "OSI Approved :: Educational Community License, Version 2.0 (ECL-2.0)": "ECL-2.0",
+    "OSI Approved :: European Union Public Licence 1.0 (EUPL 1.0)": "EUPL-1.0",
+    "OSI Approved :: European Union Public Licence 1.1 (EUPL 1.1)": "EUPL-1.1",
+    "OSI Approved :: European Union Public Licence 1.2 (EUPL 1.2)": "EUPL-1.2",
+    "OSI Approved :: GNU Affero General Public License v3": "AGPL-3.0-only",
+    "OSI Approved :: GNU Affero General Public License v3 or later (AGPLv3+)": "AGPL-3.0-or-later",
+    "OSI Approved :: GNU General Public License v2 (GPLv2)": "GPL-2.0-only",
+    "OSI Approved :: GNU General Public License v2 or later (GPLv2+)": "GPL-2.0-or-later",
+    "OSI Approved :: GNU General Public License v3 (GPLv3)": "GPL-3.0-only",
+    "OSI Approved :: GNU General Public License v3 or later (GPLv3+)": "GPL-3.0-or-later",
+    "OSI Approved :: GNU Lesser General Public License v2 (LGPLv2)": "LGPL-2.0-only",
+    "OSI Approved :: GNU Lesser General Public License v2 or later (LGPLv2+)": "LGPL-2.0-or-later",
+    "OSI Approved :: GNU Lesser General Public License v3 (LGPLv3)": "LGPL-3.0-only",
+    "OSI Approved :: GNU Lesser General Public License v3 or later (LGPLv3+)": "LGPL-3.0-or-later",
+    "OSI Approved :: Historical Permission Notice and Disclaimer (HPND)": "HPND",
+    "OSI Approved :: IBM Public License": "IPL-1.0",
+    "OSI Approved :: ISC License (ISCL)": "ISC",
+    "OSI Approved :: Intel Open Source License": "Intel",
+    "OSI Approved :: MIT License": "MIT",
+    "OSI Approved :: MIT No Attribution License (MIT-0)": "MIT-0",
+    "OSI Approved :: MirOS License (MirOS)": "MirOS",
+    "OSI Approved :: Motosoto License": "Motosoto",
+    "OSI Approved :: Mozilla Public License 1.0 (MPL)": "MPL-1.0",
+    "OSI Approved :: Mozilla Public License 1.1 (MPL 1.1)": "MPL-1.1",
+    "OSI Approved :: Mozilla Public License 2.0 (MPL 2.0)": "MPL-2.0",
+    "OSI Approved :: Mulan Permissive Software License v2 (MulanPSL-2.0)": "MulanPSL-2.0",
+    "OSI Approved :: Nethack General Public License": "NGPL",
+    "OSI Approved :: Nokia Open Source License": "Nokia",
+    "OSI Approved :: Open Group Test Suite License": "OGTSL",
+    "OSI Approved :: Open Software License 3.0 (OSL-3.0)": "OSL-3.0",
+    "OSI Approved :: PostgreSQL License": "PostgreSQL",
+    "OSI Approved :: Python License (CNRI Python License)": "CNRI-Python",
+    "OSI Approved :: Python Software Foundation License": "PSF-2.0",
+    "OSI Approved :: Qt Public License (QPL)": "QPL-1.0",
+    "OSI Approved :: Ricoh Source Code Public License": "RSCPL",
+    "OSI Approved :: SIL Open Font License 1.1 (OFL-1.1)": "OFL-1.1",
+    "OSI Approved :: Sleepycat License": "Sleepycat",
+    "OSI Approved :: Sun Industry Standards Source License (SISSL)": "SISSL",
+    "OSI Approved :: Sun Public License": "SPL-1.0",
+    "OSI Approved :: The Unlicense (Unlicense)": "Unlicense",
+    "OSI Approved :: Universal Permissive License (UPL)": "UPL-1.0",
+    "OSI Approved :: University of Illinois/NCSA Open Source License": "NCSA",
+    "OSI Approved :: Vovida Software License 1.0": "VSL-1.0",
+    "OSI Approved :: W3C License": "W3C",
+    "OSI Approved :: X.Net License": "Xnet",
+    "OSI Approved :: Zero-Clause BSD (0BSD)": "0BSD",
+    "OSI Approved :: zlib/libpng License": "Zlib",
+}
+
+# free-text spellings -> SPDX id; SPDX ids themselves are added below
+_ALIASES = {
+    "agpl 3": "AGPL-3.0-only",
+    "agpl 3.0": "AGPL-3.0-only",
+    "agplv3": "AGPL-3.0-only",
+    "agplv3+": "AGPL-3.0-or-later",
+    "agpl 3.0+": "AGPL-3.0-or-later",
+    "gnu agplv3": "AGPL-3.0-only",
+    "gnu agplv3+": "AGPL-3.0-or-later",
+    "apache 2": "Apache-2.0",
+    "apache 2.0": "Apache-2.0",
+    "apache2": "Apache-2.0",
+    "apache software": "Apache-2.0",
+    "apache software 2.0": "Apache-2.0",
+    "asl 2.0": "Apache-2.0",
+    "al 2.0": "Apache-2.0",
+    "bsd 2 clause": "BSD-2-Clause",
+    "2 clause bsd": "BSD-2-Clause",
+    "simplified bsd": "BSD-2-Clause",
+    "freebsd": "BSD-2-Clause",
+    "bsd 3 clause": "BSD-3-Clause",
+    "3 clause bsd": "BSD-3-Clause",
+    "new bsd": "BSD-3-Clause",
+    "modified bsd": "BSD-3-Clause",
+    "revised bsd": "BSD-3-Clause",
+    "bsd 4 clause": "BSD-4-Clause",
+    "bsl 1.0": "BSL-1.0",
+    "boost": "BSL-1.0",
+    "boost software 1.0": "BSL-1.0",
+    "cc0": "CC0-1.0",
+    "cc0 1.0": "CC0-1.0",
+    "cc0 1.0 universal": "CC0-1.0",
+    "epl 1.0": "EPL-1.0",
+    "epl 2.0": "EPL-2.0",
+    "eclipse public 2.0": "EPL-2.0",
+    "eupl 1.2": "EUPL-1.2",
+    "gplv2": "GPL-2.0-only",
+    "gpl v2": "GPL-2.0-only",
+    "gpl 2": "GPL-2.0-only",
+    "gpl 2.0": "GPL-2.0-only",
+    "gnu gplv2": "GPL-2.0-only",
+    "gplv2 or later": "GPL-2.0-or-later",
+    "gpl v2 or later": "GPL-2.0-or-later",
+    "gpl 2 or later": "GPL-2.0-or-later",
+    "gplv2+": "GPL-2.0-or-later",
+    "gpl v2+": "GPL-2.0-or-later",
+    "gpl 2.0+": "GPL-2.0-or-later",
+    "gpl 2+": "GPL-2.0-or-later",
+    "gplv3": "GPL-3.0-only",
+    "gpl v3": "GPL-3.0-only",
+    "gpl 3": "GPL-3.0-only",
+    "gpl 3.0": "GPL-3.0-only",
+    "gnu gplv3": "GPL-3.0-only",
+    "gnu gpl v3": "GPL-3.0-only",
+    "gnu general public v3": "GPL-3.0-only",
+    "gplv3+": "GPL-3.0-or-later",
+    "gpl v3+": "GPL-3.0-or-later",
+    "gpl 3.0+": "GPL-3.0-or-later",
+    "gpl 3+": "GPL-3.0-or-later",
+    "gnu gplv3+": "GPL-3.0-or-later",
+    "gplv3 or later": "GPL-3.0-or-later",
+    "gpl v3 or later": "GPL-3.0-or-later",
+    "gpl 3 or later": "GPL-3.0-or-later",
+    "isc": "ISC",
+    "iscl": "ISC",
+    "lgplv2": "LGPL-2.0-only",
+    "lgplv2+": "LGPL-2.0-or-later",
+    "lgpl 2.1": "LGPL-2.1-only",
+    "lgplv2.1": "LGPL-2.1-only",
+    "lgpl 2.1+": "LGPL-2.1-or-later",
+    "lgplv2.1+": "LGPL-2.1-or-later",
+    "lgplv3": "LGPL-3.0-only",
+    "lgpl v3": "LGPL-3.0-only",
+    "lgpl 3": "LGPL-3.0-only",
+    "lgpl 3.0": "LGPL-3.0-only",
+    "lgplv3+": "LGPL-3.0-or-later",
+    "lgplv3 or later": "LGPL-3.0-or-later",
+    "lgpl 2.1 or later": "LGPL-2.1-or-later",
+    "lgpl 3.0+": "LGPL-3.0-or-later",
+    "mit": "MIT",
+    "expat": "MIT",
+    "mit expat": "MIT",
+    "mit 0": "MIT-0",
+    "mpl 1.1": "MPL-1.1",
+    "mpl 2": "MPL-2.0",
+    "mpl 2.0": "MPL-2.0",
+    "mplv2": "MPL-2.0",
+    "mozilla public 2.0": "MPL-2.0",
+    "postgresql": "PostgreSQL",
+    "psf": "PSF-2.0",
+    "psfl": "PSF-2.0",
+    "psf 2": "PSF-2.0",
+    "python software foundation": "PSF-2.0",
+    "unlicense": "Unlicense",
+    "wtfpl": "WTFPL",
+    "zlib": "Zlib",
+    "zlib libpng": "Zlib",
+    "zpl 2.1": "ZPL-2.1",
+    "zope public 2.1": "ZPL-2.1",
+}
+
+# SPDX ids that only appear as alias targets or spellings of their own
+_IDS = [
+    "0BSD",
+    "AGPL-3.0-only",
+    "AGPL-3.0-or-later",
+    "Apache-1.1",
+    "Apache-2.0",
+    "Artistic-2.0",
+    "BSD-1-Clause",
+    "BSD-2-Clause",
+    "BSD-3-Clause",
+    "BSD-4-Clause",
+    "BSL-1.0",
+    "CC-BY-4.0",
+    "CC-BY-SA-4.0",
+    "CC0-1.0",
+    "EPL-1.0",
+    "EPL-2.0",
+    "GPL-2.0-only",
+    "GPL-2.0-or-later",
+    "GPL-3.0-only",
+    "GPL-3.0-or-later",
+    "HPND",
+    "ISC",
+    "LGPL-2.0-only",
+    "LGPL-2.0-or-later",
+    "LGPL-2.1-only",
+    "LGPL-2.1-or-later",
+    "LGPL-3.0-only",
+    "LGPL-3.0-or-later",
+    "MIT",
+    "MIT-0",
+    "MPL-1.1",
+    "MPL-2.0",
+    "PSF-2.0",
+    "Python-2.0",
+    "Unlicense",
+    "WTFPL",
+    "Zlib",
+    "ZPL-2.1",
+]
+
+# deprecated SPDX ids that are still common in package metadata
+_DEPRECATED = {
+    "AGPL-3.0": "AGPL-3.0-only",
+    "AGPL-3.0+": "AGPL-3.0-or-later",
+    "GPL-2.0": "GPL-2.0-only",
+    "GPL-2.0+": "GPL-2.0-or-later",
+    "GPL-3.0": "GPL-3.0-only",
+    "GPL-3.0+": "GPL-3.0-or-later",
+    "LGPL-2.0": "LGPL-2.0-only",
+    "LGPL-2.0+": "LGPL-2.0-or-later",
+    "LGPL-2.1": "LGPL-2.1-only",
+    "LGPL-2.1+": "LGPL-2.1-or-later",
+    "LGPL-3.0": "LGPL-3.0-only",
+    "LGPL-3.0+": "LGPL-3.0-or-later",
+}
+
+# (SPDX id, title, version): license texts and notices name their license
+# first, so titles are only looked for in the first HEAD_WORDS words, and the
+# earliest one wins, with the version that follows it first. Titles cited
+# further down, like the Affero GPL in the GPL-3.0 text or the GNU licenses
+# in the MPL-2.0 text, do not count.
+_TITLES = [
+    ("AGPL-3.0", "gnu affero general public license", "version 3"),
+    ("LGPL-2.1", "gnu lesser general public license", "version 2 1"),
+    ("LGPL-3.0", "gnu lesser general public license", "version 3"),
+    ("LGPL-2.0", "gnu library general public license", "version 2"),
+    ("GPL-3.0", "gnu general public license", "version 3"),
+    ("GPL-2.0", "gnu general public license", "version 2"),
+    ("Apache-2.0", "apache license", "version 2 0"),
+    ("MPL-2.0", "mozilla public license", "2 0"),
+    ("MPL-1.1", "mozilla public license", "1 1"),
+    ("EPL-2.0", "eclipse public license", "2 0"),
+    ("EPL-1.0", "eclipse public license", "1 0"),
+    ("BSL-1.0", "boost software license", "version 1 0"),
+    ("PSF-2.0", "python software foundation license", ""),
+    ("CC0-1.0", "cc0 1 0 universal", ""),
+    ("WTFPL", "do what the fuck you want to public license", ""),
+]
+HEAD_WORDS = 120
+
+# ordered (SPDX id, phrases that must all appear), first match wins; for
+# texts without a known title, checked against all their normalized words
+_FINGERPRINTS = [
+    ("Unlicense", ["free and unencumbered software released into the public"]),
+    (
+        "MIT",
+        [
+            "permission is hereby granted free of charge to any person",
+            "the above copyright notice and this permission notice shall be",
+        ],
+    ),
+    ("MIT-0", ["permission is hereby granted free of charge to any person"]),
+    (
+        "ISC",
+        [
+            "permission to use copy modify and or distribute this software",
+            "provided that the above copyright notice",
+        ],
+    ),
+    ("0BSD", ["permission to use copy modify and or distribute this software"]),
+    (
+        "BSD-4-Clause",
+        ["redistribution and use in source and binary forms", "advertising"],
+    ),
+    (
+        "BSD-3-Clause",
+        ["redistribution and use in source and binary forms", "endorse or promote"],
+    ),
+    ("BSD-2-Clause", ["redistribution and use in source and binary forms"]),
+    ("Zlib", ["altered source versions must be plainly marked as such"]),
+]
+_VERSIONED = ("AGPL-", "GPL-", "LGPL-")
+
+# anything longer than this is treated as a pasted license text
+FULL_TEXT_MIN_LENGTH = 200
+
+_WORD = re.compile(r"[a-z0-9.+]+")
+_TEXT_WORD = re.compile(r"[a-z0-9]+")
+_NOISE = {"the", "license", "licence", "licensed", "version", "under"}
+_OPERATOR = re.compile(r"(\s+(?:AND|OR|WITH)\s+|[()])", re.I)
+_ID = re.compile(r"^[A-Za-z0-9.+-]+$")
+
+
+def license_key(text):
+    """Lowercase words of `text` without the ones every license name shares."""
+    words = (w.strip(".") for w in _WORD.findall(text.lower()))
+    # "MIT License (MIT)" and "Apache 2.0 (Apache-2.0)" name the license twice
+    return " ".join(dict.fromkeys(w for w in words if w and w not in _NOISE))
+
+
+def _build_aliases():
+    aliases = {}
+    for spdx_id in _IDS + list(_CLASSIFIERS.values()):
+        aliases[license_key(spdx_id)] = spdx_id
+    for old, new in _DEPRECATED.items():
+        aliases[license_key(old)] = new
+    for key, spdx_id in _ALIASES.items():
+        aliases[license_key(key)] = spdx_id
+    aliases.pop("", None)
+    return aliases
+
+
+def classifier_key(classifier):
+    """`make_record()` form of a classifier, e.g. `OSI Approved::MIT License`."""
+    parts = [x.strip() for x in classifier.split("::")]
+    if parts[0] == "License":
+        parts = parts[1:]
+    return "::".join(parts)
+
+
+CLASSIFIERS = MappingProxyType({classifier_key(k): v for k, v in _CLASSIFIERS.items()})
+ALIASES = MappingProxyType(_build_aliases())
+
+
+def from_classifier(classifier):
+    """SPDX id of a `License ::` classifier, or None."""
+    return CLASSIFIERS.get(classifier_key(classifier))
+
+
+def _find(phrase, words, start=0):
+    """Position of `phrase` as whole words in `words` from `start`, or -1."""
+    return f" {words} ".find(f" {phrase} ", start)
+
+
+def _from_title(head):
+    """
+    SPDX id of the earliest title in `head`, with the version named first
+    after it; None when two licenses are equally likely.
+    """
+    matches = []
+    for spdx_id, title, version in _TITLES:
+        pos = _find(title, head)
+        if pos < 0:
+            continue
+        version_pos = _find(version, head, pos) if version else pos
+        if version_pos >= 0:
+            matches.append(((pos, version_pos), spdx_id))
+    if not matches:
+        return None
+    matches.sort()
+    if len(matches) > 1 and matches[0][0] == matches[1][0]:
+        return None
+    return matches[0][1]
+
+
+def from_full_text(text):
+    """Recognize a pasted license text by its title or fingerprint phrases."""
+    words = _TEXT_WORD.findall(text.lower())
+    normalized = " ".join(words)
+    spdx_id = _from_title(" ".join(words[:HEAD_WORDS]))
+    if spdx_id is None:
+        for candidate, phrases in _FINGERPRINTS:
+            if all(p in normalized for p in phrases):
+                spdx_id = candidate
+                break
+        else:
+            return None
+    if spdx_id.startswith(_VERSIONED):
+        # a bare license text grants no "or later"; a notice may
+        later = "any later version" in normalized
+        full = "terms and conditions" in normalized
+        spdx_id += "-or-later" if later and not full else "-only"
+    return spdx_id
+
+
+def _from_expression(text):
+    tokens = [t.strip() for t in _OPERATOR.split(text) if t and t.strip()]
+    if len(tokens) < 2:
+        return None
+    out = []
+    after_with = False
+    for token in tokens:
+        upper = token.upper()
+        if upper in ("AND", "OR", "WITH"):
+            out.append(upper)
+            after_with = upper == "WITH"
+        elif token in ("(", ")"):
+            out.append(token)
+        elif after_with and _ID.match(token):
+            # license exceptions (e.g. Classpath-exception-2.0) pass through
+            out.append(token)
+            after_with = False
+        else:
+            spdx_id = ALIASES.get(license_key(token))
+            if spdx_id is None:
+                return None
+            out.append(spdx_id)
+    return " ".join(out).replace("( ", "(").replace(" )", ")")
+
+
+@functools.lru_cache(maxsize=4096)
+def from_text(text):
+    """SPDX expression for a free-form `license` field, or None."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    spdx_id = ALIASES.get(license_key(text))
+    if spdx_id is not None:
+        return spdx_id
+    if len(text) >= FULL_TEXT_MIN_LENGTH or "\n" in text:
+        return from_full_text(text)
+    return _from_expression(text)
+
+
+@functools.lru_cache(maxsize=4096)
+def _from_classifiers(classifiers):
+    ids = []
+    for c in classifiers:
+        spdx_id = from_classifier(c)
+        if spdx_id is not None and spdx_id not in ids:
+            ids.append(spdx_id)
+    return " OR ".join(ids)
+
+
+def to_spdx(meta, classifiers=()):
+    """
+    SPDX expression for a package's `license` field and classifiers, or an
+    empty string when neither names a known license.
+    """
+    return from_text(meta) or _from_classifiers(
+        tuple(c for c in classifiers or () if c.startswith("License"))
+    )
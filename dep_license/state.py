@@ -0,0 +1,155 @@
+"""
+Incremental scans for `--state` and `--since`.
+
+`--state FILE` keeps what a run saw in a small JSON file: the settings that
+shape the report, a hash of every manifest, the dependency set and the
+records that were reported. On the next run:
+
+    manifests and dependencies unchanged  the stored report is replayed (and
+                                          re-checked against the policy)
+                                          without any network access
+    same settings                         only added dependencies, those
+                                          pinned to another version and
+                                          those whose lookup failed are
+                                          looked up
+    other settings (`--source`,           every dependency is looked up
+    `--index`, ...)                       again
+
+`--since REF` reads the manifests of local projects as they were at a git
+ref and reports only the dependencies that were added or re-pinned since.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from dep_license.fetch import cache_key
+
+logger = logging.getLogger("dep_license")
+
+STATE_VERSION = 1
+
+
+def dependency_key(d):
+    """Key of a dependency in the state file, e.g. `foo==1.0` or `bar`."""
+    return cache_key(d, getattr(d, "version", None))
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ScanState(object):
+    """What a scan saw and reported; see the module docstring."""
+
+    def __init__(self, settings=None, manifests=None, dependencies=(), records=None):
+        self.settings = settings or {}
+        self.manifests = manifests or {}
+        self.dependencies = sorted(set(dependencies))
+        self.records = records or {}
+
+    @classmethod
+    def load(cls, path):
+        """Return the state stored in `path`, or None if there is none."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"{path}: ignoring unreadable state file: {e}")
+            return None
+        if not isinstance(data, dict) or data.get("version") != STATE_VERSION:
+            logger.debug(f"{path}: ignoring state file of another version")
+            return None
+        return cls(
+            settings=data.get("settings"),
+            manifests=data.get("manifests"),
+            dependencies=data.get("dependencies") or (),
+            records=data.get("records"),
+        )
+
+    def save(self, path):
+        """Write the state atomically, so an interrupted run keeps the old one."""
+        data = {
+            "version": STATE_VERSION,
+            "settings": self.settings,
+            "manifests": self.manifests,
+            "dependencies": self.dependencies,
+            "records": self.records,
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def unchanged(self, other):
+        """
+        Whether `other` would produce exactly the report stored here. A
+        dependency without a record (its lookup failed) must be looked up
+        again, so the report is then not complete.
+        """
+        return (
+            bool(self.records)
+            and self.settings == other.settings
+            and self.manifests == other.manifests
+            and self.dependencies == other.dependencies
+            and set(self.dependencies) <= set(self.records)
+        )
+
+    def record(self, d):
+        """The record stored for dependency `d` at the same version, or None."""
+        return self.records.get(dependency_key(d))
+
+
+def resolve_ref(project, ref):
+    """Full commit hash of `ref` in the repo holding `project`, or None."""
+    import git
+
+    path = os.path.abspath(project)
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    try:
+        return git.Git(directory).rev_parse("--verify", "--quiet", f"{ref}^{{commit}}")
+    except git.GitCommandError as e:
+        logger.debug(f"{project}: {e}")
+        return None
+
+
+def dependencies_at(project, ref, req_files, parse):
+    """
+    Return the dependencies of a local project as they were at git `ref`.
+
+    Manifests that did not exist at `ref` contribute nothing.
+    """
+    import git
+
+    path = os.path.abspath(project)
+    if os.path.isdir(path):
+        directory, names = path, list(req_files)
+    else:
+        directory, name = os.path.split(path)
+        names = [name] if name in req_files else []
+
+    g = git.Git(directory)
+    dependencies = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for f in names:
+            try:
+                content = g.show(f"{ref}:./{f}", stdout_as_string=False)
+            except git.GitCommandError:
+                continue
+            filename = os.path.join(tmp, f)
+            with open(filename, "wb") as out:
+                out.write(content)
+            dependencies += parse(filename, f)
+    return dependencies
@@ -1,110 +1,433 @@
+import ast
+import hashlib
 import json
 import logging
 import os
+import re
 import sys
+import threading
 from collections import OrderedDict
 
-import pkg_resources
-import toml
-import yaml
-from distutils.core import run_setup
-
 logger = logging.getLogger("__name__")
 
+# run_setup() executes setup.py with the process-wide cwd and sys.path changed
+_SETUP_LOCK = threading.Lock()
+
+# bump whenever parser output changes, to invalidate cached manifests
+PARSER_VERSION = "3"
+
+
+# PEP 508 distribution name, followed by whatever may legally come next
+_REQ_NAME = re.compile(
+    r"([A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)\s*(?=$|[\[(;@<>=!~,])"
+)
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9.]+")
+# a single exact `==` pin right after the name and extras, e.g. `foo[x]==1.0`
+_PIN = re.compile(
+    r"\s*(?:\[[^\]]*\])?\s*\(?\s*===?\s*([A-Za-z0-9][A-Za-z0-9._+!-]*)\s*\)?"
+    r"\s*(?=$|;|--)"
+)
+
+
+class Dependency(str):
+    """
+    A distribution name that also carries the version it is pinned or
+    locked to (None when it is not).
+
+    It compares, hashes and serializes like the plain name, so code that
+    only cares about names keeps working unchanged.
+    """
 
-def parse_file(input_file, base_name, dev=False):
+    def __new__(cls, name, version=None):
+        self = super().__new__(cls, name)
+        self.version = version
+        return self
+
+    def __reduce__(self):
+        return (Dependency, (str(self), self.version))
+
+
+def pinned(spec):
+    """Version of an exact `==` specifier such as Pipfile's `"==1.0"`."""
+    if isinstance(spec, dict):
+        spec = spec.get("version")
+    if not isinstance(spec, str):
+        return None
+    m = _PIN.match(spec)
+    return m.group(1) if m is not None else None
+
+
+def toml_loads(text):
+    """Decode TOML with tomllib / tomli when available, else `toml`."""
     try:
-        if base_name == "Pipfile":
-            return parse_pip_file(input_file, dev=dev)
+        import tomllib as toml
+    except ImportError:  # pragma: no cover
+        try:
+            import tomli as toml
+        except ImportError:
+            import toml
 
-        elif base_name == "Pipfile.lock":
-            return parse_pip_lock_file(input_file, dev=dev)
+    return toml.loads(text)
 
-        elif base_name == "setup.py":
-            return parse_setup_file(input_file)
 
-        elif base_name == "pyproject.toml":
-            return parse_pyproject_file(input_file) + parse_pyproject_file_poetry(
-                input_file
-            )
+def toml_load(input_file):
+    with open(input_file, "rb") as f:
+        return toml_loads(f.read().decode("utf-8"))
 
-        elif base_name == "conda.yml":
-            return parse_conda_yaml_file(input_file)
 
-        elif base_name == "poetry.lock":
-            return parse_poetry_lock_file(input_file)
-        else:
-            return parse_req_file(input_file)
+def yaml_loads(text):
+    """Decode YAML with libyaml's C loader when it is available."""
+    import yaml
+
+    return yaml.load(text, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+def requirement_names(lines):
+    """
+    Extract distribution names from requirement specifiers.
+
+    A lightweight replacement for `pkg_resources.parse_requirements` that
+    only pulls out names (as `Dependency`, with the version of an exact `==`
+    pin): comments, blank lines and `\\` continuations are handled, and
+    anything that is not a PEP 508 requirement (URLs, paths, pip options) is
+    skipped.
+    """
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    output = []
+    pending = ""
+    for line in lines:
+        line = pending + line.rstrip("\r\n")
+        pending = ""
+        if line.endswith("\\"):
+            pending = line[:-1]
+            continue
+        if line.lstrip().startswith("#"):
+            continue
+        if " #" in line:
+            line = line[: line.find(" #")]
+        line = line.strip()
+        if not line:
+            continue
+        m = _REQ_NAME.match(line)
+        if m is not None:
+            pin = _PIN.match(line, m.end())
+            output.append(Dependency(m.group(1), pin.group(1) if pin else None))
+    return output
+
+
+def safe_name(name):
+    """Same as `pkg_resources.safe_name`."""
+    return _SAFE_NAME.sub("-", name)
+
+
+def project_names(reqs):
+    return [Dependency(safe_name(d), d.version) for d in requirement_names(reqs)]
+
+
+def manifest_key(data, base_name, dev=False):
+    h = hashlib.sha256(data)
+    h.update(f"\0{base_name}\0{int(dev)}\0{PARSER_VERSION}".encode())
+    return h.hexdigest()
+
+
+def parse_file(input_file, base_name, dev=False, exec_setup=False, cache=None):
+    """
+    Return the dependencies (`Dependency` names) declared in a manifest.
+
+    The file is read and decoded exactly once. With a `cache` (a
+    `MetadataCache`), results are stored by content hash so an unchanged
+    manifest is never decoded again.
+    """
+    try:
+        with open(input_file, "rb") as f:
+            data = f.read()
+        key = None
+        if cache is not None:
+            key = manifest_key(data, base_name, dev)
+            entry = cache.get(key)
+            if entry is not None:
+                return [Dependency(name, version) for name, version in entry.data]
+
+        output, cacheable = parse_manifest(
+            data, base_name, input_file, dev=dev, exec_setup=exec_setup
+        )
+        if cache is not None and cacheable:
+            cache.set(key, [[d, getattr(d, "version", None)] for d in output])
+        return output
     except Exception as e:
         logger.error(f"{base_name}: {e}")
         return []
 
 
+def parse_manifest(data, base_name, input_file, dev=False, exec_setup=False):
+    """
+    Parse the raw bytes of a manifest.
+
+    Returns the dependency names and whether they depend on `data` alone
+    (and can therefore be cached by its hash).
+    """
+    if base_name == "setup.py":
+        return _parse_setup(data, input_file, exec_setup)
+
+    text = data.decode("utf-8")
+    if base_name == "Pipfile":
+        output = _pip_file(toml_loads(text), dev=dev)
+
+    elif base_name == "Pipfile.lock":
+        output = _pip_lock(json.loads(text, object_pairs_hook=OrderedDict), dev=dev)
+
+    elif base_name == "pyproject.toml":
+        cf = toml_loads(text)
+        output = _pyproject(cf) + _pyproject_poetry(cf)
+
+    elif base_name == "conda.yml":
+        output = _conda(yaml_loads(text))
+
+    elif base_name == "poetry.lock":
+        output = _poetry_lock(toml_loads(text))
+    else:
+        output = _requirements(text.splitlines(True))
+    return output, True
+
+
+def _requirements(lines):
+    lines = [x for x in lines if not x.startswith("-")]
+    return requirement_names(lines)
+
+
 def parse_req_file(input_file):
-    output = []
     with open(input_file) as f:
-        lines = [x for x in f.readlines() if not x.startswith("-")]
-        for line in lines:
-            try:
-                for r in pkg_resources.parse_requirements(line):
-                    output.append(r.name)
-            except pkg_resources.RequirementParseError:
-                pass
+        return _requirements(f.readlines())
 
-    return output
+
+def _pip_file(cf, dev=False):
+    sections = ["packages", "dev-packages"] if dev else ["packages"]
+    return [
+        Dependency(k, pinned(v)) for s in sections for k, v in cf.get(s, {}).items()
+    ]
 
 
 def parse_pip_file(input_file, dev=False):
-    output = []
-    cf = toml.load(input_file)
-    output += list(cf.get("packages", {}).keys())
-    if dev:
-        output += list(cf.get("dev-packages", {}).keys())
-    return output
+    return _pip_file(toml_load(input_file), dev=dev)
 
 
-def parse_pip_lock_file(input_file, dev=False):
+def _pip_lock(cf, dev=False):
     output = []
     r_type = ["default"]
     if dev:
         r_type.append("develop")
-    with open(input_file, "r") as f:
-        cf = json.load(f, object_pairs_hook=OrderedDict)
     if cf:
         for t in r_type:
-            output.extend(list(cf[t].keys()))
+            output.extend(Dependency(k, pinned(v)) for k, v in cf[t].items())
 
     return output
 
 
+def parse_pip_lock_file(input_file, dev=False):
+    with open(input_file, "r") as f:
+        cf = json.load(f, object_pairs_hook=OrderedDict)
+    return _pip_lock(cf, dev=dev)
+
+
+def _pyproject(cf):
+    return project_names(cf.get("build-system", {}).get("requires", []))
+
+
 def parse_pyproject_file(input_file):
-    output = []
-    cf = toml.load(input_file)
-    reqs = cf.get("build-system", {}).get("requires", [])
-    for i in pkg_resources.parse_requirements(reqs):
-        output.append(i.project_name)
-    return output
+    return _pyproject(toml_load(input_file))
 
 
-def parse_pyproject_file_poetry(input_file):
-    cf = toml.load(input_file)
+def _pyproject_poetry(cf):
     return [
-        k
+        Dependency(k, pinned(v))
         for k, v in cf.get("tool", {}).get("poetry", {}).get("dependencies", {}).items()
         if not (isinstance(v, dict) and "path" in v) and k not in ["python"]
     ]
 
 
+def parse_pyproject_file_poetry(input_file):
+    return _pyproject_poetry(toml_load(input_file))
+
+
+def _poetry_lock(cf):
+    return [
+        Dependency(pkg["name"], pkg.get("version"))
+        for pkg in cf.get("package", [])
+        if "name" in pkg
+    ]
+
+
 def parse_poetry_lock_file(input_file):
+    return _poetry_lock(toml_load(input_file))
+
+
+SETUP_REQS = ["install_requires", "setup_requires", "extras_require"]
+
+
+class Unresolvable(Exception):
+    pass
+
+
+def _literal(node, names):
+    """Evaluate a constant expression, resolving module-level names."""
+    if isinstance(node, ast.Constant):
+        return node.value
+    if sys.version_info < (3, 8):
+        # before 3.8, literals are parsed into these node types
+        if isinstance(node, (ast.Str, ast.Bytes)):
+            return node.s
+        if isinstance(node, ast.Num):
+            return node.n
+        if isinstance(node, ast.NameConstant):
+            return node.value
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return [_literal(x, names) for x in node.elts]
+    if isinstance(node, ast.Dict):
+        if any(k is None for k in node.keys):
+            raise Unresolvable("dict unpacking")
+        return {
+            _literal(k, names): _literal(v, names)
+            for k, v in zip(node.keys, node.values)
+        }
+    if isinstance(node, ast.Name):
+        if node.id not in names:
+            raise Unresolvable(node.id)
+        return names[node.id]
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = _literal(node.left, names), _literal(node.right, names)
+        if isinstance(left, list) and isinstance(right, list):
+            return left + right
+        if isinstance(left, str) and isinstance(right, str):
+            return left + right
+        raise Unresolvable("unsupported concatenation")
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in ("list", "tuple", "set", "dict")
+    ):
+        if node.func.id == "dict":
+            if node.args or any(k.arg is None for k in node.keywords):
+                raise Unresolvable("dict()")
+            return {k.arg: _literal(k.value, names) for k in node.keywords}
+        if node.keywords or len(node.args) > 1:
+            raise Unresolvable(f"{node.func.id}()")
+        return list(_literal(node.args[0], names)) if node.args else []
+    raise Unresolvable(type(node).__name__)
+
+
+def _is_setup_call(node):
+    if not isinstance(node, ast.Call):
+        return False
+    func = node.func
+    if isinstance(func, ast.Attribute):
+        return func.attr == "setup"
+    return isinstance(func, ast.Name) and func.id == "setup"
+
+
+def setup_requirements_ast(input_file, source=None):
+    """
+    Statically extract the requirement fields passed to `setup()`.
+
+    Only literals, module-level constants and list/str concatenation are
+    understood. Returns None if there is no `setup()` call or one of the
+    requirement fields cannot be resolved without running the file.
+    """
+    if source is None:
+        with open(input_file, "rb") as f:
+            source = f.read()
+    tree = ast.parse(source, filename=input_file)
+
+    names = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets, value = [node.target], node.value
+        elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+            targets = [node.target]
+            value = ast.BinOp(left=node.target, op=node.op, right=node.value)
+        else:
+            continue
+        for target in targets:
+            if not isinstance(target, ast.Name):
+                continue
+            try:
+                names[target.id] = _literal(value, names)
+            except Unresolvable:
+                names.pop(target.id, None)
+
+    calls = [n for n in ast.walk(tree) if _is_setup_call(n)]
+    if len(calls) != 1:
+        return None
+
+    reqs = {}
+    try:
+        for kw in calls[0].keywords:
+            if kw.arg is None:
+                kwargs = _literal(kw.value, names)
+                if not isinstance(kwargs, dict):
+                    return None
+                reqs.update({k: v for k, v in kwargs.items() if k in SETUP_REQS})
+            elif kw.arg in SETUP_REQS:
+                reqs[kw.arg] = _literal(kw.value, names)
+    except Unresolvable as e:
+        logger.debug(f"{input_file}: cannot resolve {e} statically")
+        return None
+    return reqs
+
+
+def _requirement_names(reqs):
     output = []
-    cf = toml.load(input_file)
-    output = [pkg["name"] for pkg in cf.get("package", []) if "name" in pkg]
+    for v in SETUP_REQS:
+        value = reqs.get(v)
+        if isinstance(value, str):
+            value = [value]
+        if isinstance(value, list):
+            output += project_names(value)
+
+        elif isinstance(value, dict):
+            extras = []
+            for req in value.values():
+                extras.extend([req] if isinstance(req, str) else req)
+            output += project_names(list(dict.fromkeys(extras)))
     return output
 
 
-def parse_setup_file(input_file):
-    output = []
+def _parse_setup(source, input_file, exec_setup=False):
+    try:
+        reqs = setup_requirements_ast(input_file, source)
+    except SyntaxError as e:
+        logger.error(f"{input_file}: {e}")
+        reqs = None
+
+    if reqs is not None:
+        return _requirement_names(reqs), True
+    if not exec_setup:
+        logger.warning(
+            f"{input_file}: requirements cannot be resolved statically, "
+            "use --exec-setup to run it"
+        )
+        return [], False
+    with _SETUP_LOCK:
+        return _parse_setup_file_exec(input_file), False
+
+
+def parse_setup_file(input_file, exec_setup=False):
+    """
+    Parse setup.py statically; only execute it through `run_setup` when
+    `exec_setup` is set and static analysis fails.
+    """
+    with open(input_file, "rb") as f:
+        source = f.read()
+    return _parse_setup(source, input_file, exec_setup=exec_setup)[0]
+
+
+def _parse_setup_file_exec(input_file):
+    from distutils.core import run_setup
+
     cur_dir = os.getcwd()
+    cur_path = list(sys.path)
     setup_dir = os.path.abspath(os.path.dirname(input_file))
     sys.path.append(setup_dir)
     os.chdir(setup_dir)
@@ -113,34 +436,26 @@ def parse_setup_file(input_file):
     except Exception as e:
         logger.error(f"run_setup: {e}")
         return []
+    finally:
+        os.chdir(cur_dir)
+        sys.path[:] = cur_path
 
-    reqs_var = ["install_requires", "setup_requires", "extras_require"]
-    for v in reqs_var:
-        reqs = getattr(setup, v)
-        if isinstance(reqs, list):
-            for i in pkg_resources.parse_requirements(reqs):
-                output.append(i.project_name)
-
-        elif isinstance(reqs, dict):
-            for i in pkg_resources.parse_requirements(
-                {v for req in reqs.values() for v in req}
-            ):
-                output.append(i.project_name)
-    os.chdir(cur_dir)
-    return output
+    return _requirement_names({v: getattr(setup, v) for v in SETUP_REQS})
 
 
-def parse_conda_yaml_file(input_file):
+def _conda(cf):
     output = []
-    with open(input_file, "r") as f:
-        cf = yaml.safe_load(f)
     if cf and "dependencies" in cf and isinstance(cf["dependencies"], list):
         reqs = []
         for r in cf["dependencies"]:
             if isinstance(r, dict) and "pip" in r:
                 for i in r["pip"]:
                     reqs.append(i)
-        for i in pkg_resources.parse_requirements(reqs):
-            output.append(i.project_name)
+        output += project_names(reqs)
 
     return output
+
+
+def parse_conda_yaml_file(input_file):
+    with open(input_file, "r") as f:
+        return _conda(yaml_loads(f))
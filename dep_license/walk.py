@@ -0,0 +1,194 @@
+"""
+Manifest discovery for `--recursive`.
+
+The tree is walked with `os.scandir`, whose directory entries already carry
+their type, so no `stat` call is made per file. Directories that never hold
+a project's own manifests (VCS data, `node_modules`, virtualenvs, caches,
+build output) are pruned before being entered, as are paths matched by the
+`.gitignore` / `.deplicignore` files found along the way or by `exclude`
+patterns. File names are looked up in a precomputed set.
+
+Virtualenvs are recognized by their `pyvenv.cfg`. The top-level
+directories are walked concurrently.
+"""
+import logging
+import os
+import re
+
+logger = logging.getLogger("dep_license")
+
+PRUNE_DIRS = frozenset(
+    [
+        ".git",
+        ".hg",
+        ".svn",
+        ".tox",
+        ".nox",
+        ".venv",
+        "venv",
+        ".eggs",
+        "node_modules",
+        "__pycache__",
+        "site-packages",
+        ".mypy_cache",
+        ".pytest_cache",
+    ]
+)
+IGNORE_FILES = (".gitignore", ".deplicignore")
+
+
+def translate(pattern):
+    """
+    Regex for a gitignore glob. Unlike `fnmatch.translate`, `*` and `?`
+    stop at `/`; `**/` matches any number of directories, `**` anything.
+    """
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c == "*" and pattern.startswith("*/", i):
+            parts.append("(?:.*/)?")
+            i += 2
+        elif c == "*" and pattern.startswith("*", i):
+            parts.append(".*")
+            i += 1
+        elif c == "*":
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c == "[" and pattern.find("]", i + 1) > 0:
+            j = pattern.find("]", i + 1)
+            chars = pattern[i:j].replace("\\", "\\\\")
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            parts.append(f"[{chars}]")
+            i = j + 1
+        else:
+            parts.append(re.escape(c))
+    return re.compile("(?s:" + "".join(parts) + r")\Z")
+
+
+class IgnoreRules(object):
+    """
+    The subset of gitignore syntax that matters for pruning: `#` comments,
+    `!` negation, a trailing `/` for directories only and patterns
+    containing a `/` being anchored to the directory of the ignore file.
+    As in git, `*` does not match a `/` but `**` does (see `translate`).
+    """
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+
+    def extend(self, base, lines):
+        """Return new rules with `lines` of an ignore file in `base` added."""
+        rules = list(self.rules)
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if line.startswith("**/"):
+                line = line[3:]
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if not line:
+                continue
+            regex = translate(line)
+            rules.append((base, regex, anchored, dir_only, negate))
+        return IgnoreRules(rules)
+
+    def match(self, path, name, is_dir):
+        ignored = False
+        for base, regex, anchored, dir_only, negate in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if anchored:
+                rel = os.path.relpath(path, base).replace(os.sep, "/")
+                hit = regex.match(rel) is not None
+            else:
+                hit = regex.match(name) is not None
+            if hit:
+                ignored = not negate
+        return ignored
+
+
+def read_ignore_files(directory, names, rules):
+    for ignore_file in IGNORE_FILES:
+        if ignore_file in names:
+            try:
+                with open(os.path.join(directory, ignore_file)) as f:
+                    rules = rules.extend(directory, f.readlines())
+            except (OSError, UnicodeDecodeError) as e:
+                logger.debug(f"{directory}: {e}")
+    return rules
+
+
+def _scan(directory):
+    """Return ([(name, path)] of files, [(path, name)] of subdirectories)."""
+    files = []
+    dirs = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append((entry.path, entry.name))
+                    elif entry.is_file():
+                        files.append((entry.name, entry.path))
+                except OSError:
+                    continue
+    except OSError as e:
+        logger.debug(f"{directory}: {e}")
+    return files, dirs
+
+
+def _walk(top, names, rules, prune):
+    """Yield the manifests below `top`, depth first."""
+    stack = [(top, rules)]
+    while stack:
+        directory, rules = stack.pop()
+        files, dirs = _scan(directory)
+        file_names = {n for n, _ in files}
+        if "pyvenv.cfg" in file_names:
+            continue  # a virtualenv
+        rules = read_ignore_files(directory, file_names, rules)
+        for name, path in files:
+            if name in names and not rules.match(path, name, False):
+                yield path
+        for path, name in reversed(dirs):
+            if name in prune or rules.match(path, name, True):
+                continue
+            stack.append((path, rules))
+
+
+def find_manifests(root, names, exclude=(), prune=PRUNE_DIRS, max_workers=8):
+    """
+    Return the sorted paths of the files below `root` called one of `names`.
+
+    `exclude` holds extra gitignore-style patterns, relative to `root`.
+    """
+    import concurrent.futures
+
+    names = frozenset(names)
+    rules = IgnoreRules().extend(root, exclude)
+    files, dirs = _scan(root)
+    rules = read_ignore_files(root, {n for n, _ in files}, rules)
+    found = [p for n, p in files if n in names and not rules.match(p, n, False)]
+    tops = [p for p, n in dirs if n not in prune and not rules.match(p, n, True)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for paths in executor.map(
+            lambda top: list(_walk(top, names, rules, prune)), tops
+        ):
+            found += paths
+    return sorted(found)
+
+
+def find_projects(root, names, exclude=(), max_workers=8):
+    """Directories below `root` (included) that hold at least one manifest."""
+    manifests = find_manifests(root, names, exclude, max_workers=max_workers)
+    return sorted({os.path.dirname(p) for p in manifests})
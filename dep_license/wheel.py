@@ -0,0 +1,208 @@
+"""
+License metadata read straight from a release's wheel.
+
+Some packages leave `info.license` of the JSON API empty and have no
+license classifier either, although their wheel says more: a
+`License-Expression` / `License` header in `*.dist-info/METADATA`, or a
+license file next to it. A wheel is a zip archive whose central directory
+sits at its end, so `RangeFile` reads the tail of the file with one HTTP
+`Range` request, and `zipfile` then only asks for the members it opens.
+The rest of the wheel is never downloaded.
+
+Releases are immutable, so what is found (or that nothing is) is cached
+forever.
+"""
+import io
+import json
+import logging
+import re
+
+from dep_license.fetch import cache_key
+from dep_license.fetch import info_url
+from dep_license.profile import NULL_PROFILER
+
+logger = logging.getLogger("dep_license")
+
+TAIL_SIZE = 64 * 1024
+BLOCK_SIZE = 64 * 1024
+LICENSE_FILES = ("LICENSE", "LICENCE", "COPYING")
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+
+class RangeFile(io.RawIOBase):
+    """
+    Read-only, seekable view of a remote file, fetched in blocks of at least
+    `block_size` bytes with HTTP `Range` requests. The first request reads
+    the last `TAIL_SIZE` bytes, which is where a zip keeps its index.
+    """
+
+    def __init__(self, url, profiler=NULL_PROFILER, block_size=BLOCK_SIZE):
+        super().__init__()
+        self.url = url
+        self.profiler = profiler
+        self.block_size = block_size
+        self._pos = 0
+        start, data, self.size = self._get(f"bytes=-{TAIL_SIZE}")
+        if self.size is None:
+            raise ValueError(f"{url}: unknown file size")
+        self._blocks = [(start, data)]
+
+    def _get(self, byte_range):
+        from urllib.request import Request
+        from urllib.request import urlopen
+
+        request = Request(
+            self.url, headers={"Range": byte_range, "Accept-Encoding": "identity"}
+        )
+        self.profiler.count("range requests")
+        with urlopen(request) as conn:
+            data = conn.read()
+            status = conn.status
+            content_range = conn.headers.get("Content-Range") or ""
+        self.profiler.count("bytes", len(data))
+        if status != 206:
+            # no Range support, the whole file was sent
+            return 0, data, len(data)
+        m = _CONTENT_RANGE.match(content_range)
+        if m is None:
+            raise ValueError(f"{self.url}: bad Content-Range {content_range!r}")
+        size = int(m.group(3)) if m.group(3) != "*" else None
+        return int(m.group(1)), data, size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return self._pos
+
+    def _read_range(self, start, end):
+        for block_start, data in self._blocks:
+            if block_start <= start and end <= block_start + len(data):
+                break
+        else:
+            fetch_end = min(max(end, start + self.block_size), self.size)
+            block_start, data, _ = self._get(f"bytes={start}-{fetch_end - 1}")
+            self._blocks.append((block_start, data))
+        lo, hi = start - block_start, end - block_start
+        return data[lo:hi]
+
+    def readinto(self, b):
+        end = min(self._pos + len(b), self.size)
+        if end <= self._pos:
+            return 0
+        data = self._read_range(self._pos, end)
+        b[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+def lacks_license(info):
+    """Whether `info` names no license, neither as text nor as classifier."""
+    if (info.get("license") or "").strip():
+        return False
+    return not any(c.startswith("License ::") for c in info.get("classifiers") or ())
+
+
+def read_wheel(url, profiler=NULL_PROFILER):
+    """
+    Return the `license` and `classifiers` of a wheel's METADATA, the license
+    being recognized from its license files when the METADATA has none.
+    """
+    import zipfile
+    from email.parser import HeaderParser
+
+    from dep_license.installed import metadata_info
+    from dep_license.spdx import from_full_text
+
+    profiler.count("wheels read")
+    with zipfile.ZipFile(RangeFile(url, profiler)) as zf:
+        names = zf.namelist()
+        metadata = [
+            n for n in names if n.count("/") == 1 and n.endswith(".dist-info/METADATA")
+        ]
+        if not metadata:
+            raise LookupError(f"{url}: no .dist-info/METADATA")
+        dist_info = metadata[0].rpartition("/")[0] + "/"
+        text = zf.read(metadata[0]).decode("utf-8", "replace")
+        info = metadata_info(HeaderParser().parsestr(text))
+        if not (info["license"] or "").strip():
+            info["license"] = None
+            for n in names:
+                base = n.rpartition("/")[2].upper()
+                if n.startswith(dist_info) and base.startswith(LICENSE_FILES):
+                    spdx_id = from_full_text(zf.read(n).decode("utf-8", "replace"))
+                    if spdx_id is not None:
+                        info["license"] = spdx_id
+                        break
+    return {"license": info["license"], "classifiers": info["classifiers"]}
+
+
+def release_wheel(base_url, name, version, profiler=NULL_PROFILER):
+    """URL of a wheel of a release, preferring pure-Python ones, or None."""
+    from urllib.request import urlopen
+
+    profiler.count("requests")
+    with urlopen(info_url(base_url, name, version)) as conn:
+        body = conn.read()
+    profiler.count("bytes", len(body))
+    wheels = [
+        f
+        for f in json.loads(body).get("urls") or []
+        if f.get("packagetype") == "bdist_wheel" and not f.get("yanked")
+    ]
+    if not wheels:
+        return None
+    wheels.sort(key=lambda f: not f.get("filename", "").endswith("-none-any.whl"))
+    return wheels[0]["url"]
+
+
+def complete_from_wheel(session, base_url, name, info, cache=None):
+    """
+    Return `info` with the license found in the wheel of its release when
+    the JSON API has none; errors leave `info` unchanged.
+    """
+    if info.get("license_expression"):
+        # core metadata 2.4; not yet in the `license` field
+        return dict(info, license=info["license_expression"])
+    version = info.get("version")
+    if not version:
+        return info
+    key = "wheel:" + cache_key(name, version, base_url)
+    entry = cache.get(key) if cache is not None else None
+    if entry is not None:
+        session.profiler.count("cache hits")
+        found = entry.data
+    else:
+
+        def fetch():
+            url = release_wheel(base_url, name, version, session.profiler)
+            return read_wheel(url, session.profiler) if url else {}
+
+        try:
+            found = session.call((base_url, key), name, fetch)
+        except Exception as e:
+            logger.debug(f"{name}=={version}: {e}, no license in the wheel")
+            return info
+        if cache is not None:
+            cache.set(key, found, ttl=None)
+
+    info = dict(info)
+    if found.get("license"):
+        info["license"] = found["license"]
+    if not info.get("classifiers") and found.get("classifiers"):
+        info["classifiers"] = found["classifiers"]
+    return info
@@ -67,7 +67,7 @@ setup(
     author=AUTHOR,
     # author_email=EMAIL,
     url=URL,
-    packages=find_packages(exclude=["tests"]),
+    packages=find_packages(exclude=["tests", "tests.*", "benchmarks", "benchmarks.*"]),
     include_package_data=True,
     install_requires=REQUIRED,
     license="MIT",
@@ -0,0 +1,17 @@
+import pytest
+
+from benchmarks.mock_pypi import MockPyPIServer
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    """Keep the default metadata cache out of the developer's home."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def pypi_server(monkeypatch):
+    with MockPyPIServer(synthetic=False) as server:
+        monkeypatch.setattr("dep_license.PYPYI_URL", server.url)
+        yield server
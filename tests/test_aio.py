@@ -0,0 +1,50 @@
+import asyncio
+
+from dep_license import run
+from dep_license import start_concurrent
+from dep_license.aio import async_worker
+from dep_license.aio import ConnectionPool
+from dep_license.aio import start_async
+
+
+def _key(r):
+    return r["Name"]
+
+
+def test_async_engine_matches_threaded(pypi_server):
+    for i in range(20):
+        pypi_server.add(f"pkg{i}", license="BSD" if i % 2 else "MIT")
+    deps = [f"pkg{i}" for i in range(20)] + ["missing"]
+    threaded = start_concurrent(deps, max_workers=4)
+    asynced = start_async(deps, max_workers=4)
+    assert len(asynced) == 20
+    assert sorted(asynced, key=_key) == sorted(threaded, key=_key)
+
+
+def test_connection_pool_reuses_connections(pypi_server):
+    for i in range(30):
+        pypi_server.add(f"pkg{i}")
+
+    async def go():
+        pool = ConnectionPool(size=3)
+        try:
+            results = await asyncio.gather(
+                *[async_worker(pool, f"pkg{i}") for i in range(30)]
+            )
+        finally:
+            pool.close()
+        return pool, results
+
+    pool, results = asyncio.run(go())
+    assert all(results)
+    assert pool.opened <= 3
+
+
+def test_cli_async_engine(tmpdir, pypi_server, capsys):
+    pypi_server.add("foo")
+    req = tmpdir.join("requirements.txt")
+    req.write("foo\n")
+    ret = run([req.strpath, "--engine", "async", "--no-cache", "-f", "csv"])
+    out, _ = capsys.readouterr()
+    assert ret == 0
+    assert "foo,MIT,OSI Approved::MIT License" in out
@@ -0,0 +1,228 @@
+import functools
+import json
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import dep_license
+from benchmarks.mock_pypi import make_info
+from benchmarks.mock_pypi import MockPyPIServer
+from dep_license.backends import backend_from_spec
+from dep_license.backends import JsonApiBackend
+from dep_license.backends import MirrorBackend
+from dep_license.backends import SimpleIndexBackend
+from dep_license.backends import version_key
+from dep_license.cache import MetadataCache
+from dep_license.fetch import Session
+from dep_license.utils import Dependency
+
+METADATA = """\
+Metadata-Version: 2.1
+Name: {name}
+Version: {version}
+License: {license}
+Classifier: License :: OSI Approved :: {classifier}
+Requires-Dist: idna
+"""
+
+
+def add_wheel(root, name, version, license, classifier, yanked=False):
+    simple = os.path.join(root, "simple", name)
+    os.makedirs(simple, exist_ok=True)
+    os.makedirs(os.path.join(root, "files"), exist_ok=True)
+    page = os.path.join(simple, "index.html")
+    files = json.load(open(page))["files"] if os.path.exists(page) else []
+    filename = f"{name}-{version}-py3-none-any.whl"
+    files.append(
+        {
+            "filename": filename,
+            "url": f"../../files/{filename}#sha256=00",
+            "hashes": {"sha256": "00"},
+            "core-metadata": {"sha256": "00"},
+            "yanked": yanked,
+        }
+    )
+    # an sdist has no separate metadata and must be skipped
+    files.append({"filename": f"{name}-{version}.tar.gz", "url": "x", "hashes": {}})
+    with open(page, "w") as f:
+        json.dump({"meta": {"api-version": "1.1"}, "name": name, "files": files}, f)
+    with open(os.path.join(root, "files", filename + ".metadata"), "w") as f:
+        f.write(
+            METADATA.format(
+                name=name, version=version, license=license, classifier=classifier
+            )
+        )
+
+
+@pytest.fixture
+def simple_index(tmpdir):
+    root = str(tmpdir.mkdir("index"))
+    requests = []
+
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            requests.append((self.path, self.headers.get("Accept")))
+            super().do_GET()
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(Handler, directory=root)
+    )
+    server.root = root
+    server.requests = requests
+    server.url = "http://127.0.0.1:{}/simple".format(server.server_address[1])
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_version_key():
+    versions = ["1.0", "1.10", "1.9", "2.0rc1", "1.10.post1", "0.9"]
+    assert max(versions, key=version_key) == "1.10.post1"
+    assert max(["1.0", "1.0.0"], key=version_key) in ("1.0", "1.0.0")
+
+
+def test_backend_from_spec(tmpdir):
+    assert isinstance(backend_from_spec("https://pypi.org/pypi"), JsonApiBackend)
+    simple = backend_from_spec("simple+https://pypi.org/simple/")
+    assert isinstance(simple, SimpleIndexBackend)
+    assert simple.url == "https://pypi.org/simple"
+    assert backend_from_spec(str(tmpdir)).path == str(tmpdir)
+    assert backend_from_spec("file://" + str(tmpdir)).path == str(tmpdir)
+    with pytest.raises(ValueError):
+        backend_from_spec(str(tmpdir.join("missing")))
+
+
+def test_mirror_layouts(tmpdir):
+    tmpdir.join("web", "pypi", "zope-interface", "json").write(
+        json.dumps(make_info("zope.interface", "ZPL")), ensure=True
+    )
+    tmpdir.join("web", "pypi", "flask", "2.0.0", "json").write(
+        json.dumps(make_info("flask", "BSD-2")), ensure=True
+    )
+    tmpdir.join("six.json").write(json.dumps(make_info("six", "MIT")))
+    mirror = MirrorBackend(str(tmpdir))
+    session = Session()
+    assert mirror.fetch_info(session, "zope.interface")["license"] == "ZPL"
+    assert mirror.fetch_info(session, "flask", version="2.0.0")["license"] == "BSD-2"
+    assert mirror.fetch_info(session, "six")["license"] == "MIT"
+    with pytest.raises(LookupError):
+        mirror.fetch_info(session, "flask")
+
+
+def test_simple_index(simple_index, tmpdir):
+    add_wheel(simple_index.root, "demo", "1.0", "BSD", "BSD License")
+    add_wheel(simple_index.root, "demo", "2.0", "Apache-2.0", "Apache Software License")
+    add_wheel(simple_index.root, "demo", "3.0", "GPL", "GPL", yanked=True)
+    cache = MetadataCache(str(tmpdir.mkdir("cache")))
+    session = Session(backends=[SimpleIndexBackend(simple_index.url)])
+
+    info = dep_license.fetch_metadata(session, "Demo", cache)
+    assert info["license"] == "Apache-2.0"
+    assert info["requires_dist"] == ["idna"]
+    assert simple_index.requests[0] == (
+        "/simple/demo/",
+        "application/vnd.pypi.simple.v1+json",
+    )
+    assert simple_index.requests[1][0] == "/files/demo-2.0-py3-none-any.whl.metadata"
+
+    record = dep_license.worker(Dependency("demo", "1.0"), cache=cache, session=session)
+    assert record["Meta"] == "BSD"
+    assert record["Classifier"] == "OSI Approved::BSD License"
+
+    # the yanked release is still found when pinned
+    info = dep_license.fetch_metadata(session, "demo", cache, "3.0")
+    assert info["license"] == "GPL"
+
+    del simple_index.requests[:]
+    assert dep_license.fetch_metadata(session, "demo", cache)["license"] == "Apache-2.0"
+    assert simple_index.requests == []
+    cache.close()
+
+
+def test_backends_in_priority_order(pypi_server, simple_index, tmpdir):
+    tmpdir.join("mirror", "pypi", "six", "json").write(
+        json.dumps(make_info("six", "from-mirror")), ensure=True
+    )
+    add_wheel(simple_index.root, "demo", "1.0", "from-simple", "MIT License")
+    pypi_server.add("six", license="from-pypi")
+    pypi_server.add("demo", license="from-pypi")
+    pypi_server.add("other", license="from-pypi")
+    session = Session(
+        retries=0,
+        backends=[
+            MirrorBackend(str(tmpdir.join("mirror"))),
+            SimpleIndexBackend(simple_index.url),
+            JsonApiBackend(),
+        ],
+    )
+    licenses = {
+        name: dep_license.fetch_metadata(session, name)["license"]
+        for name in ("six", "demo", "other")
+    }
+    assert licenses == {
+        "six": "from-mirror",
+        "demo": "from-simple",
+        "other": "from-pypi",
+    }
+    assert pypi_server.requests == ["/pypi/other/json"]
+
+    with pytest.raises(Exception):
+        dep_license.fetch_metadata(session, "missing")
+
+
+def test_async_engine_uses_backends(pypi_server, tmpdir):
+    from dep_license.aio import iter_async
+
+    tmpdir.join("mirror", "six.json").write(
+        json.dumps(make_info("six", "from-mirror")), ensure=True
+    )
+    pypi_server.add("idna", license="from-pypi")
+    session = Session(
+        backends=[MirrorBackend(str(tmpdir.join("mirror"))), JsonApiBackend()]
+    )
+    records = {
+        r["Name"]: r["Meta"] for r in iter_async(["six", "idna"], session=session)
+    }
+    assert records == {"six": "from-mirror", "idna": "from-pypi"}
+    assert pypi_server.requests == ["/pypi/idna/json"]
+
+
+def test_cli_source(tmpdir, capsys):
+    tmpdir.join("mirror", "six.json").write(
+        json.dumps(make_info("six", "from-mirror")), ensure=True
+    )
+    tmpdir.join("requirements.txt").write("six\n")
+    argv = [str(tmpdir), "--no-cache", "--source", str(tmpdir.join("mirror"))]
+    assert dep_license.run(argv) == 0
+    assert "from-mirror" in capsys.readouterr().out
+
+    assert dep_license.run([str(tmpdir), "--source", "nowhere"]) == 1
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_cache_is_per_source(tmpdir, capsys, engine):
+    tmpdir.join("requirements.txt").write("foo\n")
+    cache_dir = str(tmpdir.join("cache"))
+    with MockPyPIServer(synthetic=False) as a, MockPyPIServer(synthetic=False) as b:
+        a.add("foo", license="GPL-3.0", classifiers=[])
+        b.add("foo", license="MIT", classifiers=[])
+        argv = [str(tmpdir), "-f", "csv", "--cache-dir", cache_dir, "--engine", engine]
+        assert dep_license.run(argv + ["--source", a.url]) == 0
+        assert "foo,GPL-3.0," in capsys.readouterr().out
+        assert dep_license.run(argv + ["--source", b.url]) == 0
+        assert "foo,MIT," in capsys.readouterr().out
+        assert b.requests == ["/pypi/foo/json"]
+
+        # each source keeps its own entries
+        del a.requests[:]
+        assert dep_license.run(argv + ["--source", a.url]) == 0
+        assert "foo,GPL-3.0," in capsys.readouterr().out
+        assert a.requests == []
@@ -0,0 +1,32 @@
+import json
+
+from benchmarks import bench_suite
+
+
+def test_bench_suite(tmpdir, capsys):
+    out = tmpdir.join("bench.json").strpath
+    argv = ["-n", "10", "-p", "5", "--records", "50", "-r", "1", "--latency", "0"]
+    argv += ["--files", "300"]
+    assert bench_suite.main(argv + ["-o", out]) == 0
+    report = json.load(open(out))
+    stages = report["stages"]
+    assert stages["discover"]["manifests"] == 10
+    # pyproject.toml also lists its two build requirements
+    assert stages["parse"]["items"] == 7 * 10 + 2
+    assert stages["fetch"]["thread"]["items"] == 5
+    assert stages["fetch"]["async"]["requests"] == 5
+    assert set(stages["report"]) == set(bench_suite.FORMATS)
+    assert stages["check"]["banned"] > 0
+    assert set(stages["check"]["latency_ms"]) == {"p50", "p90", "p99", "max"}
+
+    capsys.readouterr()
+    assert bench_suite.main(argv + ["--stages", "check", "--compare", out]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert list(report["stages"]) == ["check"]
+    assert list(report["speedup"]) == ["check"]
+
+
+def test_percentiles():
+    assert bench_suite.percentiles([]) is None
+    p = bench_suite.percentiles([i / 1000.0 for i in range(1, 101)])
+    assert p == {"p50": 51.0, "p90": 91.0, "p99": 100.0, "max": 100.0}
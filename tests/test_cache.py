@@ -0,0 +1,83 @@
+import time
+
+from dep_license import run
+from dep_license import worker
+from dep_license.cache import MetadataCache
+from dep_license.cache import normalize_name
+
+
+def test_normalize_name():
+    assert normalize_name("Dep_License") == "dep-license"
+    assert normalize_name("zope.interface") == "zope-interface"
+
+
+def test_cache_set_get(tmpdir):
+    cache = MetadataCache(tmpdir.strpath)
+    assert cache.get("foo") is None
+    cache.set("foo", {"license": "MIT"}, etag='"abc"')
+    entry = cache.get("foo")
+    assert entry.data == {"license": "MIT"}
+    assert entry.etag == '"abc"'
+    assert entry.fresh
+
+
+def test_cache_ttl(tmpdir):
+    cache = MetadataCache(tmpdir.strpath, ttl=0)
+    cache.set("foo", {"license": "MIT"})
+    time.sleep(0.01)
+    assert not cache.get("foo").fresh
+    cache.set("bar", {"license": "MIT"}, ttl=None)
+    assert cache.get("bar").fresh
+
+
+def test_cache_lru_eviction(tmpdir):
+    cache = MetadataCache(tmpdir.strpath, max_size=60)
+    cache.set("a", {"license": "x" * 10})
+    cache.set("b", {"license": "x" * 10})
+    cache.get("a")
+    cache.set("c", {"license": "x" * 10})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_worker_uses_cache(tmpdir, pypi_server):
+    pypi_server.add("foo")
+    cache = MetadataCache(tmpdir.strpath)
+    expected = {
+        "Name": "foo",
+        "Meta": "MIT",
+        "Classifier": "OSI Approved::MIT License",
+        "SPDX": "MIT",
+    }
+    assert worker("foo", cache=cache) == expected
+    assert worker("foo", cache=cache) == expected
+    assert len(pypi_server.requests) == 1
+
+
+def test_worker_revalidates_stale_entry(tmpdir, pypi_server):
+    pypi_server.add("foo")
+    cache = MetadataCache(tmpdir.strpath, ttl=0)
+    worker("foo", cache=cache)
+    time.sleep(0.01)
+    assert worker("foo", cache=cache)["Meta"] == "MIT"
+    assert len(pypi_server.requests) == 2
+
+
+def test_cli_cache_options(tmpdir, pypi_server, capsys):
+    pypi_server.add("foo")
+    req = tmpdir.join("requirements.txt")
+    req.write("foo\n")
+    cache_dir = tmpdir.join("cache").strpath
+    assert run([req.strpath, "--cache-dir", cache_dir]) == 0
+    assert run([req.strpath, "--cache-dir", cache_dir]) == 0
+    assert len(pypi_server.requests) == 1
+    assert run([req.strpath, "--no-cache"]) == 0
+    assert len(pypi_server.requests) == 2
+
+
+def test_cli_default_cache_dir(tmpdir, pypi_server, cache_home):
+    pypi_server.add("foo")
+    tmpdir.join("requirements.txt").write("foo\n")
+    assert run([tmpdir.strpath]) == 0
+    assert (cache_home / "deplic").is_dir()
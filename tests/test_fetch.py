@@ -0,0 +1,114 @@
+import io
+import json
+from urllib.error import HTTPError
+
+import pytest
+
+from dep_license import run
+from dep_license import worker
+from dep_license.cache import MetadataCache
+from dep_license.fetch import cache_key
+from dep_license.fetch import extract_info
+from dep_license.fetch import fetch_info
+from dep_license.fetch import KeepAlivePool
+from dep_license.utils import Dependency
+
+
+class CountingReader(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.consumed += len(chunk)
+        return chunk
+
+
+DOC = {
+    "info": {
+        "license": 'MIT "quoted" {braces} [brackets] \\ backslash',
+        "classifiers": ["License :: OSI Approved :: MIT License"],
+        "project_urls": {"Home": "https://example.com"},
+        "ünicode": "✓",
+    },
+    "last_serial": 1,
+    "releases": {str(i): [{"filename": "x" * 100}] for i in range(1000)},
+    "urls": [],
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 16384])
+def test_extract_info(chunk_size):
+    data = json.dumps(DOC).encode()
+    assert extract_info(io.BytesIO(data), chunk_size=chunk_size) == DOC["info"]
+
+
+def test_extract_info_stops_after_info():
+    data = json.dumps(DOC).encode()
+    fp = CountingReader(data)
+    assert extract_info(fp, chunk_size=256) == DOC["info"]
+    assert fp.consumed < 1024 < len(data)
+
+
+@pytest.mark.parametrize(
+    "doc",
+    [
+        {"releases": {"info": {}}, "info": {"license": "BSD"}},
+        {"last_serial": "info", "info": {"license": "BSD"}},
+        {"info": None, "releases": {}},
+        {"releases": {}},
+    ],
+)
+def test_extract_info_layouts(doc):
+    data = json.dumps(doc, indent=2).encode()
+    assert extract_info(io.BytesIO(data), chunk_size=5) == doc.get("info")
+
+
+def test_worker_pinned_version(pypi_server):
+    pypi_server.add("foo", license="MIT")
+    pypi_server.add("foo", license="BSD", version="1.0")
+    assert worker("foo")["Meta"] == "MIT"
+    assert worker("foo", version="1.0")["Meta"] == "BSD"
+    assert pypi_server.requests[-1] == "/pypi/foo/1.0/json"
+
+
+def test_pinned_versions_are_cached_forever(tmpdir, pypi_server):
+    pypi_server.add("foo", license="BSD", version="1.0")
+    pypi_server.add("foo", license="MIT")
+    cache = MetadataCache(tmpdir.strpath, ttl=0)
+    assert worker(Dependency("foo", "1.0"), cache=cache)["Meta"] == "BSD"
+    assert worker(Dependency("foo", "1.0"), cache=cache)["Meta"] == "BSD"
+    assert pypi_server.requests == ["/pypi/foo/1.0/json"]
+    assert cache.get(cache_key("foo", "1.0", pypi_server.url)).fresh
+
+
+def test_unknown_version_falls_back_to_latest(pypi_server):
+    pypi_server.add("foo", license="MIT")
+    assert worker(Dependency("foo", "1.0+local"))["Meta"] == "MIT"
+    assert pypi_server.requests == ["/pypi/foo/1.0+local/json", "/pypi/foo/json"]
+
+
+def test_cli_uses_locked_versions(tmpdir, pypi_server, capsys):
+    pypi_server.add("foo", license="BSD", version="1.0")
+    pypi_server.add("bar", license="MIT")
+    req = tmpdir.join("requirements.txt")
+    req.write("foo==1.0\nbar>=2\n")
+    assert run([req.strpath, "--no-cache", "-f", "csv"]) == 0
+    out, _ = capsys.readouterr()
+    assert "foo,BSD," in out
+    assert sorted(pypi_server.requests) == ["/pypi/bar/json", "/pypi/foo/1.0/json"]
+
+
+def test_keep_alive_pool(tmpdir, pypi_server):
+    pypi_server.add("foo", license="BSD")
+    cache = MetadataCache(tmpdir.strpath, ttl=0)
+    pool = KeepAlivePool()
+    assert fetch_info("foo", pypi_server.url, cache, pool=pool)["license"] == "BSD"
+    # revalidated with a 304 on the same connection
+    assert fetch_info("foo", pypi_server.url, cache, pool=pool)["license"] == "BSD"
+    with pytest.raises(HTTPError) as e:
+        fetch_info("missing", pypi_server.url, pool=pool)
+    assert e.value.code == 404
+    assert pool.opened == pypi_server.connections == 1
+    pool.close()
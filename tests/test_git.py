@@ -0,0 +1,64 @@
+import os
+import subprocess
+
+import pytest
+
+from dep_license import run
+from dep_license import sparse_checkout
+from dep_license import sparse_clone_project
+from dep_license import SUPPORTED_FILES
+
+
+def _git(*args, cwd=None):
+    subprocess.check_call(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        cwd=cwd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+@pytest.fixture
+def bare_repo(tmpdir):
+    src = tmpdir.mkdir("src")
+    src.join("requirements.txt").write("foo\nbar\n")
+    src.join("big.bin").write("x" * 100000)
+    src.mkdir("docs").join("requirements.txt").write("sphinx\n")
+    _git("init", "-q", cwd=src.strpath)
+    _git("add", ".", cwd=src.strpath)
+    _git("commit", "-q", "-m", "first", cwd=src.strpath)
+    src.join("setup.cfg").write("[metadata]\n")
+    _git("add", ".", cwd=src.strpath)
+    _git("commit", "-q", "-m", "second", cwd=src.strpath)
+
+    bare = tmpdir.join("repo.git")
+    _git("clone", "-q", "--bare", src.strpath, bare.strpath)
+    _git("config", "uploadpack.allowFilter", "true", cwd=bare.strpath)
+    return "file://" + bare.strpath
+
+
+def test_sparse_checkout(tmpdir, bare_repo):
+    dest = tmpdir.join("dest").strpath
+    sparse_checkout(bare_repo, dest, SUPPORTED_FILES)
+    files = sorted(
+        os.path.relpath(os.path.join(root, f), dest)
+        for root, dirs, fs in os.walk(dest)
+        if ".git" not in root.split(os.sep)
+        for f in fs
+    )
+    assert files == ["requirements.txt"]
+    count = subprocess.check_output(["git", "rev-list", "--count", "HEAD"], cwd=dest)
+    assert count.strip() == b"1"
+
+
+def test_sparse_clone_project(bare_repo):
+    assert sparse_clone_project(bare_repo, SUPPORTED_FILES) == ["foo", "bar"]
+    assert sparse_clone_project("file:///does/not/exist", SUPPORTED_FILES) is None
+
+
+def test_cli_sparse(bare_repo, pypi_server, capsys):
+    pypi_server.add("foo")
+    ret = run([bare_repo, "--sparse", "--no-cache"])
+    out, _ = capsys.readouterr()
+    assert ret == 0
+    assert "Found dependencies: 2" in out
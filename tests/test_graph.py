@@ -0,0 +1,94 @@
+import threading
+
+from dep_license import run
+from dep_license.graph import DependencyGraph
+from dep_license.graph import requires_dist
+
+INFO = {
+    "app": ["requests (>=2)", "click"],
+    "requests": [
+        "urllib3 (<3,>=1.21.1)",
+        "certifi>=2017.4.17",
+        "PySocks!=1.5.7,>=1.5.6; extra == 'socks'",
+    ],
+    "click": ["colorama", "pywin32; platform_system == 'Windows'"],
+    "urllib3": ["brotli ; extra == 'brotli'"],
+    "certifi": [],
+    "colorama": ["click"],
+}
+
+
+def _fetch(calls):
+    lock = threading.Lock()
+
+    def fetch(name):
+        with lock:
+            calls.append(name)
+        reqs = INFO.get(name.lower())
+        return None if reqs is None else {"requires_dist": reqs}
+
+    return fetch
+
+
+def test_requires_dist_skips_extras():
+    assert requires_dist({"requires_dist": INFO["requests"]}) == ["urllib3", "certifi"]
+    assert requires_dist({"requires_dist": None}) == []
+
+
+def test_requires_dist_skips_marked_requirements():
+    info = {
+        "requires_dist": [
+            "idna",
+            'pywin32>=300; sys_platform == "win32"',
+            'importlib-metadata; python_version < "3.8"',
+            "cffi ; implementation_name == 'cpython'",
+            "six (>=1.5)",
+        ]
+    }
+    assert requires_dist(info) == ["idna", "six"]
+
+
+def test_expand_paths_and_memoization():
+    calls = []
+    graph = DependencyGraph(_fetch(calls), max_workers=4)
+    paths = graph.expand(["app", "missing"])
+    assert paths == {
+        "app": ["app"],
+        "missing": ["missing"],
+        "requests": ["app", "requests"],
+        "click": ["app", "click"],
+        "urllib3": ["app", "requests", "urllib3"],
+        "certifi": ["app", "requests", "certifi"],
+        "colorama": ["app", "click", "colorama"],
+    }
+    assert sorted(calls) == sorted(paths)
+
+    # a second project sharing the subtree does not fetch it again
+    del calls[:]
+    paths = graph.expand(["Requests", "certifi"])
+    assert list(paths) == ["requests", "certifi", "urllib3"]
+    assert paths["urllib3"] == ["Requests", "urllib3"]
+    assert calls == []
+
+
+def test_cli_transitive(tmpdir, pypi_server, capsys):
+    pypi_server.add("foo", requires_dist=["bar (>=1)", "qux ; extra == 'test'"])
+    pypi_server.add("bar", license="BSD", classifiers=[], requires_dist=["baz"])
+    pypi_server.add("baz", license="Apache 2.0", classifiers=[])
+    p1 = tmpdir.mkdir("p1")
+    p1.join("requirements.txt").write("foo\n")
+    p2 = tmpdir.mkdir("p2")
+    p2.join("requirements.txt").write("bar\n")
+    ret = run(
+        [p1.strpath, p2.strpath, "--no-cache", "--transitive", "-f", "csv"]
+        + ["--show-projects"]
+    )
+    out, _ = capsys.readouterr()
+    assert ret == 0
+    assert "Found dependencies: 2 (3 including transitive)" in out
+    assert "Name,Meta,Classifier,SPDX,Projects,Path" in out
+    assert f"baz,Apache 2.0,,Apache-2.0,{p2.strpath},bar > baz" in out
+    assert f"bar,BSD,,,{p2.strpath},bar" in out
+    assert sorted(pypi_server.requests) == sorted(
+        ["/pypi/foo/json", "/pypi/bar/json", "/pypi/baz/json"]
+    )
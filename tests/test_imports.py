@@ -0,0 +1,15 @@
+import json
+import subprocess
+import sys
+
+from benchmarks.bench_import import HEAVY_MODULES
+
+_SCRIPT = (
+    "import json, sys; import dep_license; "
+    "print(json.dumps(sorted(m for m in {!r} if m in sys.modules)))"
+)
+
+
+def test_import_is_lazy():
+    out = subprocess.check_output([sys.executable, "-c", _SCRIPT.format(HEAVY_MODULES)])
+    assert json.loads(out) == []
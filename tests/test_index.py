@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from dep_license import run
+from dep_license import worker
+from dep_license.index import build_index
+from dep_license.index import LicenseIndex
+
+
+def _doc(name, license, classifiers=()):
+    return {
+        "info": {"name": name, "license": license, "classifiers": list(classifiers)},
+        "releases": {"1.0": []},
+    }
+
+
+@pytest.fixture
+def dump(tmpdir):
+    d = tmpdir.mkdir("dump")
+    d.join("foo.json").write(
+        json.dumps(
+            _doc(
+                "Foo_Bar",
+                "MIT",
+                ["License :: OSI Approved :: MIT License", "Topic :: Utilities"],
+            )
+        )
+    )
+    d.join("export.jsonl").write(
+        "\n".join(json.dumps(_doc(f"pkg{i}", f"L{i}")) for i in range(500)) + "\n"
+    )
+    return d
+
+
+def test_build_and_lookup(tmpdir, dump):
+    path = tmpdir.join("deplic.idx").strpath
+    assert build_index([dump.strpath], path) == 501
+    with LicenseIndex(path) as index:
+        assert len(index) == 501
+        assert index.get("foo-bar") == {
+            "license": "MIT",
+            "classifiers": ["License :: OSI Approved :: MIT License"],
+        }
+        assert index.get("FOO.BAR")["license"] == "MIT"
+        for i in range(500):
+            assert index.get(f"pkg{i}")["license"] == f"L{i}"
+        assert index.get("missing") is None
+        assert "missing" not in index
+
+
+def test_invalid_index(tmpdir):
+    x = tmpdir.join("bad.idx")
+    x.write("not an index at all, just some text")
+    with pytest.raises(ValueError):
+        LicenseIndex(x.strpath)
+
+
+def test_truncated_index(tmpdir, dump, capsys):
+    path = tmpdir.join("deplic.idx").strpath
+    build_index([dump.strpath], path)
+    with open(path, "rb") as f:
+        data = f.read()
+    for size in (10, 40, len(data) - 1):
+        with open(path, "wb") as f:
+            f.write(data[:size])
+        with pytest.raises(ValueError):
+            LicenseIndex(path)
+
+    tmpdir.join("requirements.txt").write("foo\n")
+    assert run([tmpdir.strpath, "--index", path]) == 1
+
+
+def test_worker_index_hit_skips_network(tmpdir, dump, pypi_server):
+    path = tmpdir.join("deplic.idx").strpath
+    build_index([dump.strpath], path)
+    pypi_server.add("other", license="BSD")
+    with LicenseIndex(path) as index:
+        assert worker("foo_bar", index=index) == {
+            "Name": "foo_bar",
+            "Meta": "MIT",
+            "Classifier": "OSI Approved::MIT License",
+            "SPDX": "MIT",
+        }
+        assert pypi_server.requests == []
+        assert worker("other", index=index)["Meta"] == "BSD"
+        assert len(pypi_server.requests) == 1
+
+
+def test_cli_index_build(tmpdir, dump, pypi_server, capsys):
+    path = tmpdir.join("deplic.idx").strpath
+    assert run(["index", "build", dump.strpath, "-o", path]) == 0
+    req = tmpdir.join("requirements.txt")
+    req.write("foo-bar\npkg1\n")
+    ret = run([req.strpath, "--index", path, "--no-cache", "-f", "json"])
+    out, _ = capsys.readouterr()
+    assert ret == 0
+    assert "indexed 501 packages" in out
+    assert pypi_server.requests == []
@@ -0,0 +1,65 @@
+import sys
+
+import pytest
+
+from dep_license import run
+from dep_license.installed import iter_installed
+
+
+def _dist_info(site, name, version, headers):
+    d = site.mkdir(f"{name}-{version}.dist-info")
+    d.join("METADATA").write(
+        f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+        + "".join(f"{k}: {v}\n" for k, v in headers)
+        + "\nLong description\nLicense: not a header\n"
+    )
+
+
+def test_iter_installed(tmpdir):
+    site = tmpdir.mkdir("site-packages")
+    _dist_info(
+        site,
+        "Foo_Bar",
+        "1.0",
+        [
+            ("License", "MIT"),
+            ("Classifier", "License :: OSI Approved :: MIT License"),
+            ("Classifier", "Topic :: Utilities"),
+            ("Requires-Dist", "six (>=1.0)"),
+        ],
+    )
+    _dist_info(site, "pip", "23.0", [("License", "MIT")])
+    egg = site.mkdir("baz-2.0-py3.9.egg-info")
+    egg.join("PKG-INFO").write("Metadata-Version: 1.1\nName: baz\nLicense: BSD\n")
+    site.join("qux-0.1-py3.9.egg-info").write("Name: qux\nLicense: GPL\n")
+
+    shadowed = tmpdir.mkdir("other")
+    _dist_info(shadowed, "foo-bar", "0.5", [("License", "Apache")])
+
+    found = dict(iter_installed([site.strpath, shadowed.strpath, "/does/not/exist"]))
+    assert found == {
+        "Foo_Bar": {
+            "license": "MIT",
+            "classifiers": [
+                "License :: OSI Approved :: MIT License",
+                "Topic :: Utilities",
+            ],
+            "requires_dist": ["six (>=1.0)"],
+        },
+        "baz": {"license": "BSD", "classifiers": [], "requires_dist": []},
+        "qux": {"license": "GPL", "classifiers": [], "requires_dist": []},
+    }
+
+
+def test_check_env_installed(capsys):
+    ret = run([sys.executable, "-e", "--installed", "-f", "csv"])
+    out, _ = capsys.readouterr()
+    assert ret == 0
+    assert "Found" in out
+    assert "\npytest," in out
+
+
+def test_installed_requires_env(tmpdir, capsys):
+    with pytest.raises(SystemExit):
+        run([tmpdir.strpath, "--installed"])
+    assert "--installed requires --env" in capsys.readouterr().err
@@ -0,0 +1,117 @@
+import pytest
+
+from dep_license.policy import LicensePolicy
+
+
+def _record(name, meta="", classifier=""):
+    return {"Name": name, "Meta": meta, "Classifier": classifier}
+
+
+@pytest.mark.parametrize(
+    ("meta", "classifier", "rule"),
+    [
+        ("AGPL-3.0", "", "exact"),
+        ("AGPL 3.0", "", "spdx"),
+        ("agpl_3.0 license", "", "spdx"),
+        ("", "OSI Approved::MIT License, Other::AGPL-3.0", "classifier"),
+        ("AGPLv3.0", "", "fuzzy"),
+    ],
+)
+def test_banned(meta, classifier, rule):
+    policy = LicensePolicy(banned=["AGPL-3.0"])
+    verdict = policy.check(_record("foo", meta, classifier))
+    assert verdict.banned
+    assert verdict.rule == rule
+    assert verdict.entry == "AGPL-3.0"
+
+
+def test_not_banned():
+    policy = LicensePolicy(banned=["GPL"])
+    assert policy.check(_record("foo", "MIT", "OSI Approved::MIT License")) is None
+    assert policy.check(_record("foo", "")) is None
+    assert LicensePolicy().check(_record("foo", "GPL")) is None
+
+
+def test_allowed_and_exceptions():
+    policy = LicensePolicy(banned=["GPL"], allowed=["LGPL"], exceptions=["Foo_Bar"])
+    assert policy.check(_record("bar", "GPL")).banned
+    assert policy.check(_record("bar", "LGPL")) is None
+    assert policy.check(_record("foo-bar", "GPL")) is None
+
+
+def test_verdicts_are_memoized(monkeypatch):
+    policy = LicensePolicy(banned=["GPL"])
+    calls = []
+    fuzzy = policy._fuzzy
+    monkeypatch.setattr(policy, "_fuzzy", lambda key: calls.append(key) or fuzzy(key))
+    for i in range(100):
+        policy.check(_record(f"pkg{i}", "Some Custom License"))
+    assert calls == ["some custom"]
+
+
+def test_known_licenses_are_not_fuzzy_matched():
+    policy = LicensePolicy(banned=["AGPL-3.0"])
+    record = _record(
+        "foo", "MPL 2.0", "OSI Approved::Mozilla Public License 2.0 (MPL 2.0)"
+    )
+    record["SPDX"] = "MPL-2.0"
+    assert policy.check(record) is None
+    assert policy.check(_record("foo", "GPL-3.0-only")) is None
+
+
+@pytest.mark.parametrize(
+    ("banned", "meta", "entry"),
+    [
+        (["GPL", "GPL-3.0"], "GPLv3+", "GPL-3.0"),
+        (["GPL", "GPL-3.0"], "GPL-2.0", "GPL"),
+        (["GPL-3.0"], "GPL-3.0-or-later", "GPL-3.0"),
+        (["GPL-3.0-or-later"], "GPL-3.0-only", "GPL-3.0-or-later"),
+        (["AGPL"], "AGPL-3.0", "AGPL"),
+        (["AGPL-3.0"], "GNU AGPLv3+", "AGPL-3.0"),
+        (["LGPL"], "LGPLv3", "LGPL"),
+    ],
+)
+def test_banned_by_family(banned, meta, entry):
+    verdict = LicensePolicy(banned=banned).check(_record("foo", meta))
+    assert verdict.banned
+    assert verdict.entry == entry
+
+
+@pytest.mark.parametrize(
+    ("banned", "meta"),
+    [
+        (["GPL"], "AGPL-3.0"),
+        (["GPL"], "LGPL-2.1"),
+        (["GPL"], "MPL 2.0"),
+        (["GPL-3.0"], "GPL-2.0"),
+        (["AGPL-3.0"], "GPLv3"),
+        (["MIT"], "MIT-0"),
+    ],
+)
+def test_other_families_are_not_banned(banned, meta):
+    assert LicensePolicy(banned=banned).check(_record("foo", meta)) is None
+
+
+def test_from_config(tmpdir):
+    cfg = tmpdir.join("deplic.cfg")
+    cfg.write(
+        "[deplic]\nbanned =\n    AGPL-3.0,\n    GPL\nallowed = LGPL\n"
+        "exceptions = foo\n"
+    )
+    policy = LicensePolicy.from_config(cfg.strpath)
+    assert policy.banned == ["AGPL-3.0", "GPL"]
+    assert policy.allowed == ["LGPL"]
+    assert policy.exceptions == {"foo"}
+    assert LicensePolicy.from_config(tmpdir.join("missing").strpath).banned == []
+
+
+def test_banned_by_spdx_id():
+    policy = LicensePolicy(banned=["GPLv3"])
+    for meta, classifier in [
+        ("GPL-3.0-only", ""),
+        ("GNU GPL v3", ""),
+        ("", "OSI Approved::GNU General Public License v3 (GPLv3)"),
+    ]:
+        verdict = policy.check(_record("foo", meta, classifier))
+        assert verdict.rule == "spdx"
+        assert verdict.entry == "GPLv3"
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from dep_license import run
+from dep_license.profile import NULL_PROFILER
+from dep_license.profile import Profiler
+
+
+def test_profiler():
+    profiler = Profiler()
+    with profiler.span("outer"):
+        with profiler.span("foo", "fetch", queue_wait=0.5) as args:
+            args["version"] = "1.0"
+    start = profiler.now()
+    profiler.add("bar", "fetch", start, start + 2, concurrent=True)
+    profiler.count("requests")
+    profiler.count("bytes", 100)
+    profiler.observe("queue wait", 0.25)
+    profiler.observe("queue wait", 0.25)
+
+    fetches = profiler.spans("fetch")
+    assert [name for name, _, _ in fetches] == ["foo", "bar"]
+    assert fetches[0][2] == {"queue_wait": 0.5, "version": "1.0"}
+    assert fetches[1][1] == pytest.approx(2)
+    assert profiler.timers == {"queue wait": (0.5, 2)}
+
+    summary = profiler.summary()
+    assert "| outer" in summary
+    assert "| bytes" in summary
+    assert summary.index("| bar") < summary.index("| foo")
+
+
+def test_null_profiler():
+    with NULL_PROFILER.span("foo", "fetch"):
+        pass
+    NULL_PROFILER.count("requests")
+    NULL_PROFILER.observe("queue wait", 1)
+    assert NULL_PROFILER.events == []
+    assert not NULL_PROFILER.counters and not NULL_PROFILER.timers
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_cli_profile_and_trace(tmpdir, pypi_server, capsys, engine):
+    pypi_server.add("foo")
+    pypi_server.add("bar", version="1.0")
+    pypi_server.fail("foo", 503)
+    req = tmpdir.join("requirements.txt")
+    req.write("foo\nbar==1.0\n")
+    trace = tmpdir.join("trace.json").strpath
+    argv = [req.strpath, "-f", "csv", "--engine", engine, "--profile"]
+    argv += ["--cache-dir", tmpdir.strpath, "--trace", trace]
+    assert run(argv) == 0
+
+    err = capsys.readouterr().err
+    assert "Slowest packages" in err
+    assert "| scan projects" in err
+    assert "| queue wait" in err
+
+    events = json.load(open(trace))["traceEvents"]
+    names = {(e["cat"], e["name"]) for e in events if "cat" in e}
+    assert {("stage", "run"), ("parse", "requirements.txt")} <= names
+    assert {("fetch", "foo"), ("fetch", "bar")} <= names
+    counters = [e for e in events if e["ph"] == "C"][0]["args"]
+    assert counters["requests"] == 3
+    assert counters["retries"] == 1
+    assert counters["cache misses"] == 2
+    assert counters["bytes"] > 0
+    assert any(e["ph"] == "M" for e in events)
+
+    assert run(argv) == 0
+    counters = [e for e in json.load(open(trace))["traceEvents"] if e["ph"] == "C"]
+    assert counters[0]["args"]["cache hits"] == 2
@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+
+import pytest
+
+from dep_license import COLUMNS
+from dep_license import run
+from dep_license.aio import iter_async
+from dep_license.report import report_writer
+
+RECORDS = [
+    {
+        "Name": "foo",
+        "Meta": "MIT",
+        "Classifier": "OSI Approved::MIT License",
+        "SPDX": "MIT",
+    },
+    {"Name": "bar", "Meta": "BSD, 3-clause", "Classifier": "", "SPDX": ""},
+]
+
+
+def _render(fmt, records):
+    buf = io.StringIO()
+    writer = report_writer(fmt, [buf], COLUMNS)
+    for r in records:
+        writer.write(r)
+    writer.close()
+    return buf.getvalue()
+
+
+def test_json_writer_matches_json_dumps():
+    assert json.loads(_render("json", RECORDS)) == RECORDS
+    assert _render("json", RECORDS) == json.dumps(RECORDS, indent=4) + "\n"
+    assert json.loads(_render("json", [])) == []
+
+
+def test_jsonl_writer():
+    lines = _render("jsonl", RECORDS).splitlines()
+    assert [json.loads(x) for x in lines] == RECORDS
+
+
+def test_csv_writer():
+    assert _render("csv", RECORDS[:1]) == (
+        "Name,Meta,Classifier,SPDX\nfoo,MIT,OSI Approved::MIT License,MIT\n"
+    )
+    assert _render("csv", []) == ""
+    # commas in values are quoted, so every row has as many fields as columns
+    rows = list(csv.reader(io.StringIO(_render("csv", RECORDS))))
+    assert rows[2] == ["bar", "BSD, 3-clause", "", ""]
+
+
+def test_table_writer_is_buffered():
+    buf = io.StringIO()
+    writer = report_writer("github", [buf], COLUMNS)
+    writer.write(RECORDS[0])
+    assert buf.getvalue() == ""
+    writer.close()
+    assert "| foo" in buf.getvalue()
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_cli_streams_jsonl(tmpdir, pypi_server, capsys, engine):
+    for i in range(10):
+        pypi_server.add(f"pkg{i}")
+    req = tmpdir.join("requirements.txt")
+    req.write("".join(f"pkg{i}\n" for i in range(10)))
+    out_file = tmpdir.join("out.jsonl")
+    ret = run(
+        [req.strpath, "--no-cache", "--engine", engine, "-f", "jsonl"]
+        + ["-o", out_file.strpath]
+    )
+    out, _ = capsys.readouterr()
+    assert ret == 0
+    rows = [json.loads(x) for x in out_file.read().splitlines()]
+    assert sorted(r["Name"] for r in rows) == [f"pkg{i}" for i in range(10)]
+    assert out_file.read() in out
+
+
+def test_cli_check_reports_banned(tmpdir, pypi_server, capsys):
+    pypi_server.add("foo", license="GPL", classifiers=[])
+    pypi_server.add("bar")
+    req = tmpdir.join("requirements.txt")
+    req.write("foo\nbar\n")
+    cfg = tmpdir.join("deplic.cfg")
+    cfg.write("[deplic]\nbanned = GPL\n")
+    ret = run([req.strpath, "--no-cache", "-c", cfg.strpath])
+    out, _ = capsys.readouterr()
+    assert ret == 1
+    assert "BANNED" in out and "foo" in out
+    assert "bar" not in out
+
+
+def test_cli_check_bans_license_families(tmpdir, pypi_server, capsys):
+    pypi_server.add("foo", license="GPLv3+", classifiers=[])
+    pypi_server.add("bar", license="GPL-2.0", classifiers=[])
+    pypi_server.add("baz", license="MPL-2.0", classifiers=[])
+    req = tmpdir.join("requirements.txt")
+    req.write("foo\nbar\nbaz\n")
+    cfg = tmpdir.join("deplic.cfg")
+    cfg.write("[deplic]\nbanned = GPL, GPL-3.0\n")
+    ret = run([req.strpath, "--no-cache", "-c", cfg.strpath])
+    out, _ = capsys.readouterr()
+    banned = [line for line in out.splitlines() if "BANNED" in line]
+    assert ret == 1
+    assert len(banned) == 2
+    assert any("foo" in line for line in banned)
+    assert any("bar" in line for line in banned)
+
+
+def test_iter_async_yields_incrementally(pypi_server):
+    pypi_server.add("foo")
+    records = iter_async(["foo", "missing"])
+    assert next(records)["Name"] == "foo"
+    assert list(records) == []
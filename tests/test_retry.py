@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from dep_license import start_concurrent
+from dep_license import worker
+from dep_license.aio import start_async
+from dep_license.fetch import parse_retry_after
+from dep_license.fetch import Session
+from dep_license.fetch import TokenBucket
+
+
+@pytest.fixture
+def session():
+    return Session(backoff=0.01)
+
+
+def test_worker_retries_transient_errors(pypi_server, session):
+    pypi_server.add("foo")
+    pypi_server.fail("foo", 503, 502, 429, retry_after="0")
+    assert worker("foo", session=session)["Meta"] == "MIT"
+    assert len(pypi_server.requests) == 4
+
+
+def test_worker_gives_up(pypi_server):
+    pypi_server.add("foo")
+    pypi_server.fail("foo", 503, 503, 503)
+    assert worker("foo", session=Session(retries=2, backoff=0.01)) is None
+    assert len(pypi_server.requests) == 3
+
+
+def test_not_found_is_not_retried(pypi_server, session):
+    assert worker("missing", session=session) is None
+    assert len(pypi_server.requests) == 1
+
+
+@pytest.mark.parametrize("engine", [start_concurrent, start_async])
+def test_engines_survive_flaky_server(pypi_server, session, engine):
+    for i in range(20):
+        pypi_server.add(f"pkg{i}")
+        pypi_server.fail(f"pkg{i}", 503 if i % 2 else 429, retry_after="0")
+    results = engine([f"pkg{i}" for i in range(20)], max_workers=8, session=session)
+    assert len(results) == 20
+    assert len(pypi_server.requests) == 40
+
+
+@pytest.mark.parametrize("engine", [start_concurrent, start_async])
+def test_requests_are_coalesced(pypi_server, session, engine):
+    # PyPI redirects to the normalized name, the stub serves both spellings
+    pypi_server.add("foo")
+    pypi_server.add("Foo")
+    pypi_server.latency = 0.2
+    results = engine(["foo", "Foo", "foo"], max_workers=3, session=session)
+    assert len(results) == 3
+    assert len(pypi_server.requests) == 1
+
+
+def test_retry_after_is_honored(pypi_server):
+    pypi_server.add("foo")
+    pypi_server.fail("foo", 429, retry_after="0.3")
+    start = time.monotonic()
+    assert worker("foo", session=Session(backoff=0.01))
+    assert time.monotonic() - start >= 0.3
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2") == 2
+    assert parse_retry_after("-1") == 0
+    assert parse_retry_after("100000") == 60
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    bucket.throttle(1.0)
+    assert bucket.rate == 5
+    assert bucket.reserve() >= 0.9
+    bucket.recover()
+    assert bucket.rate == 6
+    assert TokenBucket().reserve() == 0
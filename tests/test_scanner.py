@@ -0,0 +1,79 @@
+import pytest
+
+from dep_license.cache import manifest_cache
+from dep_license.cache import MetadataCache
+from dep_license.policy import LicensePolicy
+from dep_license.scanner import Scanner
+
+
+@pytest.fixture
+def scanner(pypi_server):
+    pypi_server.add("foo", license="MIT")
+    pypi_server.add("bar", license="GPLv3", version="1.0")
+    with Scanner(max_workers=4, policy=LicensePolicy(banned=["GPL-3.0"])) as s:
+        yield s
+
+
+def test_lookup(scanner, pypi_server):
+    records = scanner.lookup(["foo", "# comment", "bar==1.0", "missing"])
+    assert [r and (r["Name"], r["Meta"]) for r in records] == [
+        ("foo", "MIT"),
+        ("bar", "GPLv3"),
+        None,
+    ]
+    requests = len(pypi_server.requests)
+
+    # warm: served from memory without any request
+    assert scanner.lookup(["foo"])[0]["Meta"] == "MIT"
+    assert len(pypi_server.requests) == requests
+
+    # records handed out are copies
+    scanner.lookup(["foo"])[0]["Meta"] = "changed"
+    assert scanner.lookup(["foo"])[0]["Meta"] == "MIT"
+
+
+def test_lookups_reuse_connections(pypi_server):
+    for i in range(10):
+        pypi_server.add(f"pkg{i}")
+    with Scanner(max_workers=2, memo_ttl=0) as s:
+        for i in range(10):
+            assert s.lookup([f"pkg{i}", "missing"])[0]["Meta"] == "MIT"
+        assert s.lookup(["pkg0"])[0]["Meta"] == "MIT"
+        assert len(pypi_server.requests) == 21
+        assert pypi_server.connections <= 2
+        assert s.session.pool.opened == pypi_server.connections
+
+
+def test_scan_path(tmpdir, scanner):
+    tmpdir.join("requirements.txt").write("foo\nbar==1.0\nFoo\nmissing\n")
+    result = scanner.scan_path(tmpdir.strpath)
+    assert result.dependencies == ["foo", "bar", "missing"]
+    assert [r["Name"] for r in result.records] == ["foo", "bar"]
+    assert result.missing == ["missing"]
+    [(record, verdict)] = result.violations
+    assert record["Name"] == "bar" and verdict.entry == "GPL-3.0"
+
+    tmpdir.mkdir("svc").join("Pipfile").write('[packages]\nfoo = "*"\n')
+    assert scanner.scan_path(tmpdir.join("svc").strpath).dependencies == ["foo"]
+    result = scanner.scan_path(tmpdir.strpath, recursive=True)
+    assert result.dependencies == ["foo", "bar", "missing"]
+
+
+def test_scan_manifest_bytes(tmpdir, pypi_server):
+    pypi_server.add("anyio", license="MIT", version="3.5.0")
+    data = b'[[package]]\nname = "anyio"\nversion = "3.5.0"\n'
+    cache = MetadataCache(tmpdir.strpath)
+    manifests = manifest_cache(tmpdir.strpath)
+    try:
+        with Scanner(cache=cache, manifests=manifests, memo_ttl=0) as s:
+            for _ in range(2):
+                result = s.scan_manifest_bytes(data, "poetry.lock")
+                assert result.records[0]["Meta"] == "MIT"
+                assert result.dependencies[0].version == "3.5.0"
+            assert len(manifests) == 1
+            with pytest.raises(ValueError):
+                s.scan_manifest_bytes(b"\xff", "requirements.txt")
+    finally:
+        cache.close()
+        manifests.close()
+    assert pypi_server.requests == ["/pypi/anyio/3.5.0/json"]
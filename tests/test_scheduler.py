@@ -0,0 +1,80 @@
+import csv
+import time
+from collections import OrderedDict
+
+from dep_license import run
+from dep_license.scheduler import attribute
+from dep_license.scheduler import scan_projects
+from dep_license.utils import Dependency
+
+
+def test_scan_projects_runs_concurrently():
+    def collect(project):
+        time.sleep(0.2)
+        return [project.upper()]
+
+    start = time.perf_counter()
+    scanned = scan_projects(
+        ["a", "b", "c", "d", "git@x"],
+        collect,
+        lambda p: p.startswith("git@"),
+        max_workers=4,
+        clone_workers=1,
+    )
+    assert time.perf_counter() - start < 0.6
+    assert list(scanned.items()) == [
+        ("a", ["A"]),
+        ("b", ["B"]),
+        ("c", ["C"]),
+        ("d", ["D"]),
+        ("git@x", ["GIT@X"]),
+    ]
+
+
+def test_attribute():
+    deps, usage = attribute(
+        OrderedDict(
+            [
+                ("p1", ["Flask", "requests"]),
+                ("p2", ["flask", "numpy", "flask"]),
+            ]
+        )
+    )
+    assert deps == ["Flask", "requests", "numpy"]
+    assert usage == {"flask": ["p1", "p2"], "requests": ["p1"], "numpy": ["p2"]}
+
+
+def test_attribute_warns_about_conflicting_pins(caplog):
+    deps, usage = attribute(
+        OrderedDict(
+            [
+                ("a", [Dependency("foo", "1.0"), Dependency("bar", "1.0")]),
+                ("b", [Dependency("Foo", "2.0"), Dependency("bar", "1.0")]),
+            ]
+        )
+    )
+    assert [(d, d.version) for d in deps] == [("foo", "1.0"), ("bar", "1.0")]
+    assert usage == {"foo": ["a", "b"], "bar": ["a", "b"]}
+    warnings = [r.getMessage() for r in caplog.records]
+    assert warnings == ["Foo: b pins 2.0 but a pins 1.0; reporting the license of 1.0"]
+
+
+def test_show_projects(tmpdir, pypi_server, capsys):
+    pypi_server.add("foo")
+    pypi_server.add("bar", license="BSD", classifiers=[])
+    p1 = tmpdir.mkdir("p1")
+    p1.join("requirements.txt").write("foo\nbar\n")
+    p2 = tmpdir.mkdir("p2")
+    p2.join("requirements.txt").write("Foo\n")
+    ret = run([p1.strpath, p2.strpath, "--show-projects", "--no-cache", "-f", "csv"])
+    out, _ = capsys.readouterr()
+    assert ret == 0
+    assert "Found dependencies: 2" in out
+    lines = out.splitlines()
+    first = lines.index("Name,Meta,Classifier,SPDX,Projects") + 1
+    rows = list(csv.reader(lines[first:]))
+    assert sorted(rows) == [
+        ["bar", "BSD", "", "", p1.strpath],
+        ["foo", "MIT", "OSI Approved::MIT License", "MIT", f"{p1}, {p2}"],
+    ]
+    assert len(pypi_server.requests) == 2
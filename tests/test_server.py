@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from dep_license import run
+from dep_license.policy import LicensePolicy
+from dep_license.scanner import Scanner
+from dep_license.server import DaemonClient
+from dep_license.server import make_server
+from dep_license.server import parse_address
+from dep_license.server import serve_main
+
+
+@pytest.fixture
+def daemon(request, tmpdir, pypi_server):
+    pypi_server.add("foo", license="MIT")
+    pypi_server.add("bar", license="GPLv3", version="1.0")
+    address = request.param
+    if address.startswith("unix:"):
+        address += tmpdir.join("deplic.sock").strpath
+    scanner = Scanner(policy=LicensePolicy(banned=["GPL-3.0"]))
+    server = make_server(address, scanner)
+    if not address.startswith("unix:"):
+        address = "127.0.0.1:{}".format(server.server_address[1])
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield address
+    server.shutdown()
+    server.server_close()
+    scanner.close()
+
+
+def test_parse_address():
+    assert parse_address("unix:/run/deplic.sock") == ("unix", "/run/deplic.sock")
+    assert parse_address("/run/deplic.sock") == ("unix", "/run/deplic.sock")
+    assert parse_address("127.0.0.1:9000") == ("tcp", ("127.0.0.1", 9000))
+    assert parse_address("http://localhost") == ("tcp", ("localhost", 8765))
+
+
+@pytest.mark.parametrize("daemon", ["unix:", "127.0.0.1:0"], indirect=True)
+def test_client(daemon, pypi_server):
+    client = DaemonClient(daemon)
+    assert client.ping()
+    records = client.lookup(["foo", "bar==1.0", "missing"])
+    assert [r and r["Meta"] for r in records] == ["MIT", "GPLv3", None]
+
+    result = client.scan_manifest_bytes(b"foo\nbar==1.0\n", "requirements.txt")
+    assert result["dependencies"] == [
+        {"name": "foo", "version": None},
+        {"name": "bar", "version": "1.0"},
+    ]
+    assert [r["Name"] for r in result["records"]] == ["foo", "bar"]
+    assert result["violations"] == [
+        {"name": "bar", "license": "GPLv3", "rule": "spdx", "entry": "GPL-3.0"}
+    ]
+    # every package was fetched once, the rest came from the warm memo
+    assert sorted(pypi_server.requests) == [
+        "/pypi/bar/1.0/json",
+        "/pypi/foo/json",
+        "/pypi/missing/json",
+    ]
+
+    with pytest.raises(ValueError):
+        client.request("POST", "/lookup", b'{"names": "foo"}')
+    with pytest.raises(ValueError):
+        client.request("GET", "/nope")
+
+
+@pytest.mark.parametrize("daemon", ["unix:"], indirect=True)
+def test_cli_daemon(daemon, tmpdir, pypi_server, capsys):
+    req = tmpdir.join("requirements.txt")
+    req.write("foo\nbar==1.0\n")
+    argv = [req.strpath, "--no-cache", "-f", "csv", "--daemon", daemon]
+    for _ in range(2):
+        assert run(argv) == 0
+        out = capsys.readouterr().out
+        assert "foo,MIT," in out and "bar,GPLv3," in out
+    assert len(pypi_server.requests) == 2
+
+    with pytest.raises(OSError):
+        make_server(daemon, None)
+
+
+def test_cli_daemon_unavailable(tmpdir, pypi_server, capsys, caplog):
+    pypi_server.add("foo")
+    req = tmpdir.join("requirements.txt")
+    req.write("foo\n")
+    address = "unix:" + tmpdir.join("missing.sock").strpath
+    assert run([req.strpath, "--no-cache", "-f", "csv", "--daemon", address]) == 0
+    assert "foo,MIT," in capsys.readouterr().out
+    assert "fetching directly" in caplog.text
+
+
+def test_serve_localhost_only():
+    assert serve_main(["0.0.0.0:8765"]) == 1
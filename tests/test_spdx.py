@@ -0,0 +1,131 @@
+import os
+
+import pytest
+
+from dep_license import make_record
+from dep_license.policy import LicensePolicy
+from dep_license.spdx import CLASSIFIERS
+from dep_license.spdx import from_full_text
+from dep_license.spdx import to_spdx
+
+MIT_TEXT = """Copyright (c) 2021 Someone
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software.
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+"""
+
+LICENSES = os.path.join(os.path.dirname(__file__), "licenses")
+
+GPL_NOTICE = (
+    "This program is free software: you can redistribute it and/or modify it "
+    "under the terms of the GNU General Public License as published by the "
+    "Free Software Foundation, either version 3 of the License, or (at your "
+    "option) any later version."
+)
+
+
+@pytest.mark.parametrize(
+    ("meta", "expected"),
+    [
+        ("MIT", "MIT"),
+        ("The MIT License (MIT)", "MIT"),
+        ("Apache License, Version 2.0", "Apache-2.0"),
+        ("apache-2.0", "Apache-2.0"),
+        ("GPLv3+", "GPL-3.0-or-later"),
+        ("GPL-3.0", "GPL-3.0-only"),
+        ("new BSD license", "BSD-3-Clause"),
+        ("MIT OR Apache-2.0", "MIT OR Apache-2.0"),
+        (
+            "(MIT or Apache 2.0) AND BSD-3-Clause",
+            "(MIT OR Apache-2.0) AND BSD-3-Clause",
+        ),
+        (
+            "GPL-2.0-or-later WITH Classpath-exception-2.0",
+            "GPL-2.0-or-later WITH Classpath-exception-2.0",
+        ),
+        (MIT_TEXT, "MIT"),
+        (GPL_NOTICE, "GPL-3.0-or-later"),
+        ("BSD", ""),
+        ("AGPL", ""),
+        ("Apache", ""),
+        ("UNKNOWN", ""),
+        ("", ""),
+        (None, ""),
+        ("MIT OR something else", ""),
+    ],
+)
+def test_license_field(meta, expected):
+    assert to_spdx(meta) == expected
+
+
+def test_classifiers():
+    classifiers = [
+        "License :: OSI Approved :: MIT License",
+        "License :: OSI Approved :: Apache Software License",
+        "License :: OSI Approved :: BSD License",
+        "Topic :: Utilities",
+    ]
+    assert to_spdx("", classifiers) == "MIT OR Apache-2.0"
+    assert to_spdx("UNKNOWN", classifiers[2:]) == ""
+    # the license field wins over classifiers
+    assert to_spdx("BSD-3-Clause", classifiers) == "BSD-3-Clause"
+
+
+def test_classifier_table_is_frozen():
+    assert CLASSIFIERS["OSI Approved::GNU General Public License v3 (GPLv3)"] == (
+        "GPL-3.0-only"
+    )
+    with pytest.raises(TypeError):
+        CLASSIFIERS["Other"] = "MIT"
+
+
+def test_make_record_has_spdx():
+    record = make_record(
+        "foo", {"license": MIT_TEXT, "classifiers": ["License :: Freeware"]}
+    )
+    assert record["SPDX"] == "MIT"
+
+
+def read_license(name):
+    with open(os.path.join(LICENSES, name)) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize(
+    ("name", "expected"),
+    [
+        ("GPL-2.0", "GPL-2.0-only"),
+        ("GPL-3.0", "GPL-3.0-only"),
+        ("LGPL-2.1", "LGPL-2.1-only"),
+        ("LGPL-3.0", "LGPL-3.0-only"),
+        ("AGPL-3.0", "AGPL-3.0-only"),
+        ("MPL-1.1", "MPL-1.1"),
+        ("MPL-2.0", "MPL-2.0"),
+        ("Apache-2.0", "Apache-2.0"),
+    ],
+)
+def test_full_license_texts(name, expected):
+    # the GPL-3.0 text cites the Affero GPL, the MPL-2.0 text the GNU licenses
+    assert from_full_text(read_license(name)) == expected
+
+
+def test_full_text_is_not_banned_by_a_license_it_cites():
+    policy = LicensePolicy(banned=["AGPL-3.0"])
+    for name, classifier in [
+        ("MPL-2.0", "License :: OSI Approved :: Mozilla Public License 2.0 (MPL 2.0)"),
+        ("GPL-3.0", "License :: OSI Approved :: GNU General Public License v3 (GPLv3)"),
+        ("LGPL-3.0", None),
+    ]:
+        info = {
+            "license": read_license(name),
+            "classifiers": [classifier] if classifier else [],
+        }
+        assert policy.check(make_record("foo", info)) is None
+    info = {"license": read_license("AGPL-3.0"), "classifiers": []}
+    assert policy.check(make_record("foo", info)).banned
@@ -0,0 +1,152 @@
+import json
+import subprocess
+
+from benchmarks.mock_pypi import make_info
+from dep_license import run
+from dep_license.state import ScanState
+from dep_license.utils import Dependency
+
+
+def _git(*args, cwd=None):
+    subprocess.check_call(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        cwd=cwd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def test_state_round_trip(tmpdir):
+    path = tmpdir.join("state.json").strpath
+    assert ScanState.load(path) is None
+    state = ScanState(
+        settings={"dev": False},
+        manifests={"p:requirements.txt": "abc"},
+        dependencies=["foo==1.0", "bar"],
+        records={
+            "foo==1.0": {"Name": "foo", "Meta": "MIT"},
+            "bar": {"Name": "bar", "Meta": "BSD"},
+        },
+    )
+    state.save(path)
+    loaded = ScanState.load(path)
+    assert loaded.unchanged(state)
+    assert loaded.record(Dependency("foo", "1.0")) == {"Name": "foo", "Meta": "MIT"}
+    assert loaded.record(Dependency("foo", "2.0")) is None
+    assert loaded.record("foo") is None
+    assert not loaded.unchanged(ScanState(settings={"dev": True}))
+    # a dependency without a record was never looked up successfully
+    del loaded.records["bar"]
+    assert not loaded.unchanged(state)
+
+    tmpdir.join("state.json").write("{not json")
+    assert ScanState.load(path) is None
+
+
+def test_cli_state(tmpdir, pypi_server, capsys):
+    pypi_server.add("foo", license="MIT")
+    pypi_server.add("bar", license="GPL", version="1.0")
+    pypi_server.add("bar", license="BSD", version="2.0")
+    req = tmpdir.join("requirements.txt")
+    req.write("foo\nbar==1.0\n")
+    cfg = tmpdir.join("setup.cfg")
+    cfg.write("[deplic]\nbanned = GPL\n")
+    state = tmpdir.join("state.json").strpath
+    argv = [req.strpath, "--no-cache", "-f", "json", "--state", state]
+
+    assert run(argv) == 0
+    first = capsys.readouterr().out
+    assert len(pypi_server.requests) == 2
+    assert sorted(json.load(open(state))["records"]) == ["bar==1.0", "foo"]
+
+    # nothing changed: the report is replayed without any request
+    assert run(argv) == 0
+    out = capsys.readouterr().out
+    assert "Manifests unchanged" in out
+    assert out.split("]")[0].split("[")[1] == first.split("]")[0].split("[")[1]
+    assert len(pypi_server.requests) == 2
+
+    # replayed records are still checked against the policy
+    assert run(argv + ["-c", cfg.strpath]) == 1
+    assert "BANNED" in capsys.readouterr().out
+    assert len(pypi_server.requests) == 2
+
+    # only the re-pinned dependency is looked up
+    req.write("foo\nbar==2.0\n")
+    assert run(argv) == 0
+    out = capsys.readouterr().out
+    assert "Reusing 1 results" in out
+    assert '"Meta": "BSD"' in out and '"Meta": "MIT"' in out
+    assert pypi_server.requests[2:] == ["/pypi/bar/2.0/json"]
+
+
+def test_cli_state_retries_failed_lookups(tmpdir, pypi_server, capsys):
+    pypi_server.add("foo", license="MIT")
+    pypi_server.add("bar", license="GPL")
+    pypi_server.fail("bar", 404)
+    req = tmpdir.join("requirements.txt")
+    req.write("foo\nbar\n")
+    cfg = tmpdir.join("setup.cfg")
+    cfg.write("[deplic]\nbanned = GPL\n")
+    state = tmpdir.join("state.json").strpath
+    argv = [req.strpath, "--no-cache", "--state", state, "-c", cfg.strpath]
+
+    assert run(argv) == 0
+    assert sorted(json.load(open(state))["records"]) == ["foo"]
+
+    # bar is looked up again instead of replaying the incomplete report
+    assert run(argv) == 1
+    out = capsys.readouterr().out
+    assert "Manifests unchanged" not in out
+    assert "Reusing 1 results" in out
+    assert "BANNED" in out
+    assert pypi_server.requests.count("/pypi/bar/json") == 2
+    assert sorted(json.load(open(state))["records"]) == ["bar", "foo"]
+
+
+def test_cli_state_ignores_records_made_with_other_settings(
+    tmpdir, pypi_server, capsys
+):
+    pypi_server.add("foo", license="GPL", classifiers=[])
+    req = tmpdir.join("requirements.txt")
+    req.write("foo\n")
+    state = tmpdir.join("state.json").strpath
+    argv = [req.strpath, "--no-cache", "--state", state, "-f", "json"]
+    assert run(argv) == 0
+    assert '"Meta": "GPL"' in capsys.readouterr().out
+
+    other = tmpdir.join("mirror", "foo.json")
+    other.write(json.dumps(make_info("foo", "MIT", [])), ensure=True)
+    req.write("foo\nbar\n")
+    assert run(argv + ["--source", tmpdir.join("mirror").strpath]) == 0
+    out = capsys.readouterr().out
+    assert "Reusing" not in out
+    assert '"Meta": "MIT"' in out and "GPL" not in out
+
+
+def test_cli_since(tmpdir, pypi_server, capsys, caplog):
+    pypi_server.add("foo")
+    pypi_server.add("bar", version="2.0")
+    pypi_server.add("baz")
+    repo = tmpdir.mkdir("repo")
+    req = repo.join("requirements.txt")
+    req.write("foo\nbar==1.0\n")
+    _git("init", "-q", cwd=repo.strpath)
+    _git("add", ".", cwd=repo.strpath)
+    _git("commit", "-q", "-m", "first", cwd=repo.strpath)
+
+    assert run([repo.strpath, "--no-cache", "--since", "HEAD"]) == 0
+    assert "no dependency changes since HEAD" in capsys.readouterr().out
+    assert pypi_server.requests == []
+
+    req.write("foo\nbar==2.0\nbaz\n")
+    assert run([repo.strpath, "--no-cache", "-f", "csv", "--since", "HEAD"]) == 0
+    out = capsys.readouterr().out
+    assert "Found dependencies: 2" in out
+    assert sorted(pypi_server.requests) == ["/pypi/bar/2.0/json", "/pypi/baz/json"]
+
+    assert run([repo.strpath, "--no-cache", "--since", "nope"]) == 1
+    plain = tmpdir.mkdir("plain")
+    plain.join("requirements.txt").write("foo\n")
+    assert run([plain.strpath, "--no-cache", "--since", "HEAD"]) == 1
+    assert "HEAD is not a git revision" in caplog.text
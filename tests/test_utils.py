@@ -1,6 +1,10 @@
+import os
+import sys
+
 import pytest
 
 from dep_license import utils
+from dep_license.cache import manifest_cache
 
 
 def test_parsing_requirement_file(tmpdir):
@@ -76,6 +80,10 @@ def test_parsing_pip_lock_file(tmpdir):
     )
     assert utils.parse_pip_lock_file(x.strpath) == ["certifi"]
     assert utils.parse_pip_lock_file(x.strpath, dev=True) == ["certifi", "pytest"]
+    assert [d.version for d in utils.parse_pip_lock_file(x.strpath, dev=True)] == [
+        "2017.7.27.1",
+        "3.2.2",
+    ]
 
 
 def test_parsing_setup_file(tmpdir):
@@ -198,6 +206,10 @@ def test_parsing_poetry_lock_file(tmpdir):
         """
     )
     assert utils.parse_poetry_lock_file(x.strpath) == ["anyio", "appnope"]
+    assert [d.version for d in utils.parse_poetry_lock_file(x.strpath)] == [
+        "3.5.0",
+        "0.1.2",
+    ]
 
 
 @pytest.mark.parametrize(
@@ -216,3 +228,130 @@ def test_passing_dependency_file(f, tmpdir):
     x.write(" ")
     r = utils.parse_file(x.strpath, f)
     assert r == []
+
+
+def test_parsing_setup_file_statically(tmpdir):
+    x = tmpdir.join("setup.py")
+    x.write(
+        "import os\n"
+        "from setuptools import setup\n"
+        'BASE = ["requests>=2", "six"]\n'
+        "TESTS: list = ['pytest']\n"
+        "BASE += ['click']\n"
+        "EXTRAS = dict(dev=TESTS + ['black'], docs='sphinx')\n"
+        "if __name__ == '__main__':\n"
+        "    raise SystemExit('setup.py must not be executed')\n"
+        "setup(\n"
+        '    name="foo",\n'
+        "    install_requires=BASE + ['numpy'],\n"
+        "    extras_require=EXTRAS,\n"
+        "    **{'setup_requires': ('wheel',)}\n"
+        ")\n"
+    )
+    cwd, path = os.getcwd(), list(sys.path)
+    assert utils.parse_setup_file(x.strpath) == [
+        "requests",
+        "six",
+        "click",
+        "numpy",
+        "wheel",
+        "pytest",
+        "black",
+        "sphinx",
+    ]
+    assert (os.getcwd(), sys.path) == (cwd, path)
+
+
+def test_parsing_setup_file_dynamic(tmpdir):
+    tmpdir.join("requirements.txt").write("tabulate\n")
+    x = tmpdir.join("setup.py")
+    x.write(
+        "from setuptools import setup\n"
+        "with open('requirements.txt') as f:\n"
+        "    REQUIRED = f.read().splitlines()\n"
+        'setup(name="foo", version="1.0", install_requires=REQUIRED)'
+    )
+    assert utils.setup_requirements_ast(x.strpath) is None
+    assert utils.parse_setup_file(x.strpath) == []
+    cwd = os.getcwd()
+    assert utils.parse_setup_file(x.strpath, exec_setup=True) == ["tabulate"]
+    assert os.getcwd() == cwd
+
+
+def test_pyproject_decoded_once(tmpdir, monkeypatch):
+    x = tmpdir.join("pyproject.toml")
+    x.write(
+        """
+        [build-system]
+        requires = ["setuptools"]
+        [tool.poetry.dependencies]
+        python = "^3.8"
+        numpy = "^1.23.1"
+        """
+    )
+    calls = []
+    loads = utils.toml_loads
+    monkeypatch.setattr(utils, "toml_loads", lambda s: calls.append(s) or loads(s))
+    monkeypatch.setattr(utils, "toml_load", None)
+    assert utils.parse_file(x.strpath, "pyproject.toml") == ["setuptools", "numpy"]
+    assert len(calls) == 1
+
+
+def test_parse_file_manifest_cache(tmpdir, monkeypatch):
+    cache = manifest_cache(tmpdir.mkdir("cache").strpath)
+    x = tmpdir.join("poetry.lock")
+    x.write('[[package]]\nname = "anyio"\n')
+    assert utils.parse_file(x.strpath, "poetry.lock", cache=cache) == ["anyio"]
+    r = tmpdir.join("requirements.txt")
+    r.write("foo==1.0\nbar\n")
+    assert utils.parse_file(r.strpath, "requirements.txt", cache=cache) == [
+        "foo",
+        "bar",
+    ]
+
+    monkeypatch.setattr(utils, "parse_manifest", None)
+    assert utils.parse_file(x.strpath, "poetry.lock", cache=cache) == ["anyio"]
+    deps = utils.parse_file(r.strpath, "requirements.txt", cache=cache)
+    assert [(d, d.version) for d in deps] == [("foo", "1.0"), ("bar", None)]
+    y = tmpdir.mkdir("other").join("poetry.lock")
+    y.write('[[package]]\nname = "anyio"\n')
+    assert utils.parse_file(y.strpath, "poetry.lock", cache=cache) == ["anyio"]
+
+    x.write('[[package]]\nname = "appnope"\n')
+    assert utils.parse_file(x.strpath, "poetry.lock", cache=cache) == []
+
+
+def test_requirement_names():
+    assert utils.requirement_names(
+        [
+            "Foo_Bar[extra]>=1.0 \\\n",
+            "    --hash=sha256:abc\n",
+            "zope.interface ; python_version<'3'\n",
+            "pkg @ https://example.com/pkg.whl\n",
+            "requests (>=2.0)  # comment\n",
+            "# comment\n",
+            "git+https://github.com/abduhbm/dep-license\n",
+            "./local/path\n",
+        ]
+    ) == ["Foo_Bar", "zope.interface", "pkg", "requests"]
+    assert [
+        d.version
+        for d in utils.requirement_names(
+            [
+                "a==1.0",
+                "b[x] == 2.0.post1 ; python_version<'3'",
+                "c (==3)",
+                "d==4.0 \\\n",
+                "    --hash=sha256:abc\n",
+                "e>=1",
+                "f==1.*",
+                "g==1.0,!=1.1",
+            ]
+        )
+    ] == ["1.0", "2.0.post1", "3", "4.0", None, None, None]
+    assert utils.pinned("==1.0") == utils.pinned({"version": "==1.0"}) == "1.0"
+    assert utils.pinned("*") is None
+    assert utils.project_names(["typing_extensions>=4", "zope.interface"]) == [
+        "typing-extensions",
+        "zope.interface",
+    ]
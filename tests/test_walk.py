@@ -0,0 +1,117 @@
+import csv
+import os
+import sys
+
+import pytest
+
+from dep_license import discover_projects
+from dep_license import run
+from dep_license import SUPPORTED_FILES
+from dep_license.walk import find_manifests
+from dep_license.walk import IgnoreRules
+
+
+def _tree(root, files):
+    for path, content in files.items():
+        root.ensure(path).write(content)
+
+
+def _rel(root, paths):
+    return [os.path.relpath(p, root.strpath).replace(os.sep, "/") for p in paths]
+
+
+def test_find_manifests(tmpdir):
+    _tree(
+        tmpdir,
+        {
+            "requirements.txt": "foo\n",
+            "svc/a/pyproject.toml": "",
+            "svc/a/src/app.py": "",
+            "svc/b/requirements.txt": "",
+            "svc/b/Pipfile": "",
+            "svc/generated/requirements.txt": "",
+            "svc/keep.txt": "",
+            "node_modules/x/requirements.txt": "",
+            ".git/requirements.txt": "",
+            "env/pyvenv.cfg": "",
+            "env/lib/requirements.txt": "",
+            "docs/requirements.txt": "",
+            "legacy/requirements.txt": "",
+            ".gitignore": "# comment\ngenerated/\n/docs\n",
+            "legacy/.deplicignore": "requirements.txt\n",
+        },
+    )
+    found = _rel(tmpdir, find_manifests(tmpdir.strpath, SUPPORTED_FILES))
+    assert found == [
+        "requirements.txt",
+        "svc/a/pyproject.toml",
+        "svc/b/Pipfile",
+        "svc/b/requirements.txt",
+    ]
+    found = find_manifests(
+        tmpdir.strpath, ["requirements.txt"], exclude=["svc/b"], max_workers=1
+    )
+    assert _rel(tmpdir, found) == ["requirements.txt"]
+
+
+def test_ignore_rules(tmpdir):
+    base = tmpdir.strpath
+    rules = IgnoreRules().extend(base, ["*.egg-info/", "build", "!build", "/a/b"])
+    assert rules.match(os.path.join(base, "x.egg-info"), "x.egg-info", True)
+    assert not rules.match(os.path.join(base, "x.egg-info"), "x.egg-info", False)
+    assert not rules.match(os.path.join(base, "build"), "build", True)
+    assert rules.match(os.path.join(base, "a", "b"), "b", True)
+    assert not rules.match(os.path.join(base, "c", "a", "b"), "b", True)
+
+
+def test_ignore_rules_star_stops_at_slash(tmpdir):
+    base = tmpdir.strpath
+    rules = IgnoreRules().extend(base, ["src/*.txt", "docs/**/tmp", "f?o"])
+    assert rules.match(os.path.join(base, "src", "a.txt"), "a.txt", False)
+    assert not rules.match(os.path.join(base, "src", "b", "a.txt"), "a.txt", False)
+    assert rules.match(os.path.join(base, "docs", "tmp"), "tmp", True)
+    assert rules.match(os.path.join(base, "docs", "a", "b", "tmp"), "tmp", True)
+    assert rules.match(os.path.join(base, "x", "foo"), "foo", True)
+
+
+def test_discover_projects(tmpdir):
+    _tree(tmpdir, {"a/requirements.txt": "", "b/c/Pipfile": "", "d/x.txt": ""})
+    project = tmpdir.strpath
+    assert discover_projects([project, "https://host/repo"], SUPPORTED_FILES) == [
+        os.path.join(project, "a"),
+        os.path.join(project, "b", "c"),
+        "https://host/repo",
+    ]
+    empty = tmpdir.mkdir("empty").strpath
+    assert discover_projects([empty], SUPPORTED_FILES) == [empty]
+
+
+def test_cli_recursive(tmpdir, pypi_server, capsys):
+    pypi_server.add("foo")
+    pypi_server.add("bar")
+    _tree(
+        tmpdir,
+        {
+            "requirements.txt": "foo\n",
+            "services/api/requirements.txt": "foo\nbar\n",
+            "services/old/requirements.txt": "baz\n",
+        },
+    )
+    argv = [tmpdir.strpath, "--no-cache", "-f", "csv", "--show-projects"]
+    assert run(argv) == 0
+    assert "bar" not in capsys.readouterr().out
+
+    assert run(argv + ["-r", "--exclude", "old"]) == 0
+    out = capsys.readouterr().out
+    assert "Found dependencies: 2" in out
+    api = os.path.join(tmpdir.strpath, "services", "api")
+    lines = out.splitlines()
+    first = lines.index("Name,Meta,Classifier,SPDX,Projects") + 1
+    rows = {r[0]: r[4] for r in csv.reader(lines[first:])}
+    assert rows == {"foo": f"{tmpdir.strpath}, {api}", "bar": api}
+
+
+def test_cli_recursive_rejects_env(capsys):
+    with pytest.raises(SystemExit):
+        run([sys.executable, "-e", "-r"])
+    assert "--recursive cannot be used with --env" in capsys.readouterr().err
@@ -0,0 +1,206 @@
+import os
+import re
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import dep_license
+from dep_license.cache import MetadataCache
+from dep_license.fetch import Session
+from dep_license.profile import Profiler
+from dep_license.utils import Dependency
+from dep_license.wheel import RangeFile
+from dep_license.wheel import read_wheel
+
+MIT_TEXT = """\
+MIT License
+
+Copyright (c) 2020 Someone
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction.
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+"""
+
+
+def make_wheel(path, name, license=None, license_file=None, padding=2 * 1024 * 1024):
+    dist_info = f"{name}-1.0.dist-info"
+    metadata = f"Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\n"
+    if license:
+        metadata += f"License: {license}\n"
+    with zipfile.ZipFile(path, "w") as zf:
+        # incompressible package data in front of the metadata, like real wheels
+        zf.writestr(f"{name}/data.bin", os.urandom(padding), zipfile.ZIP_STORED)
+        zf.writestr(f"{name}/__init__.py", "")
+        zf.writestr(f"{dist_info}/METADATA", metadata, zipfile.ZIP_DEFLATED)
+        if license_file:
+            zf.writestr(f"{dist_info}/licenses/LICENSE", license_file)
+        zf.writestr(f"{dist_info}/RECORD", "")
+    return os.path.getsize(path)
+
+
+class RangeServer(object):
+    """Static file server that honors single `Range: bytes=...` requests."""
+
+    def __init__(self, root, ranges=True):
+        self.root = root
+        self.requests = []
+        self.sent = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                byte_range = self.headers.get("Range")
+                server.requests.append((self.path, byte_range))
+                path = os.path.join(server.root, self.path.lstrip("/"))
+                if not os.path.isfile(path):
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                with open(path, "rb") as f:
+                    body = f.read()
+                size = len(body)
+                m = re.match(r"bytes=(\d*)-(\d*)$", byte_range or "")
+                if not ranges or m is None:
+                    self.send_response(200)
+                else:
+                    first, last = m.groups()
+                    if first:
+                        start, end = int(first), int(last or size - 1)
+                    else:
+                        start, end = max(size - int(last), 0), size - 1
+                    end = min(end, size - 1)
+                    stop = end + 1
+                    body = body[start:stop]
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                server.sent += len(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def files(tmpdir):
+    server = RangeServer(str(tmpdir.mkdir("files")))
+    yield server
+    server.stop()
+
+
+def test_range_file_reads_only_what_is_needed(files):
+    size = make_wheel(os.path.join(files.root, "a.whl"), "a", license="BSD")
+    profiler = Profiler()
+    f = RangeFile(files.url + "/a.whl", profiler)
+    assert f.size == size
+    f.seek(-4, 2)
+    assert len(f.read()) == 4
+    f.seek(10)
+    assert len(f.read(100)) == 100
+    assert profiler.counters["range requests"] == 2
+
+    info = read_wheel(files.url + "/a.whl")
+    assert info["license"] == "BSD"
+    assert files.sent < size / 10
+
+
+def test_license_from_license_file(files):
+    make_wheel(os.path.join(files.root, "b.whl"), "b", license_file=MIT_TEXT)
+    assert read_wheel(files.url + "/b.whl")["license"] == "MIT"
+
+
+def test_gpl_license_file_is_not_affero(files):
+    # the GPL-3.0 text cites the GNU Affero GPL in its section 13
+    path = os.path.join(os.path.dirname(__file__), "licenses", "GPL-3.0")
+    with open(path) as f:
+        make_wheel(os.path.join(files.root, "g.whl"), "g", license_file=f.read())
+    assert read_wheel(files.url + "/g.whl")["license"] == "GPL-3.0-only"
+
+
+def test_server_without_range_support(tmpdir):
+    server = RangeServer(str(tmpdir), ranges=False)
+    try:
+        make_wheel(os.path.join(server.root, "c.whl"), "c", license="ISC")
+        assert read_wheel(server.url + "/c.whl")["license"] == "ISC"
+    finally:
+        server.stop()
+
+
+def add_release(pypi_server, name, version, wheel_url):
+    pypi_server.add(name, license="", classifiers=[])
+    pypi_server.add(name, license="", classifiers=[], version=version)
+    for key in (name, f"{name}/{version}"):
+        pypi_server.packages[key]["info"]["version"] = version
+        pypi_server.packages[key]["urls"] = [
+            {"packagetype": "sdist", "url": wheel_url + ".tar.gz"},
+            {
+                "packagetype": "bdist_wheel",
+                "filename": f"{name}-{version}-py3-none-any.whl",
+                "url": wheel_url,
+            },
+        ]
+
+
+def test_worker_falls_back_to_wheel(pypi_server, files, tmpdir):
+    make_wheel(os.path.join(files.root, "d.whl"), "d", license_file=MIT_TEXT)
+    add_release(pypi_server, "d", "1.0", files.url + "/d.whl")
+    cache = MetadataCache(str(tmpdir.mkdir("cache")))
+
+    record = dep_license.worker("d", cache=cache, session=Session())
+    assert record["Meta"] == "MIT"
+    assert record["SPDX"] == "MIT"
+    assert pypi_server.requests == ["/pypi/d/json", "/pypi/d/1.0/json"]
+
+    # the pinned lookup and later runs reuse the cached wheel metadata
+    del files.requests[:]
+    record = dep_license.worker(Dependency("d", "1.0"), cache=cache)
+    assert record["Meta"] == "MIT"
+    assert dep_license.worker("d", cache=cache)["Meta"] == "MIT"
+    assert files.requests == []
+    cache.close()
+
+
+def test_wheel_fallback_can_be_disabled(pypi_server, files, tmpdir, capsys):
+    make_wheel(os.path.join(files.root, "e.whl"), "e", license="Apache-2.0")
+    add_release(pypi_server, "e", "1.0", files.url + "/e.whl")
+    tmpdir.join("requirements.txt").write("e\n")
+
+    assert dep_license.run([str(tmpdir), "--no-cache", "-f", "csv"]) == 0
+    assert "e,Apache-2.0," in capsys.readouterr().out
+
+    del files.requests[:]
+    argv = [str(tmpdir), "--no-cache", "-f", "csv", "--no-wheel-metadata"]
+    assert dep_license.run(argv) == 0
+    assert "e,,," in capsys.readouterr().out
+    assert files.requests == []
+
+
+def test_async_engine_falls_back_to_wheel(pypi_server, files):
+    from dep_license.aio import iter_async
+
+    make_wheel(os.path.join(files.root, "f.whl"), "f", license="MPL-2.0")
+    add_release(pypi_server, "f", "1.0", files.url + "/f.whl")
+    records = list(iter_async(["f"]))
+    assert records[0]["Meta"] == "MPL-2.0"
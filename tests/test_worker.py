@@ -13,6 +13,7 @@ from dep_license import worker
                 "Name": "dep_license",
                 "Meta": "MIT",
                 "Classifier": "OSI Approved::MIT License",
+                "SPDX": "MIT",
             },
         ),
         ("SomethingThatDoesntExist", None),
@@ -29,5 +30,6 @@ def test_concurrent_workers():
             "Name": "dep_license",
             "Meta": "MIT",
             "Classifier": "OSI Approved::MIT License",
+            "SPDX": "MIT",
         }
     ]